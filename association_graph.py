@@ -0,0 +1,96 @@
+import asyncio
+import re
+from typing import Any, Dict, List, Optional
+from hubspot_client import HubSpotClient
+
+_PATH_SEPARATOR = re.compile(r"\s*(?:->|,|/)\s*")
+
+def parse_path(object_type: str, spec: str) -> List[str]:
+    """
+    Parses a path spec such as "contacts -> companies -> tickets" (or "companies,tickets")
+    into the object types to expand after the root. A leading root type is optional.
+    """
+    path = [part for part in _PATH_SEPARATOR.split(spec.strip()) if part]
+    if path and path[0] == object_type:
+        path = path[1:]
+    if not path:
+        raise ValueError("The path must name at least one associated object type")
+    return path
+
+async def expand_association_graph(
+    hubspot_client: HubSpotClient,
+    object_type: str,
+    object_id: str,
+    path: List[str],
+    hydrate: bool = True,
+    max_nodes: int = 1000,
+) -> Dict[str, Any]:
+    """
+    Walks associations from one root object along ``path`` and returns a graph document.
+
+    Each level is expanded with one batched association read for all objects reached so
+    far. Objects are hydrated with batch reads per type, started as soon as a level is
+    known so they run alongside the next level's expansion. Edges and objects are served
+    from the cache when possible. Expansion stops once ``max_nodes`` objects are reached
+    and the document is marked ``truncated``.
+    """
+    object_id = str(object_id)
+    node_ids: Dict[str, Dict[str, None]] = {object_type: {object_id: None}}
+    edges: List[Dict[str, Any]] = []
+    hydrations: Dict[str, List[asyncio.Task]] = {}
+    node_count = 1
+    truncated = False
+
+    def start_hydration(level_type: str, ids: List[str]) -> None:
+        if hydrate and ids:
+            task = asyncio.create_task(hubspot_client.batch_read_objects(level_type, ids, use_cache=True))
+            hydrations.setdefault(level_type, []).append(task)
+
+    start_hydration(object_type, [object_id])
+    frontier_type, frontier = object_type, [object_id]
+    try:
+        for to_type in path:
+            if not frontier:
+                break
+            associations = await hubspot_client.batch_read_associations(frontier_type, frontier, to_type, use_cache=True)
+            seen = node_ids.setdefault(to_type, {})
+            next_frontier: List[str] = []
+            for from_id in frontier:
+                for association in associations.get(from_id, []):
+                    to_id = str(association.get("toObjectId"))
+                    if to_id not in seen:
+                        if node_count >= max_nodes:
+                            truncated = True
+                            continue
+                        seen[to_id] = None
+                        next_frontier.append(to_id)
+                        node_count += 1
+                    edges.append({
+                        "from_type": frontier_type,
+                        "from_id": from_id,
+                        "to_type": to_type,
+                        "to_id": to_id,
+                        "types": association.get("associationTypes", []),
+                    })
+            start_hydration(to_type, next_frontier)
+            frontier_type, frontier = to_type, next_frontier
+
+        nodes: Dict[str, Dict[str, Optional[Dict[str, Any]]]] = {}
+        for level_type, ids in node_ids.items():
+            objects: Dict[str, Dict[str, Any]] = {}
+            for hydrated in await asyncio.gather(*hydrations.get(level_type, [])):
+                objects.update(hydrated)
+            # Objects that could not be found (e.g. deleted since the edge was cached) map to None
+            nodes[level_type] = {node_id: objects.get(node_id) if hydrate else None for node_id in ids}
+    finally:
+        for tasks in hydrations.values():
+            for task in tasks:
+                task.cancel()
+
+    return {
+        "root": {"type": object_type, "id": object_id},
+        "path": [object_type] + path,
+        "nodes": nodes,
+        "edges": edges,
+        "truncated": truncated,
+    }
@@ -0,0 +1,75 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+
+HUBSPOT_DEFINED = "HUBSPOT_DEFINED"
+
+# HubSpot's default (unlabeled) association types between the standard objects, so the
+# common pairs are resolved without a lookup
+DEFAULT_ASSOCIATION_TYPE_IDS: Dict[Tuple[str, str], int] = {
+    ("contacts", "companies"): 279,
+    ("companies", "contacts"): 280,
+    ("contacts", "tickets"): 15,
+    ("tickets", "contacts"): 16,
+    ("companies", "tickets"): 340,
+    ("tickets", "companies"): 339,
+}
+
+class AssociationTypeRegistry:
+    """
+    Resolves association type IDs to the ``{"associationCategory", "associationTypeId"}``
+    pairs HubSpot expects when associating objects.
+
+    Default types between the standard objects come from a built-in table, whether they are
+    requested by omitting the type ID or by giving it. Other pairs, and other type IDs
+    (which may be user-defined labels), are looked up with
+    ``fetch_types`` (HubSpot's v4 labels endpoint) once per object type pair and cached
+    for ``ttl`` seconds.
+    """
+
+    def __init__(self, fetch_types: Callable[[str, str], Awaitable[List[Dict[str, Any]]]], ttl: float = 3600.0):
+        self.fetch_types = fetch_types
+        self.ttl = ttl
+        self._types: Dict[Tuple[str, str], Tuple[float, List[Dict[str, Any]]]] = {}
+        self.lookups = 0
+
+    async def _types_for(self, from_object_type: str, to_object_type: str) -> List[Dict[str, Any]]:
+        key = (from_object_type, to_object_type)
+        cached = self._types.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        self.lookups += 1
+        types = await self.fetch_types(from_object_type, to_object_type)
+        self._types[key] = (time.monotonic() + self.ttl, types)
+        return types
+
+    async def resolve(self, from_object_type: str, to_object_type: str, association_type_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Returns the association type for ``association_type_id``, or the pair's default
+        unlabeled type when it is omitted. Raises a 422 HTTPException when the ID is not
+        numeric or HubSpot does not know the type.
+        """
+        if association_type_id is not None and not str(association_type_id).strip().isdigit():
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Association type ID '{association_type_id}' is not a number",
+            )
+        default_id = DEFAULT_ASSOCIATION_TYPE_IDS.get((from_object_type, to_object_type))
+        if default_id is not None and (association_type_id is None or int(association_type_id) == default_id):
+            return {"associationCategory": HUBSPOT_DEFINED, "associationTypeId": default_id}
+        types = await self._types_for(from_object_type, to_object_type)
+        for association_type in types:
+            if association_type_id is None:
+                matches = association_type.get("category") == HUBSPOT_DEFINED and not association_type.get("label")
+            else:
+                matches = str(association_type.get("typeId")) == str(association_type_id).strip()
+            if matches:
+                return {"associationCategory": association_type["category"], "associationTypeId": int(association_type["typeId"])}
+        wanted = f"association type {association_type_id}" if association_type_id is not None else "default association type"
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"HubSpot has no {wanted} from {from_object_type} to {to_object_type}",
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {"cached_pairs": len(self._types), "lookups": self.lookups}
@@ -0,0 +1,111 @@
+"""
+Compares the per-request overhead of the inbound rate limiter modes.
+
+Run with: python -m benchmarks.bench_rate_limiter [--requests 20000] [--clients 100]
+          [--concurrency 50] [--redis-url redis://localhost:6379/0] [--redis-latency-ms 0.5]
+
+Without --redis-url, the "redis" and "hybrid" modes talk to an in-process stand-in that
+applies the same token bucket after sleeping --redis-latency-ms per call, i.e. a simulated
+network round trip. Each mode prints one JSON line with mean and p99 microseconds per
+check and the number of Redis calls made.
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from typing import Any, Dict, List, Optional
+from starlette.requests import Request
+from rate_limiter import _REDIS_REFUND_SCRIPT, LeasedRateLimitBackend, MemoryRateLimitBackend, RateLimiter, RedisRateLimitBackend, parse_rate_limit
+from upstream_scheduler import TokenBucket
+
+class _SimulatedRedis:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    async def eval(self, script: str, numkeys: int, key: str, rate: float, burst: float, requested: int) -> List[Any]:
+        await asyncio.sleep(self.latency)
+        bucket = self._buckets.setdefault(key, TokenBucket(rate, burst))
+        bucket.time_until_available()  # refill
+        if script == _REDIS_REFUND_SCRIPT:
+            bucket.tokens = min(burst, bucket.tokens + requested)
+            return 1
+        granted = min(requested, math.floor(bucket.tokens))
+        bucket.tokens -= granted
+        return [granted, "0" if granted else str((1 - bucket.tokens) / rate)]
+
+    async def aclose(self) -> None:
+        pass
+
+class _Route:
+    path = "/contacts/{object_id}"
+
+def _request(client: int) -> Request:
+    headers = [(b"x-api-key", f"client-{client}".encode())]
+    return Request({"type": "http", "method": "GET", "path": "/contacts/1", "headers": headers, "client": ("10.0.0.1", 1), "route": _Route()})
+
+def _backend(mode: str, args: argparse.Namespace) -> Optional[Any]:
+    if mode == "none":
+        return None
+    if mode == "memory":
+        return MemoryRateLimitBackend()
+    redis = None if args.redis_url else _SimulatedRedis(args.redis_latency_ms / 1000)
+    redis_backend = RedisRateLimitBackend(args.redis_url or "", redis=redis)
+    if mode == "redis":
+        return redis_backend
+    return LeasedRateLimitBackend(redis_backend, lease_size=args.lease_size)
+
+async def _run(mode: str, args: argparse.Namespace) -> Dict[str, Any]:
+    backend = _backend(mode, args)
+    # A generous limit, so every mode does the same work and nothing is rejected. Only
+    # configured API keys get their own bucket, so every simulated client's key is listed
+    limit = parse_rate_limit("1000000/minute")
+    key_limits = {f"client-{client}": limit for client in range(args.clients)}
+    limiter = RateLimiter(backend, limit, key_limits=key_limits) if backend else None
+    requests = [_request(i % args.clients) for i in range(args.requests)]
+    durations: List[float] = []
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index
+        while next_index < len(requests):
+            request = requests[next_index]
+            next_index += 1
+            started = time.perf_counter()
+            if limiter:
+                await limiter.check(request)
+            durations.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    stats = limiter.stats() if limiter else {}
+    if limiter:
+        await limiter.aclose()
+    durations.sort()
+    return {
+        "mode": mode,
+        "requests": args.requests,
+        "clients": args.clients,
+        "mean_us": round(sum(durations) / len(durations) * 1e6, 2),
+        "p99_us": round(durations[int(len(durations) * 0.99) - 1] * 1e6, 2),
+        "checks_per_second": round(args.requests / elapsed),
+        "redis_calls": stats.get("round_trips", 0),
+        "limited": stats.get("limited", 0),
+    }
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--lease-size", type=int, default=20)
+    parser.add_argument("--redis-url", default=None, help="use a real Redis server instead of the simulated one")
+    parser.add_argument("--redis-latency-ms", type=float, default=0.5)
+    args = parser.parse_args()
+    for mode in ("none", "memory", "hybrid", "redis"):
+        print(json.dumps(await _run(mode, args)))
+
+if __name__ == "__main__":
+    asyncio.run(main())
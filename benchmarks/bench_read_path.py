@@ -0,0 +1,88 @@
+"""
+Compares CPU time and memory allocated per GET /contacts/{id} with the JSON passthrough on
+and off, for an object with many custom properties.
+
+Run with: python -m benchmarks.bench_read_path [--requests 2000] [--properties 500]
+
+The connector runs in-process against a HubSpot stand-in that returns the same object for
+every ID, with the object cache off so every request takes the full upstream path.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+import tracemalloc
+import httpx
+from config import settings
+from hubspot_client import HubSpotClient
+from main import app
+from upstream_scheduler import LANE_BATCH, LANE_CRM, LANE_SEARCH, UpstreamScheduler
+
+def _object_body(properties: int) -> bytes:
+    return json.dumps({
+        "id": "1",
+        "properties": {f"custom_property_{n}": f"value {n}" for n in range(properties)},
+        "createdAt": "2023-01-01T00:00:00Z",
+        "updatedAt": "2023-01-01T00:00:00Z",
+        "archived": False,
+    }).encode()
+
+async def _run(args: argparse.Namespace, passthrough: bool) -> dict:
+    body = _object_body(args.properties)
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body, headers={"Content-Type": "application/json"}))
+    # Generous buckets so the outbound rate limits do not pace the run
+    lanes = {LANE_CRM: (1e9, 1e9), LANE_SEARCH: (1e9, 1e9), LANE_BATCH: (1e9, 1e9)}
+    scheduler = UpstreamScheduler(lanes=lanes)
+    hubspot_client = HubSpotClient(http_client=httpx.AsyncClient(transport=transport), scheduler=scheduler)
+    app.state.hubspot_client = hubspot_client
+    settings.HUBSPOT_READ_PASSTHROUGH = passthrough
+    connector = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://connector")
+
+    async def get(i: int) -> None:
+        response = await connector.get(f"/contacts/{i}")
+        response.raise_for_status()
+
+    for i in range(50):  # warm up
+        await get(i)
+    cpu_started = time.process_time()
+    for i in range(args.requests):
+        await get(i)
+    cpu = time.process_time() - cpu_started
+
+    # Memory is measured separately, as tracing slows everything down: the peak of memory
+    # held above the starting point while one request is served
+    peaks = []
+    tracemalloc.start()
+    for i in range(args.allocation_requests):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await get(i)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    await connector.aclose()
+    await hubspot_client.aclose()
+    return {
+        "passthrough": passthrough,
+        "properties": args.properties,
+        "body_bytes": len(body),
+        "requests": args.requests,
+        "cpu_us_per_request": round(cpu / args.requests * 1e6, 1),
+        "peak_kib_per_request": round(sum(peaks) / len(peaks) / 1024, 1),
+    }
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--allocation-requests", type=int, default=200)
+    parser.add_argument("--properties", type=int, default=500)
+    args = parser.parse_args()
+    settings.OBJECT_CACHE_BACKEND = "none"
+    # Request logging would dominate the measurement
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    for passthrough in (False, True):
+        print(json.dumps(await _run(args, passthrough)))
+
+if __name__ == "__main__":
+    asyncio.run(main())
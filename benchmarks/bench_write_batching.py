@@ -0,0 +1,69 @@
+"""
+Compares upstream calls per record for concurrent creates with and without write batching.
+
+Run with: python -m benchmarks.bench_write_batching [--records 500] [--latency-ms 50]
+"""
+import argparse
+import asyncio
+import json
+import time
+import httpx
+from hubspot_client import HubSpotClient
+from models.contact_models import HubSpotContactOutput
+
+def _fake_object(object_id: int, properties: dict) -> dict:
+    return {
+        "id": str(object_id),
+        "properties": properties,
+        "createdAt": "2023-01-01T00:00:00Z",
+        "updatedAt": "2023-01-01T00:00:00Z",
+        "archived": False,
+    }
+
+class _FakeHubSpot:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self._next_id = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        body = json.loads(request.content)
+        if request.url.path.endswith("/batch/create"):
+            results = []
+            for item in body["inputs"]:
+                self._next_id += 1
+                results.append(dict(_fake_object(self._next_id, item["properties"]), objectWriteTraceId=item["objectWriteTraceId"]))
+            return httpx.Response(201, json={"status": "COMPLETE", "results": results})
+        self._next_id += 1
+        return httpx.Response(201, json=_fake_object(self._next_id, body["properties"]))
+
+async def _run(records: int, latency: float, batching: bool) -> dict:
+    fake = _FakeHubSpot(latency)
+    client = HubSpotClient(http_client=httpx.AsyncClient(transport=httpx.MockTransport(fake.handle)), write_batching=batching)
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client.create_object("contacts", {"email": f"user{i}@example.com"}, HubSpotContactOutput)
+        for i in range(records)
+    ))
+    elapsed = time.perf_counter() - started
+    await client.aclose()
+    return {
+        "batching": batching,
+        "records": records,
+        "upstream_calls": fake.calls,
+        "calls_per_record": round(fake.calls / records, 3),
+        "elapsed_seconds": round(elapsed, 3),
+    }
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+    for batching in (False, True):
+        print(json.dumps(await _run(args.records, args.latency_ms / 1000, batching)))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,265 @@
+"""
+In-memory stand-in for the HubSpot CRM API, used by the load harness.
+
+Covers the endpoints the connector calls: v3 objects (get, create, update, list), search
+(EQ, IN and GTE filters), batch create/update/upsert/read, and v4 association batch
+create/read and per-object association reads. Every response can be delayed (latency
+plus uniform jitter) and a configurable share of requests fails with 429 + Retry-After
+or with a 5xx, so retries and throttling are exercised too.
+
+Run standalone with: python -m benchmarks.fake_hubspot [--port 8900] [--latency-ms 50]
+and point the connector at it with HUBSPOT_API_BASE_URL=http://127.0.0.1:8900.
+"""
+import argparse
+import asyncio
+import random
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# Identifier properties that batch upsert may use as idProperty
+UNIQUE_PROPERTIES = {"contacts": "email"}
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+class FakeHubSpot:
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 1.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.objects: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.associations: Dict[tuple, Dict[str, List[Dict[str, Any]]]] = {}
+        self.calls: Counter = Counter()
+        self.throttled = 0
+        self.errors = 0
+        self._next_id = 1000
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def reset_counters(self) -> None:
+        self.calls.clear()
+        self.throttled = 0
+        self.errors = 0
+
+    def seed_objects(self, object_type: str, count: int, properties) -> List[str]:
+        """
+        Creates ``count`` objects; ``properties(i)`` returns the properties of the i-th one.
+        """
+        return [self._create(object_type, properties(i))["id"] for i in range(count)]
+
+    def associate(self, from_type: str, from_id: str, to_type: str, to_id: str, type_id: int = 1) -> None:
+        edge = {"toObjectId": int(to_id), "associationTypes": [{"category": "HUBSPOT_DEFINED", "typeId": type_id, "label": None}]}
+        self.associations.setdefault((from_type, to_type), {}).setdefault(str(from_id), []).append(edge)
+        reverse = {"toObjectId": int(from_id), "associationTypes": edge["associationTypes"]}
+        self.associations.setdefault((to_type, from_type), {}).setdefault(str(to_id), []).append(reverse)
+
+    def _create(self, object_type: str, properties: Dict[str, Any]) -> Dict[str, Any]:
+        self._next_id += 1
+        now = _now()
+        obj = {
+            "id": str(self._next_id),
+            "properties": dict(properties, hs_object_id=str(self._next_id), lastmodifieddate=now, hs_lastmodifieddate=now),
+            "createdAt": now,
+            "updatedAt": now,
+            "archived": False,
+        }
+        self.objects.setdefault(object_type, {})[obj["id"]] = obj
+        return obj
+
+    def _update(self, object_type: str, object_id: str, properties: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        obj = self.objects.get(object_type, {}).get(str(object_id))
+        if obj is None:
+            return None
+        now = _now()
+        obj["properties"].update(properties, lastmodifieddate=now, hs_lastmodifieddate=now)
+        obj["updatedAt"] = now
+        return obj
+
+    def _find(self, object_type: str, property_name: str, value: Any) -> Optional[Dict[str, Any]]:
+        wanted = str(value).lower()
+        for obj in self.objects.get(object_type, {}).values():
+            if str(obj["properties"].get(property_name, "")).lower() == wanted:
+                return obj
+        return None
+
+    @staticmethod
+    def _matches(obj: Dict[str, Any], filters: List[Dict[str, Any]]) -> bool:
+        for condition in filters:
+            value = obj["properties"].get(condition["propertyName"])
+            operator = condition.get("operator")
+            if operator == "EQ" and str(value).lower() != str(condition.get("value")).lower():
+                return False
+            if operator == "IN" and str(value).lower() not in {str(v).lower() for v in condition.get("values", [])}:
+                return False
+            if operator == "GTE" and (value is None or _to_ms(value) < int(condition.get("value"))):
+                return False
+        return True
+
+    async def inject_faults(self) -> Optional[JSONResponse]:
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        roll = self.random.random()
+        if roll < self.throttle_rate:
+            self.throttled += 1
+            return JSONResponse(
+                {"status": "error", "category": "RATE_LIMITS", "message": "You have reached your secondly limit."},
+                status_code=429,
+                headers={"Retry-After": str(self.retry_after)},
+            )
+        if roll < self.throttle_rate + self.error_rate:
+            self.errors += 1
+            return JSONResponse({"status": "error", "message": "Internal error"}, status_code=self.random.choice([500, 502, 503]))
+        return None
+
+def _to_ms(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return int(datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp() * 1000)
+
+def _page(items: List[Any], after: Optional[str], limit: int) -> Dict[str, Any]:
+    start = int(after or 0)
+    page: Dict[str, Any] = {"results": items[start:start + limit]}
+    if start + limit < len(items):
+        page["paging"] = {"next": {"after": str(start + limit)}}
+    return page
+
+def _not_found() -> JSONResponse:
+    return JSONResponse({"status": "error", "category": "OBJECT_NOT_FOUND", "message": "Object not found"}, status_code=404)
+
+def build_fake_hubspot_app(fake: FakeHubSpot) -> FastAPI:
+    app = FastAPI(title="Fake HubSpot")
+    app.state.fake = fake
+
+    @app.middleware("http")
+    async def count_and_inject_faults(request: Request, call_next):
+        fake.calls[f"{request.method} {_route_name(request.url.path)}"] += 1
+        failure = await fake.inject_faults()
+        return failure or await call_next(request)
+
+    @app.get("/crm/v3/objects/{object_type}")
+    async def list_objects(object_type: str, limit: int = 100, after: Optional[str] = None):
+        return _page(list(fake.objects.get(object_type, {}).values()), after, min(limit, 100))
+
+    @app.post("/crm/v3/objects/{object_type}", status_code=201)
+    async def create_object(object_type: str, request: Request):
+        return fake._create(object_type, (await request.json()).get("properties", {}))
+
+    @app.get("/crm/v3/objects/{object_type}/{object_id}")
+    async def get_object(object_type: str, object_id: str):
+        obj = fake.objects.get(object_type, {}).get(object_id)
+        return obj if obj is not None else _not_found()
+
+    @app.patch("/crm/v3/objects/{object_type}/{object_id}")
+    async def update_object(object_type: str, object_id: str, request: Request):
+        obj = fake._update(object_type, object_id, (await request.json()).get("properties", {}))
+        return obj if obj is not None else _not_found()
+
+    @app.post("/crm/v3/objects/{object_type}/search")
+    async def search(object_type: str, request: Request):
+        body = await request.json()
+        groups = body.get("filterGroups") or [{"filters": []}]
+        matches = [
+            obj for obj in fake.objects.get(object_type, {}).values()
+            if any(fake._matches(obj, group.get("filters", [])) for group in groups)
+        ]
+        for sort in reversed(body.get("sorts") or []):
+            matches.sort(key=lambda obj: str(obj["properties"].get(sort["propertyName"], "")), reverse=sort.get("direction") == "DESCENDING")
+        page = _page(matches, body.get("after"), min(body.get("limit", 10), 200))
+        page["total"] = len(matches)
+        return page
+
+    @app.post("/crm/v3/objects/{object_type}/batch/{operation}")
+    async def batch(object_type: str, operation: str, request: Request):
+        inputs = (await request.json()).get("inputs", [])
+        results, errors = [], []
+        for item in inputs:
+            if operation == "create":
+                obj = fake._create(object_type, item.get("properties", {}))
+            elif operation == "read":
+                obj = fake.objects.get(object_type, {}).get(str(item.get("id")))
+            elif operation == "update":
+                obj = fake._update(object_type, item.get("id"), item.get("properties", {}))
+            elif operation == "upsert":
+                id_property = item.get("idProperty") or UNIQUE_PROPERTIES.get(object_type, "hs_object_id")
+                existing = fake._find(object_type, id_property, item["id"])
+                if existing is not None:
+                    obj = dict(fake._update(object_type, existing["id"], item.get("properties", {})), new=False)
+                else:
+                    obj = dict(fake._create(object_type, dict(item.get("properties", {}), **{id_property: item["id"]})), new=True)
+            else:
+                return JSONResponse({"status": "error", "message": f"Unknown batch operation {operation}"}, status_code=400)
+            if obj is None:
+                errors.append({"status": "error", "category": "OBJECT_NOT_FOUND", "message": "Object not found", "context": {"ids": [str(item.get("id"))]}})
+                continue
+            if "objectWriteTraceId" in item:
+                obj = dict(obj, objectWriteTraceId=item["objectWriteTraceId"])
+            results.append(obj)
+        status_code = 207 if errors else (201 if operation == "create" else 200)
+        return JSONResponse({"status": "COMPLETE", "results": results, "errors": errors}, status_code=status_code)
+
+    @app.post("/crm/v4/associations/{from_type}/{to_type}/batch/create", status_code=201)
+    async def create_associations(from_type: str, to_type: str, request: Request):
+        results = []
+        for item in (await request.json()).get("inputs", []):
+            type_id = (item.get("types") or [{}])[0].get("associationTypeId", 1)
+            fake.associate(from_type, item["from"]["id"], to_type, item["to"]["id"], type_id)
+            results.append({"fromObjectId": int(item["from"]["id"]), "toObjectId": int(item["to"]["id"])})
+        return {"status": "COMPLETE", "results": results}
+
+    @app.post("/crm/v4/associations/{from_type}/{to_type}/batch/read")
+    async def read_associations(from_type: str, to_type: str, request: Request):
+        edges = fake.associations.get((from_type, to_type), {})
+        results = []
+        for item in (await request.json()).get("inputs", []):
+            to = edges.get(str(item["id"]))
+            if to:
+                results.append({"from": {"id": str(item["id"])}, "to": to[:500]})
+        return {"status": "COMPLETE", "results": results}
+
+    @app.get("/crm/v4/objects/{object_type}/{object_id}/associations/{to_type}")
+    async def get_associations(object_type: str, object_id: str, to_type: str, limit: int = 500, after: Optional[str] = None):
+        return _page(fake.associations.get((object_type, to_type), {}).get(object_id, []), after, limit)
+
+    return app
+
+def _route_name(path: str) -> str:
+    # Collapses IDs so call counts group by endpoint, e.g. "/crm/v3/objects/contacts/{id}"
+    parts = path.strip("/").split("/")
+    return "/" + "/".join("{id}" if part.isdigit() else part for part in parts)
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 5xx")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    fake = FakeHubSpot(args.latency_ms, args.jitter_ms, args.throttle_rate, args.retry_after, args.error_rate, args.seed)
+    uvicorn.run(build_fake_hubspot_app(fake), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Drives main.app against the fake HubSpot and reports throughput, latency percentiles and
+upstream calls per request for each scenario.
+
+Run with: python -m benchmarks.load_harness [--scenarios get,upsert] [--concurrency 50]
+          [--requests 1000] [--latency-ms 20] [--jitter-ms 10] [--throttle-rate 0.0]
+          [--error-rate 0.0] [--output bench_output.txt] [--baseline bench_output.txt]
+
+Both apps run in-process and talk through ASGI transports by default. Pass --network to
+serve the fake HubSpot with uvicorn on a local port so the connector's real connection
+pool and HTTP stack are exercised too. Each result is
+printed and appended as one JSON line to --output; --baseline compares the run with the
+latest earlier result for the same scenario and concurrency in that file.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import subprocess
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import httpx
+from config import settings
+from hubspot_client import HubSpotClient
+from main import app
+from routers.webhooks import build_webhook_pipeline
+from upstream_scheduler import LANE_BATCH, LANE_CRM, LANE_SEARCH, UpstreamScheduler
+from benchmarks.fake_hubspot import FakeHubSpot, build_fake_hubspot_app
+
+SEEDED_OBJECTS = 500
+
+RequestSpec = Tuple[str, str, Dict[str, Any]]
+
+def _scenarios(ids: Dict[str, List[str]], rng: random.Random) -> Dict[str, Callable[[int], RequestSpec]]:
+    contact_ids = ids["contacts"]
+    return {
+        "get": lambda i: ("GET", f"/contacts/{rng.choice(contact_ids)}", {}),
+        "upsert": lambda i: ("POST", "/contacts", {"json": {"email": f"user{i % (2 * SEEDED_OBJECTS)}@example.com", "firstname": f"Load {i}"}}),
+        "company_write": lambda i: ("POST", "/companies", {"json": {"name": f"Company {i}", "domain": f"company{i % (2 * SEEDED_OBJECTS)}.example.com"}}),
+        "batch_read": lambda i: ("POST", "/contacts/batch/read", {"json": {"ids": rng.sample(contact_ids, 50)}}),
+        "bulk": lambda i: ("POST", "/contacts/batch", {
+            "content": "\n".join(json.dumps({"email": f"bulk{i}-{n}@example.com"}) for n in range(100)),
+            "headers": {"Content-Type": "application/x-ndjson"},
+        }),
+        "export": lambda i: ("GET", "/contacts/export", {}),
+        "graph": lambda i: ("GET", f"/associations/graph/contacts/{rng.choice(contact_ids)}", {"params": {"path": "contacts->companies->tickets"}}),
+    }
+
+def _seed(fake: FakeHubSpot) -> Dict[str, List[str]]:
+    ids = {
+        "contacts": fake.seed_objects("contacts", SEEDED_OBJECTS, lambda i: {"email": f"user{i}@example.com", "firstname": f"User {i}"}),
+        "companies": fake.seed_objects("companies", SEEDED_OBJECTS // 5, lambda i: {"name": f"Company {i}", "domain": f"company{i}.example.com"}),
+        "tickets": fake.seed_objects("tickets", SEEDED_OBJECTS, lambda i: {"subject": f"Ticket {i}"}),
+    }
+    for n, contact_id in enumerate(ids["contacts"]):
+        fake.associate("contacts", contact_id, "companies", ids["companies"][n % len(ids["companies"])])
+    for n, ticket_id in enumerate(ids["tickets"]):
+        fake.associate("companies", ids["companies"][n % len(ids["companies"])], "tickets", ticket_id)
+    return ids
+
+def percentile(samples: List[float], p: float) -> float:
+    # Nearest-rank percentile of an already sorted list
+    if not samples:
+        return 0.0
+    return samples[max(0, math.ceil(p / 100 * len(samples)) - 1)]
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _build_client(args: argparse.Namespace, fake_app: Any) -> HubSpotClient:
+    scheduler = None
+    if not args.hubspot_limits:
+        # Generous buckets so the run measures the connector rather than the configured quota
+        lanes = {LANE_CRM: (10000.0, 10000.0), LANE_SEARCH: (10000.0, 10000.0), LANE_BATCH: (10000.0, 10000.0)}
+        scheduler = UpstreamScheduler(lanes=lanes, max_queue=100000, retry_base_delay=0.05, retry_max_delay=1.0)
+    if args.network:
+        return HubSpotClient(scheduler=scheduler)
+    transport = httpx.ASGITransport(app=fake_app)
+    return HubSpotClient(http_client=httpx.AsyncClient(transport=transport, timeout=60), scheduler=scheduler)
+
+async def run_scenario(name: str, args: argparse.Namespace, fake: FakeHubSpot, fake_app: Any, ids: Dict[str, List[str]]) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    build_request = _scenarios(ids, rng)[name]
+    hubspot_client = _build_client(args, fake_app)
+    app.state.hubspot_client = hubspot_client
+    app.state.webhook_pipeline = build_webhook_pipeline(hubspot_client)
+    await app.state.webhook_pipeline.start()
+    fake.reset_counters()
+
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal errors, next_index
+        while next_index < args.requests:
+            index = next_index
+            next_index += 1
+            method, url, kwargs = build_request(index)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                await response.aread()
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    connector = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://connector", timeout=120)
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker(connector) for _ in range(args.concurrency)))
+    finally:
+        elapsed = time.perf_counter() - started
+        await connector.aclose()
+        await app.state.webhook_pipeline.stop(drain=False)
+        await hubspot_client.aclose()
+
+    latencies.sort()
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_commit": _git_commit(),
+        "scenario": name,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(args.requests / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "upstream_calls_per_request": round(fake.total_calls / args.requests, 3),
+        "upstream_throttled": fake.throttled,
+        "upstream_errors": fake.errors,
+        "config": {
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "throttle_rate": args.throttle_rate,
+            "error_rate": args.error_rate,
+            "hubspot_limits": args.hubspot_limits,
+            "network": args.network,
+            "object_cache": settings.OBJECT_CACHE_BACKEND,
+            "write_batching": settings.HUBSPOT_WRITE_BATCHING,
+            "single_flight": settings.HUBSPOT_SINGLE_FLIGHT,
+            "hedging": settings.HUBSPOT_HEDGE_ENABLED,
+            "breaker_threshold": settings.HUBSPOT_BREAKER_FAILURE_THRESHOLD,
+        },
+    }
+
+def compare(result: Dict[str, Any], baseline: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Describes how a result differs from the latest baseline entry with the same scenario and concurrency.
+    """
+    previous = [entry for entry in baseline if entry["scenario"] == result["scenario"] and entry["concurrency"] == result["concurrency"]]
+    if not previous:
+        return None
+    before = previous[-1]
+    changes = []
+    for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "upstream_calls_per_request"):
+        old, new = before.get(key), result.get(key)
+        if old and new is not None:
+            changes.append(f"{key} {old} -> {new} ({(new - old) / old * 100:+.1f}%)")
+    return f"{result['scenario']} vs {before.get('git_commit') or before['timestamp']}: " + ", ".join(changes)
+
+def _load_results(path: str) -> List[Dict[str, Any]]:
+    try:
+        with open(path) as handle:
+            return [json.loads(line) for line in handle if line.strip()]
+    except FileNotFoundError:
+        return []
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="get,upsert,company_write,batch_read,graph")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--network", action="store_true", help="serve the fake HubSpot over a local TCP port")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--hubspot-limits", action="store_true", help="apply the configured HubSpot rate limits")
+    parser.add_argument("--output", default="bench_output.txt")
+    parser.add_argument("--baseline", default=None)
+    args = parser.parse_args()
+
+    baseline = _load_results(args.baseline) if args.baseline else []
+    fake = FakeHubSpot(args.latency_ms, args.jitter_ms, args.throttle_rate, args.retry_after, args.error_rate, seed=args.seed)
+    fake_app = build_fake_hubspot_app(fake)
+    ids = _seed(fake)
+
+    server = None
+    if args.network:
+        import uvicorn
+
+        server = uvicorn.Server(uvicorn.Config(fake_app, host="127.0.0.1", port=args.port, log_level="warning"))
+        server_task = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        settings.HUBSPOT_API_BASE_URL = f"http://127.0.0.1:{args.port}"
+    try:
+        for name in [name.strip() for name in args.scenarios.split(",") if name.strip()]:
+            result = await run_scenario(name, args, fake, fake_app, ids)
+            print(json.dumps(result))
+            comparison = compare(result, baseline)
+            if comparison:
+                print(comparison)
+            with open(args.output, "a") as handle:
+                handle.write(json.dumps(result) + "\n")
+    finally:
+        if server is not None:
+            server.should_exit = True
+            await server_task
+
+if __name__ == "__main__":
+    asyncio.run(main())
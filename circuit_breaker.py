@@ -0,0 +1,99 @@
+import logging
+import time
+from typing import Any, Dict, Optional
+from fastapi import HTTPException, status
+from config import settings
+from upstream_scheduler import LANE_BATCH, LANE_CRM, LANE_SEARCH
+
+logger = logging.getLogger(__name__)
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+class CircuitOpenError(HTTPException):
+    """
+    Raised instead of calling HubSpot while a lane's breaker is open. It is a 503 with
+    Retry-After, so routers report it like any other upstream failure.
+    """
+
+    def __init__(self, lane: str, retry_after: float):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"HubSpot {lane} calls are failing; circuit breaker is open",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+        self.lane = lane
+
+class CircuitBreaker:
+    """
+    Stops calls to an endpoint class once HubSpot keeps failing them.
+
+    ``failure_threshold`` consecutive failures (5xx responses and network errors) open the
+    breaker: calls then fail at once with ``CircuitOpenError`` instead of tying up a worker
+    until they time out. After ``reset_timeout`` seconds the breaker is half-open and lets
+    one probe call through per ``reset_timeout``; a probe that succeeds closes it, one that
+    fails opens it again. Any response below 500, including a 429, counts as a success.
+    """
+
+    def __init__(self, lane: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.lane = lane
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = BREAKER_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._next_probe_at = 0.0
+        self.opened = 0
+        self.rejected = 0
+
+    def check(self) -> None:
+        """
+        Raises ``CircuitOpenError`` unless a call may go to HubSpot now.
+        """
+        if self.state == BREAKER_CLOSED:
+            return
+        now = time.monotonic()
+        if self.state == BREAKER_OPEN and now - self._opened_at >= self.reset_timeout:
+            self.state = BREAKER_HALF_OPEN
+            self._next_probe_at = now
+        if self.state == BREAKER_HALF_OPEN and now >= self._next_probe_at:
+            # One probe per interval; a probe that never reports back only delays the next one
+            self._next_probe_at = now + self.reset_timeout
+            return
+        self.rejected += 1
+        wait = self._opened_at + self.reset_timeout - now if self.state == BREAKER_OPEN else self._next_probe_at - now
+        raise CircuitOpenError(self.lane, wait)
+
+    def record(self, success: bool) -> None:
+        if success:
+            if self.state != BREAKER_CLOSED:
+                logger.info(f"HubSpot {self.lane} circuit breaker closed")
+            self.state = BREAKER_CLOSED
+            self._failures = 0
+            return
+        self._failures += 1
+        if self.state == BREAKER_HALF_OPEN or (self.state == BREAKER_CLOSED and self._failures >= self.failure_threshold):
+            self.state = BREAKER_OPEN
+            self._opened_at = time.monotonic()
+            self.opened += 1
+            logger.warning(f"HubSpot {self.lane} circuit breaker opened after {self._failures} consecutive failures")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+def build_circuit_breakers() -> Optional[Dict[str, CircuitBreaker]]:
+    """
+    Creates one breaker per scheduler lane, or None when ``HUBSPOT_BREAKER_FAILURE_THRESHOLD`` is 0.
+    """
+    if settings.HUBSPOT_BREAKER_FAILURE_THRESHOLD <= 0:
+        return None
+    return {
+        lane: CircuitBreaker(lane, settings.HUBSPOT_BREAKER_FAILURE_THRESHOLD, settings.HUBSPOT_BREAKER_RESET_SECONDS)
+        for lane in (LANE_CRM, LANE_SEARCH, LANE_BATCH)
+    }
@@ -6,6 +6,123 @@ load_dotenv()
 class Settings:
     HUBSPOT_PRIVATE_APP_TOKEN: str = os.getenv("HUBSPOT_PRIVATE_APP_TOKEN", "")
     HUBSPOT_WEBHOOK_SECRET: str = os.getenv("HUBSPOT_WEBHOOK_SECRET", "")
+    # Webhook signatures cover the URL HubSpot called. Behind a TLS-terminating proxy, set the
+    # public base URL (e.g. "https://connector.example.com") or trust the proxy's X-Forwarded-* headers
+    WEBHOOK_PUBLIC_BASE_URL: str = os.getenv("WEBHOOK_PUBLIC_BASE_URL", "")
+    WEBHOOK_TRUST_FORWARDED_HEADERS: bool = os.getenv("WEBHOOK_TRUST_FORWARDED_HEADERS", "false").lower() == "true"
     RATE_LIMIT: str = os.getenv("RATE_LIMIT", "100/minute") # Default to 100 requests per minute
+    # Inbound rate limiting: "memory" (per process), "hybrid" (tokens leased from Redis in batches),
+    # "redis" (one Redis call per request) or "none"
+    RATE_LIMIT_MODE: str = os.getenv("RATE_LIMIT_MODE", "memory")
+    RATE_LIMIT_ROUTES: str = os.getenv("RATE_LIMIT_ROUTES", "POST /webhooks/hubspot=none,GET /metrics=none") # "[METHOD ]/route=limit" overrides
+    RATE_LIMIT_API_KEYS: str = os.getenv("RATE_LIMIT_API_KEYS", "") # "api_key=limit" overrides
+    RATE_LIMIT_KEY_HEADER: str = os.getenv("RATE_LIMIT_KEY_HEADER", "X-API-Key") # clients without a key from RATE_LIMIT_API_KEYS are limited by address
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = os.getenv("RATE_LIMIT_TRUST_FORWARDED_FOR", "false").lower() == "true" # address from the first X-Forwarded-For hop
+    RATE_LIMIT_SHARDS: int = int(os.getenv("RATE_LIMIT_SHARDS", "16"))
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+    RATE_LIMIT_LEASE_SIZE: int = int(os.getenv("RATE_LIMIT_LEASE_SIZE", "20")) # tokens a worker takes from Redis at once
+    RATE_LIMIT_LEASE_TTL_SECONDS: float = float(os.getenv("RATE_LIMIT_LEASE_TTL_SECONDS", "1"))
+    # Points the connector at another HubSpot-compatible server, e.g. benchmarks/fake_hubspot.py
+    HUBSPOT_API_BASE_URL: str = os.getenv("HUBSPOT_API_BASE_URL", "https://api.hubapi.com").rstrip("/")
+
+    # Upstream HTTP connection pool shared by every router
+    HUBSPOT_HTTP2: bool = os.getenv("HUBSPOT_HTTP2", "true").lower() == "true"
+    HUBSPOT_MAX_CONNECTIONS: int = int(os.getenv("HUBSPOT_MAX_CONNECTIONS", "100"))
+    HUBSPOT_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HUBSPOT_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    HUBSPOT_KEEPALIVE_EXPIRY: float = float(os.getenv("HUBSPOT_KEEPALIVE_EXPIRY", "30"))
+    HUBSPOT_CONNECT_TIMEOUT: float = float(os.getenv("HUBSPOT_CONNECT_TIMEOUT", "5"))
+    HUBSPOT_READ_TIMEOUT: float = float(os.getenv("HUBSPOT_READ_TIMEOUT", "30"))
+    HUBSPOT_WRITE_TIMEOUT: float = float(os.getenv("HUBSPOT_WRITE_TIMEOUT", "30"))
+    HUBSPOT_POOL_TIMEOUT: float = float(os.getenv("HUBSPOT_POOL_TIMEOUT", "10"))
+
+    # Per-lane circuit breaker: consecutive 5xx/network failures that stop calls (0 disables it)
+    HUBSPOT_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("HUBSPOT_BREAKER_FAILURE_THRESHOLD", "5"))
+    HUBSPOT_BREAKER_RESET_SECONDS: float = float(os.getenv("HUBSPOT_BREAKER_RESET_SECONDS", "30"))
+
+    # Opt-in hedging: idempotent reads slower than the lane's latency percentile are sent twice
+    HUBSPOT_HEDGE_ENABLED: bool = os.getenv("HUBSPOT_HEDGE_ENABLED", "false").lower() == "true"
+    HUBSPOT_HEDGE_PERCENTILE: float = float(os.getenv("HUBSPOT_HEDGE_PERCENTILE", "95"))
+    HUBSPOT_HEDGE_MIN_DELAY_MS: float = float(os.getenv("HUBSPOT_HEDGE_MIN_DELAY_MS", "50"))
+    HUBSPOT_HEDGE_MIN_SAMPLES: int = int(os.getenv("HUBSPOT_HEDGE_MIN_SAMPLES", "50"))
+
+    # GET /{object_type}/{id} returns HubSpot's JSON as is instead of validating it into the response model
+    HUBSPOT_READ_PASSTHROUGH: bool = os.getenv("HUBSPOT_READ_PASSTHROUGH", "true").lower() == "true"
+
+    # Identical concurrent reads share one upstream call
+    HUBSPOT_SINGLE_FLIGHT: bool = os.getenv("HUBSPOT_SINGLE_FLIGHT", "true").lower() == "true"
+
+    # Opt-in coalescing of concurrent creates/updates into HubSpot batch calls
+    HUBSPOT_WRITE_BATCHING: bool = os.getenv("HUBSPOT_WRITE_BATCHING", "false").lower() == "true"
+    HUBSPOT_WRITE_BATCH_WINDOW_MS: float = float(os.getenv("HUBSPOT_WRITE_BATCH_WINDOW_MS", "20"))
+    HUBSPOT_WRITE_BATCH_MAX_SIZE: int = int(os.getenv("HUBSPOT_WRITE_BATCH_MAX_SIZE", "100"))
+
+    # Writes are compared with the last known state (object cache or mirror): unchanged ones are skipped, updates send only changed properties
+    HUBSPOT_WRITE_SUPPRESSION: bool = os.getenv("HUBSPOT_WRITE_SUPPRESSION", "false").lower() == "true" # only safe when webhooks keep the cache or mirror current
+
+    # Bulk ingestion (POST /{object_type}/batch)
+    BULK_CHUNK_SIZE: int = int(os.getenv("BULK_CHUNK_SIZE", "100")) # HubSpot batch endpoints accept at most 100 inputs
+    BULK_MAX_CONCURRENCY: int = int(os.getenv("BULK_MAX_CONCURRENCY", "4"))
+
+    # Batch reads (POST /{object_type}/batch/read)
+    BATCH_READ_MAX_IDS: int = int(os.getenv("BATCH_READ_MAX_IDS", "1000")) # IDs accepted by one batch read request
+    BATCH_READ_MAX_CONCURRENCY: int = int(os.getenv("BATCH_READ_MAX_CONCURRENCY", "4")) # upstream batch/read calls in flight per request
+
+    # Association graph expansion (GET /associations/graph/...)
+    GRAPH_MAX_NODES: int = int(os.getenv("GRAPH_MAX_NODES", "1000"))
+    ASSOCIATION_TYPES_TTL_SECONDS: float = float(os.getenv("ASSOCIATION_TYPES_TTL_SECONDS", "3600")) # looked-up association types are cached this long
+
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+    # Read-through cache for GET /{object_type}/{id}: "memory", "redis" or "none"
+    OBJECT_CACHE_BACKEND: str = os.getenv("OBJECT_CACHE_BACKEND", "memory")
+    OBJECT_CACHE_TTL_SECONDS: float = float(os.getenv("OBJECT_CACHE_TTL_SECONDS", "60"))
+    OBJECT_CACHE_MAX_ENTRIES: int = int(os.getenv("OBJECT_CACHE_MAX_ENTRIES", "10000"))
+    OBJECT_CACHE_STALE_SECONDS: float = float(os.getenv("OBJECT_CACHE_STALE_SECONDS", "300")) # expired entries kept for reads while HubSpot is failing
+
+    # Identifier -> ID index consulted before the search API ("object_type:property" pairs)
+    ID_INDEX_PROPERTIES: str = os.getenv("ID_INDEX_PROPERTIES", "contacts:email,companies:domain")
+    ID_INDEX_MAX_ENTRIES: int = int(os.getenv("ID_INDEX_MAX_ENTRIES", "100000")) # 0 disables the index
+
+    # Outbound request scheduler: per-lane token buckets (requests per second / burst size)
+    HUBSPOT_CRM_RATE_PER_SECOND: float = float(os.getenv("HUBSPOT_CRM_RATE_PER_SECOND", "10"))
+    HUBSPOT_CRM_BURST: float = float(os.getenv("HUBSPOT_CRM_BURST", "100"))
+    HUBSPOT_SEARCH_RATE_PER_SECOND: float = float(os.getenv("HUBSPOT_SEARCH_RATE_PER_SECOND", "4"))
+    HUBSPOT_SEARCH_BURST: float = float(os.getenv("HUBSPOT_SEARCH_BURST", "4"))
+    HUBSPOT_BATCH_RATE_PER_SECOND: float = float(os.getenv("HUBSPOT_BATCH_RATE_PER_SECOND", "5"))
+    HUBSPOT_BATCH_BURST: float = float(os.getenv("HUBSPOT_BATCH_BURST", "20"))
+    HUBSPOT_SCHEDULER_MAX_QUEUE: int = int(os.getenv("HUBSPOT_SCHEDULER_MAX_QUEUE", "1000"))
+    HUBSPOT_MAX_RETRIES: int = int(os.getenv("HUBSPOT_MAX_RETRIES", "3"))
+    HUBSPOT_RETRY_BASE_DELAY: float = float(os.getenv("HUBSPOT_RETRY_BASE_DELAY", "0.5"))
+    HUBSPOT_RETRY_MAX_DELAY: float = float(os.getenv("HUBSPOT_RETRY_MAX_DELAY", "10"))
+
+    # Asynchronous webhook processing
+    WEBHOOK_WORKERS: int = int(os.getenv("WEBHOOK_WORKERS", "4"))
+    WEBHOOK_MAX_QUEUE: int = int(os.getenv("WEBHOOK_MAX_QUEUE", "1000")) # queued batches (up to 100 events each)
+    WEBHOOK_DEDUPE_SIZE: int = int(os.getenv("WEBHOOK_DEDUPE_SIZE", "100000")) # remembered eventIds
+    WEBHOOK_DRAIN_TIMEOUT: float = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "10"))
+    WEBHOOK_REFRESH_WINDOW_MS: float = float(os.getenv("WEBHOOK_REFRESH_WINDOW_MS", "1000")) # 0 disables refreshes
+
+    # Optional local SQLite mirror of CRM objects used to serve reads
+    MIRROR_ENABLED: bool = os.getenv("MIRROR_ENABLED", "false").lower() == "true"
+    MIRROR_PATH: str = os.getenv("MIRROR_PATH", "hubspot_mirror.sqlite3")
+    MIRROR_OBJECT_TYPES: str = os.getenv("MIRROR_OBJECT_TYPES", "contacts,companies,tickets")
+    MIRROR_SWEEP_INTERVAL_SECONDS: float = float(os.getenv("MIRROR_SWEEP_INTERVAL_SECONDS", "60"))
+    MIRROR_MAX_STALENESS_SECONDS: float = float(os.getenv("MIRROR_MAX_STALENESS_SECONDS", "300")) # older mirrors fall back to HubSpot
+
+    # Durable queue for writes accepted with 202 (POST /{object_type} with "Prefer: respond-async")
+    WRITE_QUEUE_ENABLED: bool = os.getenv("WRITE_QUEUE_ENABLED", "false").lower() == "true"
+    WRITE_QUEUE_PATH: str = os.getenv("WRITE_QUEUE_PATH", "hubspot_write_queue.sqlite3")
+    WRITE_QUEUE_WORKERS: int = int(os.getenv("WRITE_QUEUE_WORKERS", "2"))
+    WRITE_QUEUE_BATCH_SIZE: int = int(os.getenv("WRITE_QUEUE_BATCH_SIZE", "100")) # HubSpot batch endpoints accept at most 100 inputs
+    WRITE_QUEUE_MAX_DEPTH: int = int(os.getenv("WRITE_QUEUE_MAX_DEPTH", "10000")) # unfinished jobs before new writes get 503
+    WRITE_QUEUE_MAX_ATTEMPTS: int = int(os.getenv("WRITE_QUEUE_MAX_ATTEMPTS", "5"))
+    WRITE_QUEUE_LEASE_SECONDS: float = float(os.getenv("WRITE_QUEUE_LEASE_SECONDS", "120")) # a claimed job is taken over by another worker after this long without renewal
+    WRITE_QUEUE_RETENTION_SECONDS: float = float(os.getenv("WRITE_QUEUE_RETENTION_SECONDS", "86400")) # finished jobs kept for status lookups
+
+    # Results of writes sent with an Idempotency-Key header, replayed to retries: "memory", "redis" or "none"
+    IDEMPOTENCY_BACKEND: str = os.getenv("IDEMPOTENCY_BACKEND", "memory")
+    IDEMPOTENCY_TTL_SECONDS: float = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    IDEMPOTENCY_MAX_ENTRIES: int = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+    IDEMPOTENCY_LOCK_SECONDS: float = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60")) # how long a key stays claimed by a request that never finishes
 
 settings = Settings()
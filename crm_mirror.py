@@ -0,0 +1,372 @@
+import asyncio
+import logging
+import orjson
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from config import settings
+from id_index import parse_tracked_properties
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+# Export cursors handed out by the mirror; they are never sent to HubSpot
+MIRROR_CURSOR_PREFIX = "mirror:"
+
+# Property HubSpot bumps on every change; contacts predate the "hs_" naming
+MODIFIED_DATE_PROPERTIES = {"contacts": "lastmodifieddate"}
+DEFAULT_MODIFIED_DATE_PROPERTY = "hs_lastmodifieddate"
+
+# HubSpot's search API stops paging after 10,000 results
+SEARCH_RESULT_CAP = 10000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    object_type TEXT NOT NULL,
+    object_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_at TEXT,
+    PRIMARY KEY (object_type, object_id)
+);
+CREATE TABLE IF NOT EXISTS identifiers (
+    object_type TEXT NOT NULL,
+    property TEXT NOT NULL,
+    value TEXT NOT NULL,
+    object_id TEXT NOT NULL,
+    PRIMARY KEY (object_type, property, value)
+);
+CREATE INDEX IF NOT EXISTS identifiers_by_object ON identifiers (object_type, object_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    object_type TEXT PRIMARY KEY,
+    watermark INTEGER,
+    synced_at REAL,
+    backfill_after TEXT,
+    backfilled INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+def modified_date_property(object_type: str) -> str:
+    return MODIFIED_DATE_PROPERTIES.get(object_type, DEFAULT_MODIFIED_DATE_PROPERTY)
+
+def _timestamp_ms(value: Any) -> Optional[int]:
+    """
+    Converts a HubSpot timestamp (ISO 8601 or epoch milliseconds) to epoch milliseconds.
+    """
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return int(datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp() * 1000)
+    except ValueError:
+        return None
+
+class MirrorStore(SQLiteStore):
+    """
+    SQLite storage for mirrored objects, their identifier values and the sync state.
+    """
+
+    def __init__(self, path: str, tracked_properties: Dict[str, List[str]]):
+        super().__init__(path, _SCHEMA)
+        self.tracked_properties = tracked_properties
+
+    def _upsert(self, object_type: str, objects: List[Dict[str, Any]]) -> None:
+        with self._db:
+            for obj in objects:
+                object_id = str(obj["id"])
+                self._db.execute(
+                    "INSERT OR REPLACE INTO objects (object_type, object_id, data, updated_at) VALUES (?, ?, ?, ?)",
+                    (object_type, object_id, orjson.dumps(obj).decode(), obj.get("updatedAt")),
+                )
+                self._db.execute("DELETE FROM identifiers WHERE object_type = ? AND object_id = ?", (object_type, object_id))
+                properties = obj.get("properties") or {}
+                for property_name in self.tracked_properties.get(object_type, []):
+                    if properties.get(property_name):
+                        self._db.execute(
+                            "INSERT OR REPLACE INTO identifiers (object_type, property, value, object_id) VALUES (?, ?, ?, ?)",
+                            (object_type, property_name, str(properties[property_name]).strip().lower(), object_id),
+                        )
+
+    def _delete(self, object_type: str, object_ids: List[str]) -> None:
+        with self._db:
+            for object_id in object_ids:
+                self._db.execute("DELETE FROM objects WHERE object_type = ? AND object_id = ?", (object_type, str(object_id)))
+                self._db.execute("DELETE FROM identifiers WHERE object_type = ? AND object_id = ?", (object_type, str(object_id)))
+
+    def _get(self, object_type: str, object_id: str) -> Optional[Dict[str, Any]]:
+        data = self._get_json(object_type, object_id)
+        return orjson.loads(data) if data is not None else None
+
+    def _get_json(self, object_type: str, object_id: str) -> Optional[str]:
+        row = self._db.execute("SELECT data FROM objects WHERE object_type = ? AND object_id = ?", (object_type, object_id)).fetchone()
+        return row[0] if row else None
+
+    def _find_id(self, object_type: str, property_name: str, value: str) -> Optional[str]:
+        row = self._db.execute(
+            "SELECT object_id FROM identifiers WHERE object_type = ? AND property = ? AND value = ?",
+            (object_type, property_name, str(value).strip().lower()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _page(self, object_type: str, after_id: str, limit: int) -> List[Dict[str, Any]]:
+        rows = self._db.execute(
+            "SELECT data FROM objects WHERE object_type = ? AND object_id > ? ORDER BY object_id LIMIT ?",
+            (object_type, after_id, limit),
+        ).fetchall()
+        return [orjson.loads(row[0]) for row in rows]
+
+    def _count(self, object_type: str) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM objects WHERE object_type = ?", (object_type,)).fetchone()[0]
+
+    def _load_state(self, object_type: str) -> Dict[str, Any]:
+        row = self._db.execute(
+            "SELECT watermark, synced_at, backfill_after, backfilled FROM sync_state WHERE object_type = ?", (object_type,)
+        ).fetchone()
+        if row is None:
+            return {"watermark": None, "synced_at": None, "backfill_after": None, "backfilled": False}
+        return {"watermark": row[0], "synced_at": row[1], "backfill_after": row[2], "backfilled": bool(row[3])}
+
+    def _save_state(self, object_type: str, state: Dict[str, Any]) -> None:
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sync_state (object_type, watermark, synced_at, backfill_after, backfilled) VALUES (?, ?, ?, ?, ?)",
+                (object_type, state["watermark"], state["synced_at"], state["backfill_after"], int(state["backfilled"])),
+            )
+
+    async def upsert(self, object_type: str, objects: List[Dict[str, Any]]) -> None:
+        if objects:
+            await self._run(self._upsert, object_type, objects)
+
+    async def delete(self, object_type: str, object_ids: List[str]) -> None:
+        await self._run(self._delete, object_type, object_ids)
+
+    async def get(self, object_type: str, object_id: str) -> Optional[Dict[str, Any]]:
+        return await self._run(self._get, object_type, str(object_id))
+
+    async def get_json(self, object_type: str, object_id: str) -> Optional[str]:
+        return await self._run(self._get_json, object_type, str(object_id))
+
+    async def find_id(self, object_type: str, property_name: str, value: str) -> Optional[str]:
+        return await self._run(self._find_id, object_type, property_name, value)
+
+    async def page(self, object_type: str, after_id: str, limit: int) -> List[Dict[str, Any]]:
+        return await self._run(self._page, object_type, after_id, limit)
+
+    async def count(self, object_type: str) -> int:
+        return await self._run(self._count, object_type)
+
+    async def load_state(self, object_type: str) -> Dict[str, Any]:
+        return await self._run(self._load_state, object_type)
+
+    async def save_state(self, object_type: str, state: Dict[str, Any]) -> None:
+        await self._run(self._save_state, object_type, dict(state))
+
+class CrmMirror:
+    """
+    Keeps a local copy of selected CRM object types and serves reads from it.
+
+    Each type is backfilled once by paging through HubSpot's object list (resumable
+    across restarts), then kept current by periodic searches for objects whose
+    last-modified date is at or after the stored watermark, and by webhook refreshes and
+    deletions. A type counts as fresh while its last complete sweep is younger than
+    ``max_staleness`` seconds; reads of stale or unmirrored types return None so the
+    caller falls back to HubSpot.
+    """
+
+    def __init__(self, store: MirrorStore, object_types: List[str], sweep_interval: float = 60.0, max_staleness: float = 300.0):
+        self.store = store
+        self.object_types = object_types
+        self.sweep_interval = sweep_interval
+        self.max_staleness = max_staleness
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._counts: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale_fallbacks = 0
+        self.sweep_errors = 0
+
+    def mirrors(self, object_type: str) -> bool:
+        return object_type in self.object_types
+
+    def is_fresh(self, object_type: str) -> bool:
+        state = self._state.get(object_type)
+        if not state or not state["backfilled"] or state["synced_at"] is None:
+            return False
+        return time.time() - state["synced_at"] <= self.max_staleness
+
+    async def start(self, hubspot_client: Any) -> None:
+        for object_type in self.object_types:
+            self._state[object_type] = await self.store.load_state(object_type)
+        self._task = asyncio.get_running_loop().create_task(self._sync_forever(hubspot_client))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.store.close()
+
+    async def _sync_forever(self, hubspot_client: Any) -> None:
+        while True:
+            for object_type in self.object_types:
+                await self.sync(hubspot_client, object_type)
+            await asyncio.sleep(self.sweep_interval)
+
+    async def sync(self, hubspot_client: Any, object_type: str) -> None:
+        """
+        Runs the backfill (if unfinished) and one incremental sweep for a type.
+        """
+        try:
+            if not self._state[object_type]["backfilled"]:
+                await self._backfill(hubspot_client, object_type)
+            await self._sweep(hubspot_client, object_type)
+            self._counts[object_type] = await self.store.count(object_type)
+        except Exception as e:
+            self.sweep_errors += 1
+            logger.error(f"Mirror sync of {object_type} failed: {e}")
+
+    async def _backfill(self, hubspot_client: Any, object_type: str) -> None:
+        state = self._state[object_type]
+        if state["watermark"] is None:
+            # Changes made while the backfill runs are picked up by the first sweep
+            state["watermark"] = int(time.time() * 1000)
+        after = state["backfill_after"]
+        while True:
+            page = await hubspot_client.list_objects_page(object_type, after=after, use_mirror=False)
+            await self.store.upsert(object_type, page.get("results", []))
+            after = ((page.get("paging") or {}).get("next") or {}).get("after")
+            state["backfill_after"] = after
+            if not after:
+                state["backfilled"] = True
+            await self.store.save_state(object_type, state)
+            if not after:
+                logger.info(f"Mirror backfill of {object_type} finished")
+                return
+
+    async def _sweep(self, hubspot_client: Any, object_type: str) -> None:
+        state = self._state[object_type]
+        started_at = time.time()
+        property_name = modified_date_property(object_type)
+        since = state["watermark"] or 0
+        while True:
+            newest = since
+            after = None
+            capped = False
+            while True:
+                response = await hubspot_client.search_modified_since(object_type, property_name, since, after=after)
+                results = response.get("results", [])
+                await self.store.upsert(object_type, results)
+                for obj in results:
+                    modified = _timestamp_ms((obj.get("properties") or {}).get(property_name)) or _timestamp_ms(obj.get("updatedAt"))
+                    if modified is not None and modified > newest:
+                        newest = modified
+                after = ((response.get("paging") or {}).get("next") or {}).get("after")
+                if not after:
+                    break
+                if int(after) >= SEARCH_RESULT_CAP:
+                    capped = True
+                    break
+            # Results are sorted by modification date, so a capped sweep resumes from the newest one seen
+            state["watermark"] = newest
+            if not capped or newest == since:
+                break
+            since = newest
+        state["synced_at"] = started_at
+        await self.store.save_state(object_type, state)
+
+    async def _lookup(self, read, object_type: str, object_id: str) -> Any:
+        if not self.mirrors(object_type):
+            return None
+        if not self.is_fresh(object_type):
+            self.stale_fallbacks += 1
+            return None
+        obj = await read(object_type, object_id)
+        if obj is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return obj
+
+    async def get_object(self, object_type: str, object_id: str) -> Optional[Dict[str, Any]]:
+        return await self._lookup(self.store.get, object_type, object_id)
+
+    async def get_object_json(self, object_type: str, object_id: str) -> Optional[str]:
+        """
+        Like ``get_object``, but returns the stored JSON text without parsing it.
+        """
+        return await self._lookup(self.store.get_json, object_type, object_id)
+
+    async def get_stale_object(self, object_type: str, object_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the mirrored copy however old the last sweep is, for reads while HubSpot is failing.
+        """
+        if not self.mirrors(object_type):
+            return None
+        return await self.store.get(object_type, object_id)
+
+    async def find_object_id(self, object_type: str, property_name: str, value: str) -> Optional[str]:
+        if not self.mirrors(object_type) or not self.is_fresh(object_type):
+            return None
+        return await self.store.find_id(object_type, property_name, value)
+
+    def serves_page(self, object_type: str, after: Optional[str]) -> bool:
+        if after and after.startswith(MIRROR_CURSOR_PREFIX):
+            # An export that started on the mirror finishes there so its cursor stays valid
+            return True
+        return not after and self.mirrors(object_type) and self.is_fresh(object_type)
+
+    async def list_page(self, object_type: str, after: Optional[str], limit: int) -> Dict[str, Any]:
+        after_id = after[len(MIRROR_CURSOR_PREFIX):] if after else ""
+        results = await self.store.page(object_type, after_id, limit)
+        page: Dict[str, Any] = {"results": results}
+        if len(results) == limit:
+            page["paging"] = {"next": {"after": MIRROR_CURSOR_PREFIX + str(results[-1]["id"])}}
+        return page
+
+    async def store_objects(self, object_type: str, objects: Dict[str, Dict[str, Any]]) -> None:
+        if self.mirrors(object_type):
+            await self.store.upsert(object_type, list(objects.values()))
+
+    async def forget(self, object_type: str, object_ids: List[str]) -> None:
+        """
+        Drops objects that changed or were deleted; reads fall back to HubSpot until the
+        next sweep or webhook refresh stores them again.
+        """
+        if self.mirrors(object_type):
+            await self.store.delete(object_type, object_ids)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        types = {}
+        for object_type in self.object_types:
+            state = self._state.get(object_type) or {}
+            synced_at = state.get("synced_at")
+            types[object_type] = {
+                "objects": self._counts.get(object_type),
+                "backfilled": bool(state.get("backfilled")),
+                "fresh": self.is_fresh(object_type),
+                "watermark": state.get("watermark"),
+                "seconds_since_sync": round(now - synced_at, 1) if synced_at else None,
+            }
+        return {
+            "object_types": types,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_fallbacks": self.stale_fallbacks,
+            "sweep_errors": self.sweep_errors,
+        }
+
+def build_crm_mirror() -> Optional[CrmMirror]:
+    if not settings.MIRROR_ENABLED:
+        return None
+    object_types = [name.strip() for name in settings.MIRROR_OBJECT_TYPES.split(",") if name.strip()]
+    store = MirrorStore(settings.MIRROR_PATH, parse_tracked_properties(settings.ID_INDEX_PROPERTIES))
+    return CrmMirror(
+        store,
+        object_types,
+        sweep_interval=settings.MIRROR_SWEEP_INTERVAL_SECONDS,
+        max_staleness=settings.MIRROR_MAX_STALENESS_SECONDS,
+    )
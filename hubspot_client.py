@@ -1,61 +1,759 @@
+import asyncio
 import httpx
+import json
 import logging
-from typing import Dict, Any, Optional
+import math
+import orjson
+import time
+from typing import Dict, Any, List, Optional, Tuple, Union
+from fastapi import HTTPException, Request, status
 from config import settings
+from write_batcher import WriteBatcher, batch_error_exception
+from object_cache import ObjectCache, build_object_cache, project_object
+from id_index import IdIndex, build_id_index
+from upstream_scheduler import PRIORITY_LOW, PRIORITY_NORMAL, UpstreamScheduler, build_upstream_scheduler
+from crm_mirror import CrmMirror
+from circuit_breaker import CircuitBreaker, CircuitOpenError, build_circuit_breakers
+from request_hedger import RequestHedger, build_request_hedger
+from association_types import AssociationTypeRegistry
+from telemetry import UPSTREAM_QUEUE_WAIT, UPSTREAM_REQUEST_DURATION, UPSTREAM_RETRIES, inject_trace_headers, upstream_operation, upstream_span
 from models.contact_models import HubSpotContactOutput
 from models.company_models import HubSpotCompanyOutput
 from models.ticket_models import HubSpotTicketOutput
 
 logger = logging.getLogger(__name__)
 
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "PATCH", "DELETE"}
+# POST endpoints that read, or write with set-semantics, and are safe to repeat
+IDEMPOTENT_POST_SUFFIXES = ("/search", "/batch/read", "/batch/update", "/batch/upsert", "/batch/archive")
+# Reads that identical concurrent callers can share (single flight)
+SHAREABLE_METHODS = {"GET", "HEAD"}
+SHAREABLE_POST_SUFFIXES = ("/search", "/batch/read")
+# Maximum number of IDs HubSpot accepts in one batch read
+BATCH_READ_LIMIT = 100
+# Largest page HubSpot returns when listing objects, and when property history is included
+LIST_PAGE_LIMIT = 100
+LIST_PAGE_LIMIT_WITH_HISTORY = 50
+# Inputs per v4 association batch call, and the largest page of associations HubSpot returns
+ASSOCIATION_BATCH_LIMIT = 100
+ASSOCIATION_PAGE_LIMIT = 500
+
+def _property_value(value: Any) -> str:
+    # HubSpot stores every property as a string and clears a property set to null or ""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
 class HubSpotClient:
-    def __init__(self):
+    """
+    Application-scoped HubSpot API client.
+
+    A single instance owns one pooled ``httpx.AsyncClient`` so connections (and
+    HTTP/2 streams) are reused across requests. Create it once at startup, share it
+    between routers via ``get_hubspot_client`` and close it with ``aclose`` on shutdown.
+    """
+
+    def __init__(
+        self,
+        http_client: Optional[httpx.AsyncClient] = None,
+        write_batching: Optional[bool] = None,
+        object_cache: Optional[ObjectCache] = None,
+        id_index: Optional[IdIndex] = None,
+        scheduler: Optional[UpstreamScheduler] = None,
+        single_flight: Optional[bool] = None,
+        mirror: Optional[CrmMirror] = None,
+        breakers: Optional[Dict[str, CircuitBreaker]] = None,
+        hedger: Optional[RequestHedger] = None,
+        write_suppression: Optional[bool] = None,
+    ):
         self.headers = {
             "Authorization": f"Bearer {settings.HUBSPOT_PRIVATE_APP_TOKEN}",
             "Content-Type": "application/json"
         }
+        self.http2 = settings.HUBSPOT_HTTP2 and _http2_available()
+        if settings.HUBSPOT_HTTP2 and not self.http2:
+            logger.warning("HUBSPOT_HTTP2 is enabled but the 'h2' package is not installed; falling back to HTTP/1.1")
+        self._client = http_client or httpx.AsyncClient(
+            http2=self.http2,
+            headers=self.headers,
+            limits=httpx.Limits(
+                max_connections=settings.HUBSPOT_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HUBSPOT_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HUBSPOT_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                connect=settings.HUBSPOT_CONNECT_TIMEOUT,
+                read=settings.HUBSPOT_READ_TIMEOUT,
+                write=settings.HUBSPOT_WRITE_TIMEOUT,
+                pool=settings.HUBSPOT_POOL_TIMEOUT,
+            ),
+        )
+        self._in_flight = 0
+        self._requests_sent = 0
+        if write_batching is None:
+            write_batching = settings.HUBSPOT_WRITE_BATCHING
+        self.write_batcher = WriteBatcher(
+            self._send_write_batch,
+            window=settings.HUBSPOT_WRITE_BATCH_WINDOW_MS / 1000,
+            max_batch_size=settings.HUBSPOT_WRITE_BATCH_MAX_SIZE,
+        ) if write_batching else None
+        self.object_cache = object_cache if object_cache is not None else build_object_cache()
+        self.id_index = id_index if id_index is not None else build_id_index()
+        self.scheduler = scheduler or build_upstream_scheduler()
+        self.single_flight = settings.HUBSPOT_SINGLE_FLIGHT if single_flight is None else single_flight
+        self.mirror = mirror
+        self.breakers = breakers if breakers is not None else build_circuit_breakers()
+        self.hedger = hedger if hedger is not None else build_request_hedger()
+        self._stale_reads = 0
+        self.association_types = AssociationTypeRegistry(self._read_association_types, settings.ASSOCIATION_TYPES_TTL_SECONDS)
+        self.write_suppression = settings.HUBSPOT_WRITE_SUPPRESSION if write_suppression is None else write_suppression
+        self._writes_checked = 0
+        self._writes_skipped = 0
+        self._writes_trimmed = 0
+        self._properties_skipped = 0
+        self._flights: Dict[str, asyncio.Future] = {}
+        self._flight_leaders = 0
+        self._flight_coalesced = 0
+
+    async def aclose(self) -> None:
+        if self.write_batcher:
+            await self.write_batcher.flush()
+        if self.object_cache:
+            await self.object_cache.aclose()
+        await self._client.aclose()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """
+        Returns a snapshot of the upstream connection pool.
+        """
+        pool = getattr(self._client._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "http2": self.http2,
+            "max_connections": settings.HUBSPOT_MAX_CONNECTIONS,
+            "max_keepalive_connections": settings.HUBSPOT_MAX_KEEPALIVE_CONNECTIONS,
+            "open_connections": len(connections),
+            "idle_connections": idle,
+            "active_connections": len(connections) - idle,
+            "queued_requests": len(getattr(pool, "_requests", [])),
+            "in_flight_requests": self._in_flight,
+            "requests_sent": self._requests_sent,
+        }
+
+    def single_flight_stats(self) -> Dict[str, Any]:
+        calls = self._flight_leaders + self._flight_coalesced
+        return {
+            "enabled": self.single_flight,
+            "in_flight": len(self._flights),
+            "upstream_calls": self._flight_leaders,
+            "coalesced": self._flight_coalesced,
+            "coalesced_ratio": round(self._flight_coalesced / calls, 4) if calls else 0.0,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"pool": self.pool_stats(), "scheduler": self.scheduler.stats(), "single_flight": self.single_flight_stats()}
+        if self.write_batcher:
+            stats["write_batching"] = self.write_batcher.stats()
+        if self.object_cache:
+            stats["object_cache"] = self.object_cache.stats()
+        if self.id_index:
+            stats["id_index"] = self.id_index.stats()
+        if self.mirror:
+            stats["mirror"] = self.mirror.stats()
+        if self.breakers:
+            stats["circuit_breakers"] = dict(
+                {lane: breaker.stats() for lane, breaker in self.breakers.items()},
+                stale_reads=self._stale_reads,
+            )
+        if self.hedger:
+            stats["hedging"] = self.hedger.stats()
+        stats["association_types"] = self.association_types.stats()
+        if self.write_suppression:
+            stats["write_suppression"] = {
+                "checked": self._writes_checked,
+                "skipped": self._writes_skipped,
+                "trimmed": self._writes_trimmed,
+                "properties_skipped": self._properties_skipped,
+            }
+        return stats
+
+    async def invalidate_cached_object(self, object_type: str, object_id: str) -> None:
+        if self.object_cache:
+            await self.object_cache.invalidate(object_type, str(object_id))
+        if self.mirror:
+            await self.mirror.forget(object_type, [str(object_id)])
+
+    async def _forget_stale_object(self, object_type: str, object_id: str) -> None:
+        # A 404 on a known ID means the record was deleted or merged: drop every local copy,
+        # so resolving the identifier again searches HubSpot instead of returning the same ID
+        await self.invalidate_cached_object(object_type, object_id)
+        if self.id_index:
+            self.id_index.forget_id(object_type, object_id, stale=True)
+
+    async def _remember_written(self, object_type: str, obj: Dict[str, Any]) -> None:
+        # A write's response is the object's state right after it, so an identical write that
+        # follows can be suppressed
+        if self.object_cache and obj.get("id") and obj.get("properties"):
+            await self.object_cache.merge_properties(object_type, str(obj["id"]), obj)
+
+    async def store_refreshed_objects(self, object_type: str, objects: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Receives objects fetched again after webhooks and keeps the mirror current.
+        """
+        if self.mirror:
+            await self.mirror.store_objects(object_type, objects)
+
+    async def invalidate_cached_associations(self, object_type: str, object_id: str, to_object_type: str) -> None:
+        if self.object_cache:
+            await self.object_cache.invalidate_associations(object_type, str(object_id), to_object_type)
+
+    def _index_object(self, object_type: str, obj: Dict[str, Any]) -> None:
+        if self.id_index:
+            self.id_index.record_object(object_type, obj)
+
+    def forget_object_ids(self, object_type: str, object_ids: List[str]) -> None:
+        """
+        Drops identifier index entries for objects that were deleted or merged.
+        """
+        if self.id_index:
+            for object_id in object_ids:
+                self.id_index.forget_id(object_type, object_id)
+
+    def reindex_object_property(self, object_type: str, object_id: str, property_name: str, value: Optional[str]) -> None:
+        """
+        Applies an identifier property change (e.g. a new email) reported by a webhook.
+        """
+        if self.id_index and self.id_index.tracks(object_type, property_name):
+            self.id_index.forget_id(object_type, object_id)
+            if value:
+                self.id_index.put(object_type, property_name, value, object_id)
 
     def _get_object_url(self, object_type: str) -> str:
-        return f"https://api.hubapi.com/crm/v3/objects/{object_type}"
+        return f"{settings.HUBSPOT_API_BASE_URL}/crm/v3/objects/{object_type}"
 
-    async def _make_request(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
-        async with httpx.AsyncClient() as client:
+    @staticmethod
+    def _projection_params(
+        properties: Optional[List[str]] = None,
+        properties_with_history: Optional[List[str]] = None,
+        associations: Optional[List[str]] = None,
+    ) -> Dict[str, str]:
+        params = {}
+        if properties:
+            params["properties"] = ",".join(properties)
+        if properties_with_history:
+            params["propertiesWithHistory"] = ",".join(properties_with_history)
+        if associations:
+            params["associations"] = ",".join(associations)
+        return params
+
+    @staticmethod
+    def _is_idempotent(method: str, url: str) -> bool:
+        if method in IDEMPOTENT_METHODS:
+            return True
+        return method == "POST" and url.endswith(IDEMPOTENT_POST_SUFFIXES)
+
+    @staticmethod
+    def _is_shareable(method: str, url: str) -> bool:
+        if method in SHAREABLE_METHODS:
+            return True
+        return method == "POST" and url.endswith(SHAREABLE_POST_SUFFIXES)
+
+    async def _make_request(self, method: str, url: str, priority: int = PRIORITY_NORMAL, raw: bool = False, **kwargs) -> Any:
+        """
+        Sends a request through the scheduler. Identical concurrent reads (same method, URL,
+        query and body) share one upstream call and its result or error; callers must
+        therefore treat the returned data as read-only. With ``raw`` the response body is
+        returned as bytes instead of being parsed.
+        """
+        if not self.single_flight or not self._is_shareable(method, url):
+            return await self._send_request(method, url, priority, raw, **kwargs)
+        key = f"{method} {url} {raw} {json.dumps(kwargs, sort_keys=True, default=str)}"
+        flight = self._flights.get(key)
+        if flight is None:
+            self._flight_leaders += 1
+            # The upstream call runs as its own task so one caller going away does not cancel it for the others
+            flight = asyncio.ensure_future(self._send_request(method, url, priority, raw, **kwargs))
+            self._flights[key] = flight
+            flight.add_done_callback(lambda _: self._flights.pop(key, None))
+        else:
+            self._flight_coalesced += 1
+        return await asyncio.shield(flight)
+
+    async def _send_request(self, method: str, url: str, priority: int = PRIORITY_NORMAL, raw: bool = False, **kwargs) -> Any:
+        object_type, operation = upstream_operation(method, url)
+        with upstream_span(method, url, object_type, operation) as span:
+            if span is not None and span.is_recording():
+                kwargs["headers"] = inject_trace_headers(kwargs.get("headers"))
+            return await self._send_with_retries(method, url, priority, object_type, operation, raw, **kwargs)
+
+    async def _send_with_retries(self, method: str, url: str, priority: int, object_type: str, operation: str, raw: bool = False, **kwargs) -> Any:
+        lane = self.scheduler.lane_for(method, url)
+        idempotent = self._is_idempotent(method, url)
+        breaker = self.breakers.get(lane) if self.breakers else None
+        hedge = self.hedger is not None and self._is_shareable(method, url)
+        attempt = 0
+        while True:
+            if breaker:
+                breaker.check()
+            queued_at = time.perf_counter()
+            await self.scheduler.acquire(lane, priority)
+            started = time.perf_counter()
+            UPSTREAM_QUEUE_WAIT.observe(started - queued_at, lane)
+            self._in_flight += 1
+            self._requests_sent += 1
             try:
-                response = await client.request(method, url, headers=self.headers, **kwargs)
+                if hedge:
+                    response = await self.hedger.request(lane, lambda: self._client.request(method, url, **kwargs), lambda: self._take_hedge_token(lane))
+                else:
+                    response = await self._client.request(method, url, **kwargs)
+                elapsed = time.perf_counter() - started
+                UPSTREAM_REQUEST_DURATION.observe(elapsed, object_type, operation, str(response.status_code))
+                if hedge:
+                    self.hedger.observe(lane, elapsed)
+                retry_after = self.scheduler.observe(lane, response.status_code, response.headers)
                 response.raise_for_status()  # Raise an exception for 4xx/5xx responses
-                return response.json()
+                if breaker:
+                    breaker.record(True)
+                if raw:
+                    return response.content
+                return response.json() if response.content else {}
             except httpx.HTTPStatusError as e:
-                error_detail = f"HubSpot API error: {e.response.status_code} - {e.response.text}"
-                logger.error(f"Request failed: {method} {url}, Status: {e.response.status_code}, Response: {e.response.text}")
-                raise HTTPException(status_code=e.response.status_code, detail=error_detail)
+                status_code = e.response.status_code
+                if breaker:
+                    breaker.record(status_code < 500)
+                # A 429 means HubSpot did not process the request, so any call may be retried
+                retryable = status_code == status.HTTP_429_TOO_MANY_REQUESTS or (idempotent and status_code >= 500)
+                if retryable and retry_after is not None and retry_after > self.scheduler.retry_max_delay:
+                    # Waiting that long would hold the caller, its lane and any shared readers; let the client retry later
+                    logger.error(f"Not retrying {method} {url}: HubSpot asked to wait {retry_after:.0f}s after status {status_code}")
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail=f"HubSpot is throttling requests; retry in {math.ceil(retry_after)}s",
+                        headers={"Retry-After": str(math.ceil(retry_after))},
+                    )
+                if retryable and attempt < self.scheduler.max_retries:
+                    UPSTREAM_RETRIES.inc(object_type, operation, str(status_code))
+                    delay = self.scheduler.retry_delay(attempt, retry_after)
+                    logger.warning(f"Retrying {method} {url} in {delay:.2f}s after status {status_code} (attempt {attempt + 1})")
+                    attempt += 1
+                    await asyncio.sleep(delay)
+                    continue
+                error_detail = f"HubSpot API error: {status_code} - {e.response.text}"
+                logger.error(f"Request failed: {method} {url}, Status: {status_code}, Response: {e.response.text}")
+                headers = {"Retry-After": str(int(retry_after))} if retry_after is not None else None
+                raise HTTPException(status_code=status_code, detail=error_detail, headers=headers)
             except httpx.RequestError as e:
+                UPSTREAM_REQUEST_DURATION.observe(time.perf_counter() - started, object_type, operation, "network_error")
+                if breaker:
+                    breaker.record(False)
+                if idempotent and attempt < self.scheduler.max_retries:
+                    UPSTREAM_RETRIES.inc(object_type, operation, "network_error")
+                    delay = self.scheduler.retry_delay(attempt)
+                    logger.warning(f"Retrying {method} {url} in {delay:.2f}s after network error: {e} (attempt {attempt + 1})")
+                    attempt += 1
+                    await asyncio.sleep(delay)
+                    continue
                 error_detail = f"Network error during HubSpot API request: {e}"
                 logger.error(f"Request failed: {method} {url}, Error: {e}")
                 raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error_detail)
+            finally:
+                self._in_flight -= 1
+
+    def _take_hedge_token(self, lane: str) -> bool:
+        # A hedge is only sent if it fits in the lane's rate budget without waiting
+        if not self.scheduler.try_acquire(lane):
+            return False
+        self._requests_sent += 1
+        return True
 
-    async def get_object_by_id(self, object_type: str, object_id: str, output_model: Any) -> Optional[Any]:
+    async def _stale_object(self, object_type: str, object_id: str, error: CircuitOpenError, properties: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Answers a read that the open circuit breaker stopped with an expired cached copy or
+        the mirrored copy, if there is one (carrying every selected property); re-raises
+        ``error`` otherwise.
+        """
+        stale = await self.object_cache.get_stale(object_type, object_id) if self.object_cache else None
+        if stale is None and self.mirror:
+            stale = await self.mirror.get_stale_object(object_type, object_id)
+        if stale is not None and properties:
+            stale = project_object(stale, properties)
+        if stale is None:
+            raise error
+        self._stale_reads += 1
+        logger.warning(f"Serving a stale copy of {object_type} {object_id}: {error.detail}")
+        return stale
+
+    async def get_object_json(
+        self,
+        object_type: str,
+        object_id: str,
+        properties: Optional[List[str]] = None,
+        properties_with_history: Optional[List[str]] = None,
+        associations: Optional[List[str]] = None,
+    ) -> Optional[bytes]:
+        """
+        Returns an object as JSON bytes, or None if HubSpot does not know it.
+
+        Unlike ``get_object_by_id`` no model is built: a fetched body is handed back exactly
+        as HubSpot sent it, a mirrored one as stored and a cached one is encoded with orjson. The body
+        is only parsed when it has to be stored in the object cache.
+
+        ``properties``, ``properties_with_history`` and ``associations`` are passed to HubSpot
+        so only the selected data is fetched.
+        """
+        if properties or properties_with_history or associations:
+            return await self._get_projected_json(object_type, object_id, properties, properties_with_history, associations)
+        if self.mirror:
+            mirrored = await self.mirror.get_object_json(object_type, object_id)
+            if mirrored is not None:
+                return mirrored.encode()
+        if self.object_cache:
+            cached = await self.object_cache.get(object_type, object_id)
+            if cached is not None:
+                return orjson.dumps(cached)
+        get_url = f"{self._get_object_url(object_type)}/{object_id}"
+        try:
+            body = await self._make_request("GET", get_url, raw=True)
+        except CircuitOpenError as e:
+            return orjson.dumps(await self._stale_object(object_type, object_id, e))
+        except HTTPException as e:
+            if e.status_code == 404:
+                return None
+            raise
+        if self.object_cache:
+            await self.object_cache.set(object_type, object_id, orjson.loads(body))
+        return body
+
+    async def _get_projected_json(
+        self,
+        object_type: str,
+        object_id: str,
+        properties: Optional[List[str]],
+        properties_with_history: Optional[List[str]],
+        associations: Optional[List[str]],
+    ) -> Optional[bytes]:
+        # History and associations always come from HubSpot; a plain property selection is
+        # served locally when a mirrored or cached copy carries every selected property
+        if properties and not properties_with_history and not associations:
+            if self.mirror:
+                mirrored = await self.mirror.get_object(object_type, object_id)
+                projected = project_object(mirrored, properties) if mirrored is not None else None
+                if projected is not None:
+                    return orjson.dumps(projected)
+            if self.object_cache:
+                cached = await self.object_cache.get_projection(object_type, object_id, properties)
+                if cached is not None:
+                    return orjson.dumps(cached)
+        get_url = f"{self._get_object_url(object_type)}/{object_id}"
+        params = self._projection_params(properties, properties_with_history, associations)
+        try:
+            body = await self._make_request("GET", get_url, raw=True, params=params)
+        except CircuitOpenError as e:
+            if properties_with_history or associations:
+                raise
+            return orjson.dumps(await self._stale_object(object_type, object_id, e, properties))
+        except HTTPException as e:
+            if e.status_code == 404:
+                return None
+            raise
+        if properties and self.object_cache:
+            await self.object_cache.merge_properties(object_type, object_id, orjson.loads(body))
+        return body
+
+    async def get_object_by_id(
+        self,
+        object_type: str,
+        object_id: str,
+        output_model: Any,
+        properties: Optional[List[str]] = None,
+        properties_with_history: Optional[List[str]] = None,
+        associations: Optional[List[str]] = None,
+    ) -> Optional[Any]:
+        if properties or properties_with_history or associations:
+            body = await self._get_projected_json(object_type, object_id, properties, properties_with_history, associations)
+            return output_model(**orjson.loads(body)) if body is not None else None
+        if self.mirror:
+            mirrored = await self.mirror.get_object(object_type, object_id)
+            if mirrored is not None:
+                return output_model(**mirrored)
+        if self.object_cache:
+            cached = await self.object_cache.get(object_type, object_id)
+            if cached is not None:
+                return output_model(**cached)
         get_url = f"{self._get_object_url(object_type)}/{object_id}"
         try:
             response = await self._make_request("GET", get_url)
-            return output_model(**response)
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 404:
+        except CircuitOpenError as e:
+            return output_model(**await self._stale_object(object_type, object_id, e))
+        except HTTPException as e:
+            if e.status_code == 404:
                 return None
             raise
+        if self.object_cache:
+            await self.object_cache.set(object_type, object_id, response)
+        return output_model(**response)
 
-    async def create_object(self, object_type: str, properties: Dict[str, Any], output_model: Any) -> Any:
-        create_url = self._get_object_url(object_type)
-        payload = {"properties": properties}
-        response = await self._make_request("POST", create_url, json=payload)
+    async def batch_read_objects(
+        self,
+        object_type: str,
+        object_ids: List[str],
+        priority: int = PRIORITY_NORMAL,
+        use_cache: bool = False,
+        properties: Optional[List[str]] = None,
+        properties_with_history: Optional[List[str]] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetches objects by ID with HubSpot's batch read endpoint, up to 100 IDs per call and
+        at most ``BATCH_READ_MAX_CONCURRENCY`` calls at once. Returns a mapping of ID to raw
+        object; IDs HubSpot does not know are left out. With ``use_cache`` cached objects are
+        served locally. Fetched objects refresh the object cache and the identifier index.
+
+        ``properties`` and ``properties_with_history`` select what HubSpot returns. Reads with
+        history bypass the object cache.
+        """
+        read_url = f"{self._get_object_url(object_type)}/batch/read"
+        unique_ids = list(dict.fromkeys(str(object_id) for object_id in object_ids))
+        found: Dict[str, Dict[str, Any]] = {}
+        cacheable = self.object_cache is not None and not properties_with_history
+        if use_cache and cacheable:
+            for object_id in unique_ids:
+                if properties:
+                    cached = await self.object_cache.get_projection(object_type, object_id, properties)
+                else:
+                    cached = await self.object_cache.get(object_type, object_id)
+                if cached is not None:
+                    found[object_id] = cached
+            unique_ids = [object_id for object_id in unique_ids if object_id not in found]
+
+        payload: Dict[str, Any] = {}
+        if properties:
+            payload["properties"] = properties
+        if properties_with_history:
+            payload["propertiesWithHistory"] = properties_with_history
+        slots = asyncio.Semaphore(settings.BATCH_READ_MAX_CONCURRENCY)
+
+        async def read_chunk(chunk: List[str]) -> List[Dict[str, Any]]:
+            async with slots:
+                body = dict(payload, inputs=[{"id": object_id} for object_id in chunk])
+                response = await self._make_request("POST", read_url, priority=priority, json=body)
+            return response.get("results", [])
+
+        chunks = [unique_ids[start:start + BATCH_READ_LIMIT] for start in range(0, len(unique_ids), BATCH_READ_LIMIT)]
+        for results in await asyncio.gather(*(read_chunk(chunk) for chunk in chunks)):
+            for result in results:
+                object_id = str(result["id"])
+                found[object_id] = result
+                if cacheable and properties:
+                    await self.object_cache.merge_properties(object_type, object_id, result)
+                elif cacheable:
+                    await self.object_cache.set(object_type, object_id, result)
+                self._index_object(object_type, result)
+        return found
+
+    async def list_objects_page(
+        self,
+        object_type: str,
+        after: Optional[str] = None,
+        properties: Optional[List[str]] = None,
+        limit: int = LIST_PAGE_LIMIT,
+        priority: int = PRIORITY_LOW,
+        use_mirror: bool = True,
+        properties_with_history: Optional[List[str]] = None,
+        associations: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Fetches one page of objects. The next page's cursor is in ``paging.next.after``;
+        it is absent on the last page. Pages with HubSpot's default properties are served
+        from the mirror when it is fresh.
+        """
+        selected = properties or properties_with_history or associations
+        if use_mirror and self.mirror and not selected and self.mirror.serves_page(object_type, after):
+            return await self.mirror.list_page(object_type, after, limit)
+        params: Dict[str, Any] = self._projection_params(properties, properties_with_history, associations)
+        params["limit"] = min(limit, LIST_PAGE_LIMIT_WITH_HISTORY) if properties_with_history else limit
+        if after:
+            params["after"] = after
+        return await self._make_request("GET", self._get_object_url(object_type), priority=priority, params=params)
+
+    async def search_modified_since(self, object_type: str, property_name: str, since_ms: int, after: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Returns one page of objects whose ``property_name`` timestamp is at or after
+        ``since_ms``, oldest first. Used by the mirror's incremental sweeps.
+        """
+        search_url = f"{self._get_object_url(object_type)}/search"
+        payload: Dict[str, Any] = {
+            "filterGroups": [{"filters": [{"propertyName": property_name, "operator": "GTE", "value": str(since_ms)}]}],
+            "sorts": [{"propertyName": property_name, "direction": "ASCENDING"}],
+            "limit": LIST_PAGE_LIMIT,
+        }
+        if after:
+            payload["after"] = after
+        return await self._make_request("POST", search_url, priority=PRIORITY_LOW, json=payload)
+
+    async def _send_write_batch(self, object_type: str, operation: str, inputs: List[Dict[str, Any]], priority: int = PRIORITY_NORMAL) -> Dict[str, Any]:
+        batch_url = f"{self._get_object_url(object_type)}/batch/{operation}"
+        return await self._make_request("POST", batch_url, priority=priority, json={"inputs": inputs})
+
+    async def _send_bulk_write_batch(self, object_type: str, operation: str, inputs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        # Bulk imports yield to interactive requests in the scheduler queue
+        return await self._send_write_batch(object_type, operation, inputs, priority=PRIORITY_LOW)
+
+    async def batch_write_records(self, object_type: str, operation: str, payloads: List[Dict[str, Any]]) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Sends one chunk of records (at most HubSpot's batch limit) to the create, update or
+        upsert batch endpoint and returns each record's result or error in input order.
+        A record's ``associations`` are sent inline with creates and linked right after
+        updates and upserts; a record whose links fail reports that error.
+        """
+        if not payloads:
+            return []
+        links: List[Union[List[Tuple[str, Dict[str, Any]]], Exception]] = []
+        for payload in payloads:
+            try:
+                links.append(await self.resolve_associations(object_type, payload["associations"]) if payload.get("associations") else [])
+            except HTTPException as e:
+                links.append(e)
+        batcher = WriteBatcher(self._send_bulk_write_batch, window=0, max_batch_size=len(payloads))
+
+        async def write(payload: Dict[str, Any], linked: Union[List[Tuple[str, Dict[str, Any]]], Exception]) -> Dict[str, Any]:
+            if isinstance(linked, Exception):
+                raise linked
+            # Creates carry their associations inline; updates and upserts are linked afterwards
+            payload = {name: value for name, value in payload.items() if name != "associations"}
+            if operation == "create" and linked:
+                payload["associations"] = [inline for _, inline in linked]
+            return await batcher.submit(object_type, operation, payload)
+
+        results = await asyncio.gather(*(write(payload, linked) for payload, linked in zip(payloads, links)), return_exceptions=True)
+        to_link = []
+        for index, (payload, result) in enumerate(zip(payloads, results)):
+            if isinstance(result, dict) and result.get("id"):
+                self._index_object(object_type, result)
+                if operation != "create":
+                    await self.invalidate_cached_object(object_type, result["id"])
+                    if links[index]:
+                        to_link.append(index)
+                else:
+                    await self._forget_linked_edges(object_type, links[index])
+                await self._remember_written(object_type, result)
+            elif operation == "update" and isinstance(result, HTTPException) and result.status_code == 404:
+                await self._forget_stale_object(object_type, payload["id"])
+        linked_outcomes = await asyncio.gather(
+            *(self.associate_object(object_type, results[index]["id"], payloads[index]["associations"]) for index in to_link),
+            return_exceptions=True,
+        )
+        for index, outcome in zip(to_link, linked_outcomes):
+            if isinstance(outcome, Exception):
+                results[index] = outcome
+        return results
+
+    async def _known_properties(self, object_type: str, object_id: str) -> Dict[str, Any]:
+        if self.object_cache:
+            properties = await self.object_cache.get_properties(object_type, object_id)
+            if properties:
+                return properties
+        if self.mirror:
+            obj = await self.mirror.get_object(object_type, object_id)
+            if obj is not None:
+                return obj.get("properties") or {}
+        return {}
+
+    async def properties_to_write(self, object_type: str, object_id: Optional[str], properties: Dict[str, Any], trim: bool = True) -> Dict[str, Any]:
+        """
+        Compares a write with the object's last known state in the object cache or mirror,
+        without calling HubSpot. Returns an empty dict when every property already has the
+        incoming value, so the write can be skipped. Otherwise returns only the changed
+        properties, or all of them when ``trim`` is false (upserts, which may create the
+        object). Properties with no known value count as changed.
+        """
+        if not self.write_suppression or not object_id or not properties:
+            return properties
+        self._writes_checked += 1
+        known = await self._known_properties(object_type, str(object_id))
+        changed = {
+            name: value for name, value in properties.items()
+            if name not in known or _property_value(value) != _property_value(known[name])
+        }
+        if not changed:
+            self._writes_skipped += 1
+            self._properties_skipped += len(properties)
+            return {}
+        if trim and len(changed) < len(properties):
+            self._writes_trimmed += 1
+            self._properties_skipped += len(properties) - len(changed)
+            return changed
+        return properties
+
+    async def create_object(self, object_type: str, properties: Dict[str, Any], output_model: Any, associations: Optional[List[Dict[str, Any]]] = None) -> Any:
+        """
+        Creates an object. ``associations`` (``to_object_type``, ``to_object_id`` and an
+        optional ``association_type_id`` each) are sent inline, so the links cost no extra call.
+        """
+        payload: Dict[str, Any] = {"properties": properties}
+        linked = await self.resolve_associations(object_type, associations) if associations else []
+        if linked:
+            payload["associations"] = [inline for _, inline in linked]
+        if self.write_batcher:
+            response = await self.write_batcher.submit(object_type, "create", payload)
+        else:
+            create_url = self._get_object_url(object_type)
+            response = await self._make_request("POST", create_url, json=payload)
+        self._index_object(object_type, response)
+        await self._remember_written(object_type, response)
+        await self._forget_linked_edges(object_type, linked)
         return output_model(**response)
 
     async def update_object(self, object_type: str, object_id: str, properties: Dict[str, Any], output_model: Any) -> Any:
-        update_url = f"{self._get_object_url(object_type)}/{object_id}"
         payload = {"properties": properties}
-        response = await self._make_request("PATCH", update_url, json=payload)
+        try:
+            if self.write_batcher:
+                response = await self.write_batcher.submit(object_type, "update", dict(payload, id=object_id))
+            else:
+                update_url = f"{self._get_object_url(object_type)}/{object_id}"
+                response = await self._make_request("PATCH", update_url, json=payload)
+        except HTTPException as e:
+            if e.status_code == 404:
+                await self._forget_stale_object(object_type, object_id)
+            raise
+        await self.invalidate_cached_object(object_type, object_id)
+        await self._remember_written(object_type, response)
+        self._index_object(object_type, response)
         return output_model(**response)
 
-    async def search_object(self, object_type: str, property_name: str, property_value: str, output_model: Any) -> Optional[Any]:
+    async def upsert_object(self, object_type: str, id_property: str, id_value: str, properties: Dict[str, Any], output_model: Any) -> Tuple[Any, bool]:
+        """
+        Creates or updates an object keyed by a unique-value property in a single call using
+        HubSpot's batch upsert endpoint. Returns the object and whether it was newly created.
+        """
+        payload = {"idProperty": id_property, "id": id_value, "properties": properties}
+        if self.write_batcher:
+            result = await self.write_batcher.submit(object_type, "upsert", payload)
+        else:
+            response = await self._send_write_batch(object_type, "upsert", [payload])
+            if response.get("errors") or not response.get("results"):
+                raise batch_error_exception((response.get("errors") or [{}])[0])
+            result = response["results"][0]
+        created = bool(result.get("new", False))
+        if not created:
+            await self.invalidate_cached_object(object_type, result["id"])
+        await self._remember_written(object_type, result)
+        if self.id_index:
+            self.id_index.put(object_type, id_property, id_value, result["id"])
+        return output_model(**result), created
+
+    async def _search_first(self, object_type: str, property_name: str, property_value: str) -> Optional[Dict[str, Any]]:
         search_url = f"{self._get_object_url(object_type)}/search"
         payload = {
             "filterGroups": [
@@ -73,29 +771,266 @@ class HubSpotClient:
         }
         try:
             response = await self._make_request("POST", search_url, json=payload)
-            if response and response.get("results"):
-                return output_model(**response["results"][0])
-            return None
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 404:
+        except HTTPException as e:
+            if e.status_code == 404:
                 return None
             raise
+        if response and response.get("results"):
+            result = response["results"][0]
+            if self.id_index:
+                self.id_index.put(object_type, property_name, property_value, result["id"])
+            return result
+        return None
 
-    async def create_association(self, from_object_type: str, from_object_id: str, to_object_type: str, to_object_id: str, association_type_id: str) -> Dict[str, Any]:
-        create_url = f"https://api.hubapi.com/crm/v4/associations/{from_object_type}/{to_object_type}/batch/create"
+    async def search_object(self, object_type: str, property_name: str, property_value: str, output_model: Any) -> Optional[Any]:
+        result = await self._search_first(object_type, property_name, property_value)
+        return output_model(**result) if result else None
+
+    async def find_object_id(self, object_type: str, property_name: str, property_value: str, search: bool = True) -> Optional[str]:
+        """
+        Resolves an identifier (e.g. a company domain) to a HubSpot ID, using the identifier
+        index when possible and the search API otherwise (unless ``search`` is false).
+        """
+        if self.id_index and self.id_index.tracks(object_type, property_name):
+            object_id = self.id_index.get(object_type, property_name, property_value)
+            if object_id:
+                return object_id
+        if self.mirror:
+            object_id = await self.mirror.find_object_id(object_type, property_name, property_value)
+            if object_id:
+                return object_id
+        if not search:
+            return None
+        result = await self._search_first(object_type, property_name, property_value)
+        return result["id"] if result else None
+
+    async def find_object_ids(self, object_type: str, property_name: str, values: List[str]) -> Dict[str, str]:
+        """
+        Resolves many identifiers at once: index hits are served locally and the remaining
+        values are looked up with a single search call.
+        """
+        found: Dict[str, str] = {}
+        missing = []
+        for value in dict.fromkeys(values):
+            object_id = self.id_index.get(object_type, property_name, value) if self.id_index and self.id_index.tracks(object_type, property_name) else None
+            if object_id:
+                found[value] = object_id
+            else:
+                missing.append(value)
+        if missing:
+            matches = await self.search_objects_by_values(object_type, property_name, missing, dict)
+            normalised = {str(value).strip().lower(): value for value in missing}
+            for matched_value, obj in matches.items():
+                value = normalised.get(str(matched_value).strip().lower())
+                if value is not None:
+                    found[value] = obj["id"]
+                    if self.id_index:
+                        self.id_index.put(object_type, property_name, value, obj["id"])
+        return found
+
+    async def search_objects_by_values(self, object_type: str, property_name: str, values: List[str], output_model: Any) -> Dict[str, Any]:
+        """
+        Looks up many objects by one property in a single search call. Returns a mapping
+        of property value to the first matching object.
+        """
+        if not values:
+            return {}
+        search_url = f"{self._get_object_url(object_type)}/search"
         payload = {
-            "inputs": [
+            "filterGroups": [
                 {
-                    "from": {"id": from_object_id},
-                    "to": {"id": to_object_id},
-                    "type": association_type_id
+                    "filters": [
+                        {
+                            "propertyName": property_name,
+                            "operator": "IN",
+                            "values": list(values)
+                        }
+                    ]
                 }
-            ]
+            ],
+            "properties": [property_name],
+            "limit": 100
+        }
+        response = await self._make_request("POST", search_url, json=payload)
+        matches: Dict[str, Any] = {}
+        for result in response.get("results", []):
+            value = result.get("properties", {}).get(property_name)
+            if value is not None and value not in matches:
+                matches[value] = output_model(**result)
+        return matches
+
+    @staticmethod
+    def _association_input(from_object_id: str, to_object_id: str, association_type: Dict[str, Any]) -> Dict[str, Any]:
+        # association_type is a resolved {"associationCategory", "associationTypeId"} pair
+        return {
+            "from": {"id": str(from_object_id)},
+            "to": {"id": str(to_object_id)},
+            "types": [association_type],
         }
+
+    async def create_association(self, from_object_type: str, from_object_id: str, to_object_type: str, to_object_id: str, association_type_id: str) -> Dict[str, Any]:
+        """
+        Associates two objects. The type ID's category (HubSpot-defined or a user-defined
+        label) comes from ``association_types``; an unknown or non-numeric ID raises a 422.
+        """
+        association_type = await self.association_types.resolve(from_object_type, to_object_type, association_type_id)
+        create_url = f"{settings.HUBSPOT_API_BASE_URL}/crm/v4/associations/{from_object_type}/{to_object_type}/batch/create"
+        payload = {"inputs": [self._association_input(from_object_id, to_object_id, association_type)]}
         response = await self._make_request("POST", create_url, json=payload)
+        await self.invalidate_cached_associations(from_object_type, from_object_id, to_object_type)
+        await self.invalidate_cached_associations(to_object_type, to_object_id, from_object_type)
         return response
 
+    async def create_associations(self, from_object_type: str, to_object_type: str, pairs: List[Tuple[str, str, str]]) -> List[Optional[Exception]]:
+        """
+        Creates many associations between two object types with v4 batch calls of up to 100
+        inputs, at most ``BULK_MAX_CONCURRENCY`` calls at once. ``pairs`` holds
+        ``(from_id, to_id, association_type_id)`` tuples; returns None for each created pair
+        or the error that rejected it, in input order. Pairs whose type ID cannot be resolved
+        are rejected with that 422 without being sent.
+        """
+        create_url = f"{settings.HUBSPOT_API_BASE_URL}/crm/v4/associations/{from_object_type}/{to_object_type}/batch/create"
+        slots = asyncio.Semaphore(settings.BULK_MAX_CONCURRENCY)
+        types: Dict[str, Union[Dict[str, Any], HTTPException]] = {}
+        for association_type_id in dict.fromkeys(str(type_id) for _, _, type_id in pairs):
+            try:
+                types[association_type_id] = await self.association_types.resolve(from_object_type, to_object_type, association_type_id)
+            except HTTPException as e:
+                types[association_type_id] = e
+        outcomes_by_index: Dict[int, Optional[Exception]] = {}
+        sendable: List[Tuple[int, Tuple[str, str, str]]] = []
+        for index, pair in enumerate(pairs):
+            resolved = types[str(pair[2])]
+            if isinstance(resolved, HTTPException):
+                outcomes_by_index[index] = resolved
+            else:
+                sendable.append((index, pair))
+
+        async def create_chunk(chunk: List[Tuple[str, str, str]]) -> List[Optional[Exception]]:
+            payload = {"inputs": [self._association_input(from_id, to_id, types[str(type_id)]) for from_id, to_id, type_id in chunk]}
+            try:
+                async with slots:
+                    response = await self._make_request("POST", create_url, priority=PRIORITY_LOW, json=payload)
+            except HTTPException as e:
+                return [e] * len(chunk)
+            if not response.get("errors"):
+                return [None] * len(chunk)
+            # Partial success: pairs missing from the results were rejected
+            created = {(str(result.get("fromObjectId")), str(result.get("toObjectId"))) for result in response.get("results", [])}
+            error = batch_error_exception(response["errors"][0])
+            return [None if (str(from_id), str(to_id)) in created else error for from_id, to_id, _ in chunk]
+
+        chunks = [sendable[start:start + ASSOCIATION_BATCH_LIMIT] for start in range(0, len(sendable), ASSOCIATION_BATCH_LIMIT)]
+        outcomes = await asyncio.gather(*(create_chunk([pair for _, pair in chunk]) for chunk in chunks))
+        for chunk, chunk_outcomes in zip(chunks, outcomes):
+            for (index, _), outcome in zip(chunk, chunk_outcomes):
+                outcomes_by_index[index] = outcome
+        if self.object_cache:
+            for from_id, to_id in dict.fromkeys((str(from_id), str(to_id)) for _, (from_id, to_id, _) in sendable):
+                await self.invalidate_cached_associations(from_object_type, from_id, to_object_type)
+                await self.invalidate_cached_associations(to_object_type, to_id, from_object_type)
+        return [outcomes_by_index[index] for index in range(len(pairs))]
+
+    async def _read_association_types(self, from_object_type: str, to_object_type: str) -> List[Dict[str, Any]]:
+        labels_url = f"{settings.HUBSPOT_API_BASE_URL}/crm/v4/associations/{from_object_type}/{to_object_type}/labels"
+        response = await self._make_request("GET", labels_url, priority=PRIORITY_LOW)
+        return response.get("results", [])
+
+    async def resolve_associations(self, object_type: str, associations: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Turns ``{"to_object_type", "to_object_id", "association_type_id"}`` items into
+        ``(to_object_type, {"to": ..., "types": [...]})`` pairs in HubSpot's
+        associations-on-create shape, resolving type IDs through ``association_types``.
+        """
+        linked = []
+        for association in associations:
+            to_object_type = association["to_object_type"]
+            association_type = await self.association_types.resolve(object_type, to_object_type, association.get("association_type_id"))
+            linked.append((to_object_type, {"to": {"id": str(association["to_object_id"])}, "types": [association_type]}))
+        return linked
+
+    async def _forget_linked_edges(self, object_type: str, linked: List[Tuple[str, Dict[str, Any]]]) -> None:
+        # The objects linked to have a new edge back to object_type
+        for to_object_type, inline in linked:
+            await self.invalidate_cached_associations(to_object_type, inline["to"]["id"], object_type)
+
+    async def associate_object(self, object_type: str, object_id: str, associations: List[Dict[str, Any]]) -> None:
+        """
+        Links an existing object (one that was updated or upserted, where HubSpot takes no
+        inline associations) with one v4 batch call per associated object type.
+        """
+        linked = await self.resolve_associations(object_type, associations)
+        by_type: Dict[str, List[Dict[str, Any]]] = {}
+        for to_object_type, inline in linked:
+            by_type.setdefault(to_object_type, []).append({"from": {"id": str(object_id)}, **inline})
+        for to_object_type, inputs in by_type.items():
+            create_url = f"{settings.HUBSPOT_API_BASE_URL}/crm/v4/associations/{object_type}/{to_object_type}/batch/create"
+            response = await self._make_request("POST", create_url, json={"inputs": inputs})
+            await self.invalidate_cached_associations(object_type, object_id, to_object_type)
+            if response.get("errors"):
+                raise batch_error_exception(response["errors"][0])
+        await self._forget_linked_edges(object_type, linked)
+
+    async def _read_association_pages(self, object_type: str, object_id: str, to_object_type: str, after: Optional[str] = None) -> List[Dict[str, Any]]:
+        get_url = f"{settings.HUBSPOT_API_BASE_URL}/crm/v4/objects/{object_type}/{object_id}/associations/{to_object_type}"
+        results: List[Dict[str, Any]] = []
+        while True:
+            params: Dict[str, Any] = {"limit": ASSOCIATION_PAGE_LIMIT}
+            if after:
+                params["after"] = after
+            response = await self._make_request("GET", get_url, params=params)
+            results.extend(response.get("results", []))
+            after = ((response.get("paging") or {}).get("next") or {}).get("after")
+            if not after:
+                return results
+
     async def get_associations(self, object_type: str, object_id: str, to_object_type: str) -> Dict[str, Any]:
-        get_url = f"https://api.hubapi.com/crm/v4/objects/{object_type}/{object_id}/associations/{to_object_type}"
-        response = await self._make_request("GET", get_url)
-        return response
+        """
+        Returns every association of one object to another object type, following pagination.
+        """
+        return {"results": await self._read_association_pages(object_type, object_id, to_object_type)}
+
+    async def batch_read_associations(self, object_type: str, object_ids: List[str], to_object_type: str, use_cache: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Reads the associations of many objects with v4 batch reads of up to 100 IDs, at most
+        ``BATCH_READ_MAX_CONCURRENCY`` calls at once. Objects with more associations than fit
+        in one batch result are completed page by page. Returns a mapping of source ID to its
+        associations; objects without associations map to an empty list. With ``use_cache``
+        cached edges are served locally; fetched edges are always cached.
+        """
+        read_url = f"{settings.HUBSPOT_API_BASE_URL}/crm/v4/associations/{object_type}/{to_object_type}/batch/read"
+        unique_ids = list(dict.fromkeys(str(object_id) for object_id in object_ids))
+        associations: Dict[str, List[Dict[str, Any]]] = {}
+        if use_cache and self.object_cache:
+            for object_id in unique_ids:
+                cached = await self.object_cache.get_associations(object_type, object_id, to_object_type)
+                if cached is not None:
+                    associations[object_id] = cached
+        missing = [object_id for object_id in unique_ids if object_id not in associations]
+        fetched: Dict[str, List[Dict[str, Any]]] = {object_id: [] for object_id in missing}
+        slots = asyncio.Semaphore(settings.BATCH_READ_MAX_CONCURRENCY)
+
+        async def read_chunk(chunk: List[str]) -> None:
+            async with slots:
+                response = await self._make_request("POST", read_url, json={"inputs": [{"id": object_id} for object_id in chunk]})
+            for result in response.get("results", []):
+                object_id = str((result.get("from") or {}).get("id"))
+                fetched.setdefault(object_id, []).extend(result.get("to", []))
+                after = ((result.get("paging") or {}).get("next") or {}).get("after")
+                if after:
+                    async with slots:
+                        fetched[object_id].extend(await self._read_association_pages(object_type, object_id, to_object_type, after))
+
+        chunks = [missing[start:start + ASSOCIATION_BATCH_LIMIT] for start in range(0, len(missing), ASSOCIATION_BATCH_LIMIT)]
+        await asyncio.gather(*(read_chunk(chunk) for chunk in chunks))
+        if self.object_cache:
+            for object_id, edges in fetched.items():
+                await self.object_cache.set_associations(object_type, object_id, to_object_type, edges)
+        associations.update(fetched)
+        return associations
+
+def get_hubspot_client(request: Request) -> HubSpotClient:
+    """
+    FastAPI dependency returning the shared client created in the app lifespan.
+    """
+    return request.app.state.hubspot_client
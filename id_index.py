@@ -0,0 +1,108 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+from config import settings
+
+IndexKey = Tuple[str, str, str]
+
+def parse_tracked_properties(spec: str) -> Dict[str, List[str]]:
+    """
+    Parses "contacts:email,companies:domain" into {"contacts": ["email"], "companies": ["domain"]}.
+    """
+    tracked: Dict[str, List[str]] = {}
+    for item in spec.split(","):
+        object_type, _, property_name = item.strip().partition(":")
+        if object_type and property_name:
+            tracked.setdefault(object_type, []).append(property_name)
+    return tracked
+
+class IdIndex:
+    """
+    Bounded LRU index of ``(object_type, property, value) -> HubSpot ID`` for identifier
+    properties such as contact ``email`` or company ``domain``. Lets writes find the
+    record to update without calling the rate-limited search API.
+    """
+
+    def __init__(self, tracked_properties: Dict[str, List[str]], max_entries: int):
+        self.tracked_properties = tracked_properties
+        self.max_entries = max_entries
+        self._ids: "OrderedDict[IndexKey, str]" = OrderedDict()
+        self._keys_by_id: Dict[Tuple[str, str], Set[IndexKey]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.corrections = 0
+
+    @staticmethod
+    def _normalise(value: Any) -> str:
+        # Identifier properties (email, domain) are case-insensitive in HubSpot
+        return str(value).strip().lower()
+
+    def tracks(self, object_type: str, property_name: str) -> bool:
+        return property_name in self.tracked_properties.get(object_type, [])
+
+    def get(self, object_type: str, property_name: str, value: Any) -> Optional[str]:
+        key = (object_type, property_name, self._normalise(value))
+        object_id = self._ids.get(key)
+        if object_id is None:
+            self.misses += 1
+            return None
+        self._ids.move_to_end(key)
+        self.hits += 1
+        return object_id
+
+    def put(self, object_type: str, property_name: str, value: Any, object_id: str) -> None:
+        if value is None or value == "":
+            return
+        key = (object_type, property_name, self._normalise(value))
+        object_id = str(object_id)
+        previous = self._ids.get(key)
+        if previous is not None and previous != object_id:
+            self._discard_reverse(key, previous)
+        self._ids[key] = object_id
+        self._ids.move_to_end(key)
+        self._keys_by_id.setdefault((object_type, object_id), set()).add(key)
+        while len(self._ids) > self.max_entries:
+            evicted_key, evicted_id = self._ids.popitem(last=False)
+            self._discard_reverse(evicted_key, evicted_id)
+            self.evictions += 1
+
+    def record_object(self, object_type: str, obj: Dict[str, Any]) -> None:
+        """
+        Indexes every tracked identifier property present on a HubSpot object.
+        """
+        object_id = obj.get("id")
+        properties = obj.get("properties") or {}
+        if object_id is None:
+            return
+        for property_name in self.tracked_properties.get(object_type, []):
+            if properties.get(property_name):
+                self.put(object_type, property_name, properties[property_name], object_id)
+
+    def forget_id(self, object_type: str, object_id: Any, stale: bool = False) -> None:
+        keys = self._keys_by_id.pop((object_type, str(object_id)), set())
+        for key in keys:
+            self._ids.pop(key, None)
+        if stale and keys:
+            self.corrections += 1
+
+    def _discard_reverse(self, key: IndexKey, object_id: str) -> None:
+        keys = self._keys_by_id.get((key[0], object_id))
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_id[(key[0], object_id)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._ids),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_corrections": self.corrections,
+        }
+
+def build_id_index() -> Optional[IdIndex]:
+    if settings.ID_INDEX_MAX_ENTRIES <= 0:
+        return None
+    return IdIndex(parse_tracked_properties(settings.ID_INDEX_PROPERTIES), settings.ID_INDEX_MAX_ENTRIES)
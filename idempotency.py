@@ -0,0 +1,292 @@
+import asyncio
+import hashlib
+import logging
+import orjson
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from fastapi import HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+# Marker stored while the first request with a key is running
+_PENDING = {"pending": True}
+# Response headers worth replaying; length and encoding are recomputed
+_REPLAYED_HEADERS = {"location", "preference-applied", "retry-after"}
+
+def request_fingerprint(*parts: Any) -> str:
+    """
+    Hashes what identifies a request (method, path, body...), so a key reused for a
+    different request can be told apart from a retry.
+    """
+    return hashlib.sha256(orjson.dumps(jsonable_encoder(parts), option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+def _storable(status_code: int) -> bool:
+    # Server errors and throttling are transient: a retry should run the request again
+    return status_code < 500 and status_code != status.HTTP_429_TOO_MANY_REQUESTS
+
+class MemoryIdempotencyBackend:
+    """
+    In-process LRU of stored results with a per-entry TTL. Keys are only shared between
+    requests served by the same worker.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.evictions = 0
+
+    def _put(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry[1]
+
+    async def claim(self, key: str, ttl: float) -> bool:
+        if await self.get(key) is not None:
+            return False
+        self._put(key, _PENDING, ttl)
+        return True
+
+    async def set(self, key: str, record: Dict[str, Any]) -> None:
+        self._put(key, record, self.ttl)
+
+    async def release(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    async def aclose(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "entries": len(self._entries), "max_entries": self.max_entries, "evictions": self.evictions}
+
+class RedisIdempotencyBackend:
+    """
+    Redis-backed store shared between workers. A key is claimed with ``SET NX`` and the
+    claim expires after ``lock_ttl`` seconds, so a crashed worker cannot block it for good.
+    """
+
+    def __init__(self, url: str, ttl: float, prefix: str = "hubspot-connector:idempotency:", redis: Any = None):
+        if redis is None:
+            from redis.asyncio import Redis
+
+            redis = Redis.from_url(url, decode_responses=True)
+        self._redis = redis
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = await self._redis.get(self.prefix + key)
+        return orjson.loads(value) if value is not None else None
+
+    async def claim(self, key: str, ttl: float) -> bool:
+        return bool(await self._redis.set(self.prefix + key, orjson.dumps(_PENDING), nx=True, px=int(ttl * 1000)))
+
+    async def set(self, key: str, record: Dict[str, Any]) -> None:
+        await self._redis.set(self.prefix + key, orjson.dumps(record), px=int(self.ttl * 1000))
+
+    async def release(self, key: str) -> None:
+        await self._redis.delete(self.prefix + key)
+
+    async def aclose(self) -> None:
+        await self._redis.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis"}
+
+class IdempotencyStore:
+    """
+    Runs a write once per ``Idempotency-Key`` and replays its result to retries.
+
+    The first request with a key claims it and runs; its response is stored (unless it is
+    a 5xx or 429, which a retry should be able to run again) and replayed, with
+    ``Idempotent-Replayed: true``, to later requests with the same key until it expires.
+    Requests with the key that arrive while the first is running in this worker wait for
+    it; one running in another worker is reported as ``409``. Reusing a key for a
+    different request is rejected with ``422``.
+    """
+
+    def __init__(self, backend: Any, lock_ttl: float = 60.0):
+        self.backend = backend
+        self.lock_ttl = lock_ttl
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.stored = 0
+        self.replayed = 0
+        self.waited = 0
+        self.conflicts = 0
+        self.mismatches = 0
+        self.errors = 0
+
+    async def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Idempotency store read failed for {key}: {e}")
+            return None
+
+    async def run(self, key: str, fingerprint: str, call: Callable[[], Awaitable[Any]]) -> Response:
+        """
+        Returns ``call``'s response for the first request with ``key`` and replays it for
+        the ones that follow. ``call`` may return a Response or anything FastAPI can encode
+        as JSON, and may raise HTTPException.
+        """
+        if len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{IDEMPOTENCY_HEADER} is longer than {MAX_KEY_LENGTH} characters")
+        while True:
+            record = await self._get(key)
+            if record is not None and not record.get("pending"):
+                return self._replay(record, fingerprint)
+            future = self._in_flight.get(key)
+            if future is None:
+                return await self._lead(key, fingerprint, call)
+            self.waited += 1
+            try:
+                record = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    continue  # the first request was cancelled; run this one instead
+                raise
+            return self._replay(record, fingerprint)
+
+    async def _lead(self, key: str, fingerprint: str, call: Callable[[], Awaitable[Any]]) -> Response:
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        claimed = False
+        try:
+            try:
+                claimed = await self.backend.claim(key, self.lock_ttl)
+            except Exception as e:
+                # Without the store the request still runs, just without protection
+                self.errors += 1
+                logger.warning(f"Idempotency store claim failed for {key}: {e}")
+                claimed = True
+            if not claimed:
+                record = await self._get(key)
+                if record is None or record.get("pending"):
+                    self.conflicts += 1
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail=f"A request with this {IDEMPOTENCY_HEADER} is still in progress",
+                        headers={"Retry-After": "1"},
+                    )
+                future.set_result(record)
+                return self._replay(record, fingerprint)
+
+            try:
+                result = await call()
+            except HTTPException as e:
+                record = self._record(fingerprint, e.status_code, orjson.dumps({"detail": e.detail}), e.headers or {}, "application/json")
+                await self._finish(key, record)
+                future.set_result(record)
+                raise
+            response = result if isinstance(result, Response) else JSONResponse(content=jsonable_encoder(result))
+            record = self._record(fingerprint, response.status_code, response.body, response.headers, response.media_type)
+            await self._finish(key, record)
+            future.set_result(record)
+            return response
+        except asyncio.CancelledError:
+            future.cancel()
+            if claimed:
+                await self._release(key)
+            raise
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+                future.exception()  # waiters re-raise it; nobody else needs to see it
+                if claimed:
+                    await self._release(key)
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def _finish(self, key: str, record: Dict[str, Any]) -> None:
+        if not _storable(record["status_code"]):
+            await self._release(key)
+            return
+        try:
+            await self.backend.set(key, record)
+            self.stored += 1
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Idempotency store write failed for {key}: {e}")
+
+    async def _release(self, key: str) -> None:
+        try:
+            await self.backend.release(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Idempotency store release failed for {key}: {e}")
+
+    @staticmethod
+    def _record(fingerprint: str, status_code: int, body: bytes, headers: Any, media_type: Optional[str]) -> Dict[str, Any]:
+        return {
+            "fingerprint": fingerprint,
+            "status_code": status_code,
+            "body": body.decode("utf-8"),
+            "headers": {name: value for name, value in headers.items() if name.lower() in _REPLAYED_HEADERS},
+            "media_type": media_type,
+        }
+
+    def _replay(self, record: Dict[str, Any], fingerprint: str) -> Response:
+        if record["fingerprint"] != fingerprint:
+            self.mismatches += 1
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"{IDEMPOTENCY_HEADER} was already used for a different request",
+            )
+        self.replayed += 1
+        return Response(
+            content=record["body"],
+            status_code=record["status_code"],
+            headers=dict(record["headers"], **{REPLAYED_HEADER: "true"}),
+            media_type=record["media_type"],
+        )
+
+    async def aclose(self) -> None:
+        await self.backend.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            self.backend.stats(),
+            in_flight=len(self._in_flight),
+            stored=self.stored,
+            replayed=self.replayed,
+            waited=self.waited,
+            conflicts=self.conflicts,
+            mismatches=self.mismatches,
+            errors=self.errors,
+        )
+
+def build_idempotency_store() -> Optional[IdempotencyStore]:
+    """
+    Creates the store selected by ``IDEMPOTENCY_BACKEND`` ("memory", "redis" or "none").
+    """
+    backend = settings.IDEMPOTENCY_BACKEND.lower()
+    if backend == "memory":
+        return IdempotencyStore(MemoryIdempotencyBackend(settings.IDEMPOTENCY_MAX_ENTRIES, settings.IDEMPOTENCY_TTL_SECONDS), settings.IDEMPOTENCY_LOCK_SECONDS)
+    if backend == "redis":
+        return IdempotencyStore(RedisIdempotencyBackend(settings.REDIS_URL, settings.IDEMPOTENCY_TTL_SECONDS), settings.IDEMPOTENCY_LOCK_SECONDS)
+    if backend != "none":
+        logger.warning(f"Unknown IDEMPOTENCY_BACKEND '{settings.IDEMPOTENCY_BACKEND}'; Idempotency-Key headers are ignored")
+    return None
+
+def get_idempotency_store(request: Request) -> Optional[IdempotencyStore]:
+    return getattr(request.app.state, "idempotency_store", None)
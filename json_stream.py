@@ -0,0 +1,112 @@
+import codecs
+import json
+import re
+from typing import Any, AsyncIterator, List
+
+# Characters that can change the parser state; everything else is skipped in bulk
+_STRUCTURAL = re.compile(r'[\[\]{}",\\]')
+
+class _NdjsonParser:
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[Any]:
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        return [json.loads(line) for line in lines if line.strip()]
+
+    def close(self) -> List[Any]:
+        line, self._buffer = self._buffer, ""
+        return [json.loads(line)] if line.strip() else []
+
+class _JsonArrayParser:
+    """
+    Incrementally splits a top-level JSON array into its elements, keeping at most one
+    element in memory.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._scan_pos = 0
+        self._value_start = 0
+        self._depth = 0
+        self._in_string = False
+        self._closed = False
+
+    def feed(self, text: str) -> List[Any]:
+        if self._closed:
+            if text.strip():
+                raise ValueError("Unexpected data after the end of the JSON array")
+            return []
+        self._buffer += text
+        records = []
+        for match in _STRUCTURAL.finditer(self._buffer, self._scan_pos):
+            index = match.start()
+            if index < self._scan_pos:
+                continue  # character escaped by a preceding backslash
+            char = match.group()
+            self._scan_pos = index + 1
+            if self._in_string:
+                if char == "\\":
+                    self._scan_pos = index + 2
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in "[{":
+                if self._depth == 0:
+                    if char != "[" or self._buffer[:index].strip():
+                        raise ValueError("Expected a JSON array")
+                    self._value_start = index + 1
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    records.extend(self._take_value(index))
+                    self._closed = True
+                    if self._buffer[index + 1:].strip():
+                        raise ValueError("Unexpected data after the end of the JSON array")
+                    break
+            elif char == "," and self._depth == 1:
+                records.extend(self._take_value(index, required=True))
+        # Drop everything that has already been emitted
+        self._buffer = self._buffer[self._value_start:]
+        self._scan_pos -= self._value_start
+        self._value_start = 0
+        return records
+
+    def _take_value(self, end: int, required: bool = False) -> List[Any]:
+        segment = self._buffer[self._value_start:end].strip()
+        self._value_start = end + 1
+        if not segment:
+            if required:
+                raise ValueError("Empty element in JSON array")
+            return []
+        return [json.loads(segment)]
+
+    def close(self) -> List[Any]:
+        if not self._closed:
+            raise ValueError("Unexpected end of JSON array")
+        return []
+
+async def iter_json_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """
+    Yields records from a streamed body holding either a JSON array or NDJSON
+    (one JSON document per line). The format is detected from the first
+    non-whitespace character. Raises ValueError on malformed input.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parser = None
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        if parser is None:
+            if not text.strip():
+                continue
+            parser = _JsonArrayParser() if text.lstrip().startswith("[") else _NdjsonParser()
+        for record in parser.feed(text):
+            yield record
+    if parser is None:
+        return
+    for record in parser.feed(decoder.decode(b"", final=True)) + parser.close():
+        yield record
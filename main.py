@@ -1,41 +1,80 @@
 import logging
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
 from routers.crud_router import create_crud_router
-from routers import webhooks, associations
+from routers import webhooks, associations, stats, metrics, jobs
 from models.contact_models import ContactProperties, HubSpotContactOutput
 from models.company_models import CompanyProperties, HubSpotCompanyOutput
 from models.ticket_models import TicketProperties, HubSpotTicketOutput
-from fastapi_limiter import FastAPILimiter
-from redis.asyncio import Redis
+from hubspot_client import HubSpotClient
+from crm_mirror import build_crm_mirror
+from rate_limiter import build_rate_limiter, enforce_rate_limit
+from telemetry import TelemetryMiddleware
+from write_queue import build_write_queue
+from idempotency import build_idempotency_store
 from config import settings
 
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.rate_limiter = build_rate_limiter()
+    app.state.idempotency_store = build_idempotency_store()
+    # One pooled HubSpot client for the whole application, shared by every router
+    mirror = build_crm_mirror()
+    app.state.hubspot_client = HubSpotClient(mirror=mirror)
+    if mirror:
+        await mirror.start(app.state.hubspot_client)
+    app.state.webhook_pipeline = webhooks.build_webhook_pipeline(app.state.hubspot_client)
+    await app.state.webhook_pipeline.start()
+    app.state.write_queue = build_write_queue()
+    if app.state.write_queue:
+        await app.state.write_queue.start(app.state.hubspot_client)
+    try:
+        yield
+    finally:
+        # Finish queued webhook events and in-progress queued writes before the client they depend on is closed
+        await app.state.webhook_pipeline.stop(drain=True, timeout=settings.WEBHOOK_DRAIN_TIMEOUT)
+        if app.state.write_queue:
+            await app.state.write_queue.stop(timeout=settings.WEBHOOK_DRAIN_TIMEOUT)
+        if mirror:
+            await mirror.stop()
+        await app.state.hubspot_client.aclose()
+        if app.state.rate_limiter:
+            await app.state.rate_limiter.aclose()
+        if app.state.idempotency_store:
+            await app.state.idempotency_store.aclose()
+
 app = FastAPI(
     title="HubSpot Connector API",
     description="API to simplify interactions with HubSpot CRM",
     version="0.1.0",
+    lifespan=lifespan,
+    # Inbound limits run after routing so they can be configured per route template
+    dependencies=[Depends(enforce_rate_limit)],
 )
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
-
-@app.on_startup
-async def startup():
-    redis = Redis(host="localhost", port=6379, db=0, encoding="utf-8", decode_responses=True)
-    await FastAPILimiter.init(redis)
+# Per-route latency metrics and, when OpenTelemetry is installed, a span per request
+app.add_middleware(TelemetryMiddleware)
 
 # Include generic CRUD routers for HubSpot objects
 app.include_router(create_crud_router(
     object_type="contacts",
     create_schema=ContactProperties,
     response_schema=HubSpotContactOutput,
-    search_property="email"
+    search_property="email",
+    # email is a unique-value property, so contacts are written with one native upsert call
+    search_property_is_unique=True
 ))
 
 app.include_router(create_crud_router(
     object_type="companies",
     create_schema=CompanyProperties,
     response_schema=HubSpotCompanyOutput,
+    # domain is not a unique-value property in HubSpot and cannot be used as an upsert idProperty,
+    # so companies keep the search-then-write flow
     search_property="domain"
 ))
 
@@ -49,4 +88,7 @@ app.include_router(create_crud_router(
 
 # Include specific routers
 app.include_router(webhooks.router)
-app.include_router(associations.router)
\ No newline at end of file
+app.include_router(associations.router)
+app.include_router(stats.router)
+app.include_router(metrics.router)
+app.include_router(jobs.router)
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class ObjectAssociation(BaseModel):
+    """
+    An object to associate a created or updated record with. Without
+    ``association_type_id`` HubSpot's default type for the two object types is used.
+    """
+    to_object_type: str
+    to_object_id: str
+    association_type_id: Optional[str] = None
@@ -0,0 +1,8 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class BatchReadInput(BaseModel):
+    ids: List[str]
+    properties: Optional[List[str]] = None
+    properties_with_history: Optional[List[str]] = Field(None, alias="propertiesWithHistory")
+    associations: Optional[List[str]] = None
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from models.association_models import ObjectAssociation
 
 class CompanyProperties(BaseModel):
     name: str
@@ -8,6 +9,7 @@ class CompanyProperties(BaseModel):
     city: Optional[str] = None
     state: Optional[str] = None
     zip: Optional[str] = None
+    associations: Optional[List[ObjectAssociation]] = None # linked on write, not sent as a property
 
     class Config:
         extra = "allow"
@@ -18,3 +20,5 @@ class HubSpotCompanyOutput(BaseModel):
     created_at: str = Field(alias="createdAt")
     updated_at: str = Field(alias="updatedAt")
     archived: bool
+    properties_with_history: Optional[Dict[str, List[Dict[str, Any]]]] = Field(None, alias="propertiesWithHistory")
+    associations: Optional[Dict[str, Any]] = None
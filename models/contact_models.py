@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from models.association_models import ObjectAssociation
 
 class ContactProperties(BaseModel):
     email: EmailStr
@@ -7,6 +8,7 @@ class ContactProperties(BaseModel):
     lastname: Optional[str] = None
     phone: Optional[str] = None
     company: Optional[str] = None
+    associations: Optional[List[ObjectAssociation]] = None # linked on write, not sent as a property
 
     class Config:
         extra = "allow"
@@ -17,3 +19,5 @@ class HubSpotContactOutput(BaseModel):
     created_at: str = Field(alias="createdAt")
     updated_at: str = Field(alias="updatedAt")
     archived: bool
+    properties_with_history: Optional[Dict[str, List[Dict[str, Any]]]] = Field(None, alias="propertiesWithHistory")
+    associations: Optional[Dict[str, Any]] = None
@@ -0,0 +1,298 @@
+import logging
+import orjson
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class MemoryCacheBackend:
+    """
+    In-process LRU cache with a per-entry TTL and a hard cap on the number of entries.
+    Expired entries are kept ``stale_ttl`` seconds longer for ``get_stale``.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, stale_ttl: float = 0.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            if expires_at + self.stale_ttl <= now:
+                del self._entries[key]
+                self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def get_stale(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] + self.stale_ttl <= time.monotonic():
+            return None
+        return entry[1]
+
+    async def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    async def aclose(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+class RedisCacheBackend:
+    """
+    Redis-backed cache shared between workers. Entries expire via Redis TTLs; memory is
+    bounded by the server's maxmemory policy.
+    """
+
+    def __init__(self, url: str, ttl: float, prefix: str = "hubspot-connector:object:"):
+        from redis.asyncio import Redis
+
+        self._redis = Redis.from_url(url, decode_responses=True)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self._redis.get(self.prefix + key)
+        return orjson.loads(value) if value is not None else None
+
+    async def get_stale(self, key: str) -> Optional[Any]:
+        # Redis drops entries when they expire, so nothing stale is left to serve
+        return None
+
+    async def set(self, key: str, value: Any) -> None:
+        await self._redis.set(self.prefix + key, orjson.dumps(value), px=int(self.ttl * 1000))
+
+    async def delete(self, key: str) -> None:
+        await self._redis.delete(self.prefix + key)
+
+    async def aclose(self) -> None:
+        await self._redis.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis"}
+
+# Object fields kept next to the property values of projected reads
+_OBJECT_FIELDS = ("id", "createdAt", "updatedAt", "archived")
+
+def project_object(obj: Dict[str, Any], properties: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Narrows an object to the selected properties. Returns None when the object does not carry
+    all of them; HubSpot includes every selected property in a response, even when empty.
+    """
+    values = obj.get("properties") or {}
+    if any(name not in values for name in properties):
+        return None
+    return dict(obj, properties={name: values[name] for name in properties})
+
+class ObjectCache:
+    """
+    Read-through cache of raw HubSpot objects keyed by ``(object_type, object_id)``, and
+    of association edges keyed by ``(object_type, object_id, to_object_type)``.
+
+    Reads that select properties collect their values in a second entry per object, so a
+    later selection of any subset is served locally from the newest version either entry
+    holds.
+
+    Backend failures are logged and treated as misses so the cache can never take
+    reads down with it.
+    """
+
+    def __init__(self, backend: Any):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.association_hits = 0
+        self.association_misses = 0
+        self.invalidations = 0
+        self.stale_hits = 0
+        self.errors = 0
+
+    @staticmethod
+    def _key(object_type: str, object_id: str) -> str:
+        return f"{object_type}:{object_id}"
+
+    @staticmethod
+    def _properties_key(object_type: str, object_id: str) -> str:
+        return f"{object_type}:{object_id}:properties"
+
+    @staticmethod
+    def _association_key(object_type: str, object_id: str, to_object_type: str) -> str:
+        return f"{object_type}:{object_id}:associations:{to_object_type}"
+
+    async def _read(self, key: str) -> Optional[Any]:
+        try:
+            return await self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Object cache read failed for {key}: {e}")
+            return None
+
+    async def _write(self, key: str, value: Any) -> None:
+        try:
+            await self.backend.set(key, value)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Object cache write failed for {key}: {e}")
+
+    async def _delete(self, *keys: str) -> None:
+        self.invalidations += 1
+        for key in keys:
+            try:
+                await self.backend.delete(key)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Object cache invalidation failed for {key}: {e}")
+
+    async def get(self, object_type: str, object_id: str) -> Optional[Dict[str, Any]]:
+        value = await self._read(self._key(object_type, object_id))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def get_stale(self, object_type: str, object_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns a cached object even if it has expired, for reads while HubSpot is failing.
+        Invalidated objects are never returned.
+        """
+        key = self._key(object_type, object_id)
+        try:
+            value = await self.backend.get_stale(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Object cache read failed for {key}: {e}")
+            return None
+        if value is not None:
+            self.stale_hits += 1
+        return value
+
+    async def set(self, object_type: str, object_id: str, value: Dict[str, Any]) -> None:
+        await self._write(self._key(object_type, object_id), value)
+
+    async def _latest(self, object_type: str, object_id: str) -> Optional[Dict[str, Any]]:
+        # The newest of the full object and the collected values, with every property known for that version
+        entries = [await self._read(key) for key in (self._key(object_type, object_id), self._properties_key(object_type, object_id))]
+        entries = sorted((entry for entry in entries if entry is not None), key=lambda entry: entry.get("updatedAt") or "")
+        if not entries:
+            return None
+        latest = entries[-1]
+        properties: Dict[str, Any] = {}
+        for entry in entries:
+            if entry.get("updatedAt") == latest.get("updatedAt"):
+                properties.update(entry.get("properties") or {})
+        return dict(latest, properties=properties)
+
+    async def get_projection(self, object_type: str, object_id: str, properties: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the object narrowed to ``properties`` if its latest cached version carries all
+        of them. Values collected from an older version are never served.
+        """
+        latest = await self._latest(object_type, object_id)
+        projected = project_object(latest, properties) if latest is not None else None
+        if projected is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return projected
+
+    async def get_properties(self, object_type: str, object_id: str) -> Dict[str, Any]:
+        """
+        Returns every property value known for the object's latest cached version, from the
+        full cached object and the collected property values. Empty when nothing is cached.
+        """
+        latest = await self._latest(object_type, object_id)
+        if latest is None:
+            self.misses += 1
+            return {}
+        self.hits += 1
+        return latest["properties"]
+
+    async def merge_properties(self, object_type: str, object_id: str, obj: Dict[str, Any]) -> None:
+        """
+        Adds the property values of a read that selected properties to the object's collected
+        values. Values collected from another version of the object (a different
+        ``updatedAt``) are replaced rather than mixed in.
+        """
+        key = self._properties_key(object_type, object_id)
+        properties = dict(obj.get("properties") or {})
+        current = await self._read(key)
+        if current is not None and current.get("updatedAt") == obj.get("updatedAt"):
+            properties = {**current["properties"], **properties}
+        entry = {field: obj[field] for field in _OBJECT_FIELDS if field in obj}
+        entry["properties"] = properties
+        await self._write(key, entry)
+
+    async def invalidate(self, object_type: str, object_id: str) -> None:
+        await self._delete(self._key(object_type, object_id), self._properties_key(object_type, object_id))
+
+    async def get_associations(self, object_type: str, object_id: str, to_object_type: str) -> Optional[List[Dict[str, Any]]]:
+        value = await self._read(self._association_key(object_type, object_id, to_object_type))
+        if value is None:
+            self.association_misses += 1
+        else:
+            self.association_hits += 1
+        return value
+
+    async def set_associations(self, object_type: str, object_id: str, to_object_type: str, associations: List[Dict[str, Any]]) -> None:
+        await self._write(self._association_key(object_type, object_id, to_object_type), associations)
+
+    async def invalidate_associations(self, object_type: str, object_id: str, to_object_type: str) -> None:
+        await self._delete(self._association_key(object_type, object_id, to_object_type))
+
+    async def aclose(self) -> None:
+        await self.backend.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        association_lookups = self.association_hits + self.association_misses
+        return dict(
+            self.backend.stats(),
+            hits=self.hits,
+            misses=self.misses,
+            hit_ratio=round(self.hits / lookups, 4) if lookups else 0.0,
+            association_hits=self.association_hits,
+            association_misses=self.association_misses,
+            association_hit_ratio=round(self.association_hits / association_lookups, 4) if association_lookups else 0.0,
+            invalidations=self.invalidations,
+            stale_hits=self.stale_hits,
+            errors=self.errors,
+        )
+
+def build_object_cache() -> Optional[ObjectCache]:
+    """
+    Creates the object cache selected by ``OBJECT_CACHE_BACKEND`` ("memory", "redis" or "none").
+    """
+    backend = settings.OBJECT_CACHE_BACKEND.lower()
+    if backend == "memory":
+        return ObjectCache(MemoryCacheBackend(settings.OBJECT_CACHE_MAX_ENTRIES, settings.OBJECT_CACHE_TTL_SECONDS, settings.OBJECT_CACHE_STALE_SECONDS))
+    if backend == "redis":
+        return ObjectCache(RedisCacheBackend(settings.REDIS_URL, settings.OBJECT_CACHE_TTL_SECONDS))
+    if backend != "none":
+        logger.warning(f"Unknown OBJECT_CACHE_BACKEND '{settings.OBJECT_CACHE_BACKEND}'; object cache disabled")
+    return None
@@ -0,0 +1,375 @@
+import asyncio
+import hashlib
+import logging
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException, Request, status
+from config import settings
+from upstream_scheduler import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# (tokens per second, burst); None means the route or key is not limited
+Limit = Optional[Tuple[float, float]]
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_LIMIT_PATTERN = re.compile(r"^\s*(\d+)\s*/\s*(second|minute|hour|day)s?\s*$", re.IGNORECASE)
+_UNLIMITED = {"none", "unlimited", "0"}
+
+# Token bucket kept in Redis. Grants up to ARGV[3] tokens at once and returns the number
+# granted plus the seconds until the next token when none were left.
+_REDIS_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local granted = math.min(requested, math.floor(tokens))
+tokens = tokens - granted
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+local wait = 0
+if granted == 0 then wait = (1 - tokens) / rate end
+return {granted, tostring(wait)}
+"""
+
+# Returns ARGV[3] unspent tokens to a bucket, after refilling it, without exceeding the burst
+_REDIS_REFUND_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local refunded = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate + refunded)
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return 1
+"""
+
+def parse_rate_limit(spec: str) -> Limit:
+    """
+    Parses "100/minute" style limits into (tokens per second, burst). The burst equals the
+    count, so a client may spend a full period's allowance at once. "none" disables limiting.
+    """
+    if spec.strip().lower() in _UNLIMITED:
+        return None
+    match = _LIMIT_PATTERN.match(spec)
+    if not match:
+        raise ValueError(f"Invalid rate limit '{spec}'; expected e.g. '100/minute' or 'none'")
+    count = float(match.group(1))
+    return count / _PERIODS[match.group(2).lower()], count
+
+def parse_limit_overrides(spec: str) -> Dict[str, Limit]:
+    """
+    Parses "key=limit" pairs separated by commas, e.g. "POST /contacts=10/second,GET /metrics=none".
+    """
+    overrides: Dict[str, Limit] = {}
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        key, _, limit = entry.rpartition("=")
+        if not key.strip():
+            raise ValueError(f"Invalid rate limit override '{entry.strip()}'; expected 'key=limit'")
+        overrides[key.strip()] = parse_rate_limit(limit)
+    return overrides
+
+class ShardedTokenBuckets:
+    """
+    In-process token buckets per key. Keys are spread over shards, each a small LRU, so
+    idle keys are evicted in O(1) without scanning one large table.
+    """
+
+    def __init__(self, shards: int = 16, max_keys: int = 100000):
+        self._shards: List[OrderedDict] = [OrderedDict() for _ in range(max(1, shards))]
+        self._max_keys_per_shard = max(1, max_keys // len(self._shards))
+        self.evictions = 0
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        """
+        Takes a token for ``key``. Returns 0 when allowed, otherwise the seconds until a token is available.
+        """
+        shard = self._shards[hash(key) % len(self._shards)]
+        bucket = shard.get(key)
+        if bucket is None:
+            bucket = shard[key] = TokenBucket(rate, burst)
+            if len(shard) > self._max_keys_per_shard:
+                shard.popitem(last=False)
+                self.evictions += 1
+        else:
+            shard.move_to_end(key)
+        wait = bucket.time_until_available()
+        if wait == 0:
+            bucket.take()
+        return wait
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+class MemoryRateLimitBackend:
+    """
+    Limits within this process only. No I/O per request; with several workers each one
+    enforces the full limit on its own.
+    """
+
+    def __init__(self, shards: int = 16, max_keys: int = 100000):
+        self._buckets = ShardedTokenBuckets(shards, max_keys)
+
+    async def acquire(self, key: str, rate: float, burst: float) -> float:
+        return self._buckets.take(key, rate, burst)
+
+    async def aclose(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": "memory", "keys": len(self._buckets), "evictions": self._buckets.evictions}
+
+class RedisRateLimitBackend:
+    """
+    Limits shared by every worker, with one Redis round trip per request.
+    """
+
+    def __init__(self, url: str, prefix: str = "hubspot-connector:ratelimit:", redis: Any = None):
+        if redis is None:
+            from redis.asyncio import Redis
+
+            redis = Redis.from_url(url, decode_responses=True)
+        self._redis = redis
+        self.prefix = prefix
+        self.round_trips = 0
+
+    def _redis_key(self, key: str) -> str:
+        # API keys end up in bucket keys, so only a digest is stored in Redis
+        return self.prefix + hashlib.sha256(key.encode()).hexdigest()[:32]
+
+    async def take(self, key: str, rate: float, burst: float, requested: int) -> Tuple[int, float]:
+        self.round_trips += 1
+        granted, wait = await self._redis.eval(_REDIS_TAKE_SCRIPT, 1, self._redis_key(key), rate, burst, requested)
+        return int(granted), float(wait)
+
+    async def refund(self, key: str, rate: float, burst: float, count: int) -> None:
+        self.round_trips += 1
+        await self._redis.eval(_REDIS_REFUND_SCRIPT, 1, self._redis_key(key), rate, burst, count)
+
+    async def acquire(self, key: str, rate: float, burst: float) -> float:
+        granted, wait = await self.take(key, rate, burst, 1)
+        return 0.0 if granted else wait
+
+    async def aclose(self) -> None:
+        await self._redis.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": "redis", "round_trips": self.round_trips}
+
+class LeasedRateLimitBackend:
+    """
+    Limits shared by every worker without a Redis round trip per request. A worker leases
+    up to ``lease_size`` tokens at once from the Redis bucket and spends them locally;
+    concurrent requests for the same key wait for a single lease call. A lease is only
+    spent for ``lease_ttl`` seconds. Whatever is left of it is credited back to the Redis
+    bucket when the key leases again or is evicted, so other workers lose at most one
+    lease per key for ``lease_ttl`` seconds and the shared limit stays ``RATE_LIMIT``.
+    (A key that goes idle keeps its leftover until then, but its Redis bucket refills to
+    the burst meanwhile anyway.)
+    """
+
+    def __init__(self, redis_backend: RedisRateLimitBackend, lease_size: int = 20, lease_ttl: float = 1.0, max_keys: int = 100000):
+        self._redis = redis_backend
+        self.lease_size = max(1, lease_size)
+        self.lease_ttl = lease_ttl
+        self.max_keys = max_keys
+        self._leases: "OrderedDict[str, List[float]]" = OrderedDict()  # key -> [tokens left, expires at, rate, burst]
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._waiting: Dict[str, int] = {}
+        self.leases = 0
+        self.refunded = 0
+
+    def _take_local(self, key: str) -> bool:
+        lease = self._leases.get(key)
+        if lease is None or lease[0] < 1 or lease[1] <= time.monotonic():
+            return False
+        lease[0] -= 1
+        return True
+
+    async def _refund(self, key: str, lease: List[float]) -> None:
+        unused = int(lease[0])
+        lease[0] = 0  # nothing may be spent from it while the refund is in flight
+        if unused >= 1:
+            self.refunded += unused
+            await self._redis.refund(key, lease[2], lease[3], unused)
+
+    async def _lease(self, key: str, rate: float, burst: float) -> float:
+        self.leases += 1
+        previous = self._leases.get(key)
+        if previous is not None:
+            await self._refund(key, previous)
+        # Lease enough for every request already waiting on this key, so a hot key needs fewer leases
+        requested = min(max(self.lease_size, self._waiting.get(key, 0)), max(1, int(burst)))
+        granted, wait = await self._redis.take(key, rate, burst, requested)
+        self._leases[key] = [granted, time.monotonic() + self.lease_ttl, rate, burst]
+        self._leases.move_to_end(key)
+        if len(self._leases) > self.max_keys:
+            evicted_key, evicted = self._leases.popitem(last=False)
+            await self._refund(evicted_key, evicted)
+        return wait if not granted else 0.0
+
+    async def acquire(self, key: str, rate: float, burst: float) -> float:
+        while True:
+            if self._take_local(key):
+                return 0.0
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = asyncio.ensure_future(self._lease(key, rate, burst))
+                self._pending[key] = pending
+                pending.add_done_callback(lambda _: self._pending.pop(key, None))
+            self._waiting[key] = self._waiting.get(key, 0) + 1
+            try:
+                wait = await asyncio.shield(pending)
+            finally:
+                self._waiting[key] -= 1
+                if not self._waiting[key]:
+                    del self._waiting[key]
+            if wait > 0:
+                # Redis had no tokens left for this key
+                return 0.0 if self._take_local(key) else wait
+            # Otherwise other waiters may have spent the fresh lease already; lease again
+
+    async def aclose(self) -> None:
+        await self._redis.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": "hybrid", "keys": len(self._leases), "leases": self.leases, "refunded": self.refunded, "round_trips": self._redis.round_trips}
+
+class RateLimiter:
+    """
+    Applies inbound limits per client. Every request takes a token from the client's bucket
+    for its route when the route has an override, then from the client's own bucket
+    (``RATE_LIMIT``, or the client's API key override). Clients sending one of the API keys
+    configured in ``key_limits`` are identified by that key; everyone else, including
+    clients sending unknown keys, by the remote address. Unknown keys therefore cannot
+    open fresh buckets. With ``trust_forwarded_for``, the address is the first hop of
+    ``X-Forwarded-For``, so clients behind a shared proxy get their own buckets. Only
+    enable it when that proxy sets the header, since clients could otherwise forge it.
+
+    Backend failures are logged and the request is let through, so a Redis outage cannot
+    take the API down with it.
+    """
+
+    def __init__(
+        self,
+        backend: Any,
+        default_limit: Limit,
+        route_limits: Optional[Dict[str, Limit]] = None,
+        key_limits: Optional[Dict[str, Limit]] = None,
+        key_header: str = "X-API-Key",
+        trust_forwarded_for: bool = False,
+    ):
+        self.backend = backend
+        self.default_limit = default_limit
+        self.route_limits = route_limits or {}
+        self.key_limits = key_limits or {}
+        self.key_header = key_header
+        self.trust_forwarded_for = trust_forwarded_for
+        self.allowed = 0
+        self.limited = 0
+        self.errors = 0
+
+    def _client_key(self, request: Request) -> Tuple[str, Optional[str]]:
+        api_key = request.headers.get(self.key_header)
+        if api_key and api_key in self.key_limits:
+            return f"key:{api_key}", api_key
+        forwarded = request.headers.get("X-Forwarded-For", "").split(",")[0].strip() if self.trust_forwarded_for else ""
+        if forwarded:
+            return f"ip:{forwarded}", None
+        return f"ip:{request.client.host if request.client else 'unknown'}", None
+
+    async def check(self, request: Request) -> None:
+        """
+        Raises HTTP 429 with Retry-After when the request is over its limit.
+        """
+        route = getattr(request.scope.get("route"), "path", request.url.path)
+        route_key = f"{request.method} {route}"
+        # An override may name the method ("POST /contacts") or apply to every method ("/contacts")
+        override = route_key if route_key in self.route_limits else route if route in self.route_limits else None
+        if override is not None and self.route_limits[override] is None:
+            return  # the route is exempt
+
+        client, api_key = self._client_key(request)
+        client_limit = self.key_limits[api_key] if api_key else self.default_limit
+        # The narrower route bucket goes first, so a request it rejects costs no overall token
+        checks = []
+        if override is not None:
+            checks.append((f"{route_key}|{client}", self.route_limits[override]))
+        if client_limit is not None:
+            checks.append((client, client_limit))
+
+        for key, (rate, burst) in checks:
+            try:
+                wait = await self.backend.acquire(key, rate, burst)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Rate limiter backend failed; allowing request: {e}")
+                break
+            if wait > 0:
+                self.limited += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Rate limit exceeded; try again later",
+                    headers={"Retry-After": str(max(1, math.ceil(wait)))},
+                )
+        self.allowed += 1
+
+    async def aclose(self) -> None:
+        await self.backend.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.backend.stats(), allowed=self.allowed, limited=self.limited, errors=self.errors)
+
+def build_rate_limiter() -> Optional[RateLimiter]:
+    """
+    Creates the limiter selected by ``RATE_LIMIT_MODE`` ("memory", "hybrid", "redis" or "none").
+    """
+    mode = settings.RATE_LIMIT_MODE.lower()
+    if mode == "memory":
+        backend: Any = MemoryRateLimitBackend(settings.RATE_LIMIT_SHARDS, settings.RATE_LIMIT_MAX_KEYS)
+    elif mode == "redis":
+        backend = RedisRateLimitBackend(settings.REDIS_URL)
+    elif mode == "hybrid":
+        backend = LeasedRateLimitBackend(
+            RedisRateLimitBackend(settings.REDIS_URL),
+            lease_size=settings.RATE_LIMIT_LEASE_SIZE,
+            lease_ttl=settings.RATE_LIMIT_LEASE_TTL_SECONDS,
+            max_keys=settings.RATE_LIMIT_MAX_KEYS,
+        )
+    else:
+        if mode != "none":
+            logger.warning(f"Unknown RATE_LIMIT_MODE '{settings.RATE_LIMIT_MODE}'; inbound rate limiting disabled")
+        return None
+    return RateLimiter(
+        backend,
+        parse_rate_limit(settings.RATE_LIMIT),
+        route_limits=parse_limit_overrides(settings.RATE_LIMIT_ROUTES),
+        key_limits=parse_limit_overrides(settings.RATE_LIMIT_API_KEYS),
+        key_header=settings.RATE_LIMIT_KEY_HEADER,
+        trust_forwarded_for=settings.RATE_LIMIT_TRUST_FORWARDED_FOR,
+    )
+
+def get_rate_limiter(request: Request) -> Optional[RateLimiter]:
+    return getattr(request.app.state, "rate_limiter", None)
+
+async def enforce_rate_limit(request: Request) -> None:
+    """
+    App-wide dependency; runs after routing so limits can be keyed by route template.
+    """
+    limiter = get_rate_limiter(request)
+    if limiter is not None:
+        await limiter.check(request)
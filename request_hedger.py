@@ -0,0 +1,91 @@
+import asyncio
+import math
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+import httpx
+from config import settings
+
+# Latency samples kept per lane, and how often the hedge delay is recomputed from them
+LATENCY_WINDOW = 500
+RECOMPUTE_EVERY = 25
+
+class RequestHedger:
+    """
+    Sends a second copy of a slow idempotent read and keeps whichever answer arrives first.
+
+    Each lane keeps its recent HubSpot latencies. A read still unanswered after the lane's
+    ``percentile`` latency (but at least ``min_delay`` seconds) is sent again. The slower
+    copy is cancelled. No hedge is sent before ``min_samples`` latencies are known.
+    """
+
+    def __init__(self, percentile: float = 95.0, min_delay: float = 0.05, min_samples: int = 50):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._delays: Dict[str, float] = {}
+        self._observed: Dict[str, int] = {}
+        self.hedges_sent = 0
+        self.hedge_wins = 0
+
+    def observe(self, lane: str, seconds: float) -> None:
+        latencies = self._latencies.setdefault(lane, deque(maxlen=LATENCY_WINDOW))
+        latencies.append(seconds)
+        observed = self._observed.get(lane, 0) + 1
+        self._observed[lane] = observed
+        if len(latencies) >= self.min_samples and observed % RECOMPUTE_EVERY == 0:
+            ordered = sorted(latencies)
+            rank = max(0, math.ceil(self.percentile / 100 * len(ordered)) - 1)
+            self._delays[lane] = max(self.min_delay, ordered[rank])
+
+    def delay(self, lane: str) -> Optional[float]:
+        return self._delays.get(lane)
+
+    async def request(self, lane: str, send: Callable[[], Awaitable[httpx.Response]], may_hedge: Callable[[], bool]) -> httpx.Response:
+        """
+        Runs ``send`` and, if it is slower than the lane's hedge delay and ``may_hedge``
+        allows it (e.g. a rate-limit token is free), runs it once more. Returns the first
+        response below 500; otherwise the first copy's outcome.
+        """
+        delay = self._delays.get(lane)
+        if delay is None:
+            return await send()
+        primary = asyncio.ensure_future(send())
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not may_hedge():
+                return await primary
+            self.hedges_sent += 1
+            hedge = asyncio.ensure_future(send())
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().status_code < 500:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+            return primary.result()
+        finally:
+            for task in (primary, hedge):
+                if task is None:
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # a losing copy's error is expected, not unhandled
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "percentile": self.percentile,
+            "delay_seconds": {lane: round(delay, 4) for lane, delay in self._delays.items()},
+            "hedges_sent": self.hedges_sent,
+            "hedge_wins": self.hedge_wins,
+            "win_ratio": round(self.hedge_wins / self.hedges_sent, 4) if self.hedges_sent else 0.0,
+        }
+
+def build_request_hedger() -> Optional[RequestHedger]:
+    if not settings.HUBSPOT_HEDGE_ENABLED:
+        return None
+    return RequestHedger(settings.HUBSPOT_HEDGE_PERCENTILE, settings.HUBSPOT_HEDGE_MIN_DELAY_MS / 1000, settings.HUBSPOT_HEDGE_MIN_SAMPLES)
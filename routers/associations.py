@@ -1,12 +1,16 @@
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from pydantic import BaseModel
-from typing import Dict, Any, List
-from hubspot_client import HubSpotClient
+from typing import Dict, Any, List, Optional, Tuple
+from hubspot_client import HubSpotClient, get_hubspot_client
 from models.api_response_model import APIResponse
+from models.batch_models import BatchReadInput
+from association_graph import expand_association_graph, parse_path
+from idempotency import IDEMPOTENCY_HEADER, IdempotencyStore, get_idempotency_store, request_fingerprint
+from config import settings
 
 router = APIRouter()
-hubspot_client = HubSpotClient()
 logger = logging.getLogger(__name__)
 
 class AssociationCreate(BaseModel):
@@ -21,11 +25,26 @@ class AssociationResponse(BaseModel):
     to_object_id: str
     association_type_id: str
 
+class AssociationBatchCreate(BaseModel):
+    associations: List[AssociationCreate]
+
 @router.post("/associations", response_model=APIResponse, status_code=status.HTTP_200_OK)
-async def create_association(association_data: AssociationCreate):
+async def create_association(
+    association_data: AssociationCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
+    hubspot_client: HubSpotClient = Depends(get_hubspot_client),
+    idempotency_store: Optional[IdempotencyStore] = Depends(get_idempotency_store),
+):
     """
-    Creates an association between two HubSpot objects.
+    Creates an association between two HubSpot objects. With an ``Idempotency-Key`` header
+    the association is created once per key and retries get the stored response back.
     """
+    if idempotency_key and idempotency_store:
+        fingerprint = request_fingerprint("POST", "/associations", association_data.dict())
+        return await idempotency_store.run(idempotency_key, fingerprint, lambda: _create_association(association_data, hubspot_client))
+    return await _create_association(association_data, hubspot_client)
+
+async def _create_association(association_data: AssociationCreate, hubspot_client: HubSpotClient) -> APIResponse:
     try:
         response = await hubspot_client.create_association(
             association_data.from_object_type,
@@ -46,10 +65,114 @@ async def create_association(association_data: AssociationCreate):
         logger.error(f"Unexpected error in create_association: {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
 
+@router.post("/associations/batch", status_code=status.HTTP_200_OK)
+async def create_associations_batch(
+    batch: AssociationBatchCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
+    hubspot_client: HubSpotClient = Depends(get_hubspot_client),
+    idempotency_store: Optional[IdempotencyStore] = Depends(get_idempotency_store),
+):
+    """
+    Creates many associations at once.
+
+    Pairs are grouped by (from_object_type, to_object_type) and sent as concurrent v4 batch
+    calls. The response holds one result per input pair, in input order. With an
+    ``Idempotency-Key`` header the batch is sent once per key and retries get the stored
+    response back.
+    """
+    if idempotency_key and idempotency_store:
+        fingerprint = request_fingerprint("POST", "/associations/batch", batch.dict())
+        return await idempotency_store.run(idempotency_key, fingerprint, lambda: _create_associations_batch(batch, hubspot_client))
+    return await _create_associations_batch(batch, hubspot_client)
+
+async def _create_associations_batch(batch: AssociationBatchCreate, hubspot_client: HubSpotClient) -> Dict[str, Any]:
+    try:
+        groups: Dict[Tuple[str, str], List[Tuple[int, AssociationCreate]]] = {}
+        for index, association in enumerate(batch.associations):
+            groups.setdefault((association.from_object_type, association.to_object_type), []).append((index, association))
+
+        keys = list(groups)
+        outcomes = await asyncio.gather(*(
+            hubspot_client.create_associations(
+                from_type,
+                to_type,
+                [(a.from_object_id, a.to_object_id, a.association_type_id) for _, a in groups[(from_type, to_type)]],
+            )
+            for from_type, to_type in keys
+        ))
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(batch.associations)
+        for key, errors in zip(keys, outcomes):
+            for (index, _), error in zip(groups[key], errors):
+                if error is None:
+                    results[index] = {"index": index, "action": "created", "error": None}
+                else:
+                    detail = error.detail if isinstance(error, HTTPException) else str(error)
+                    results[index] = {"index": index, "action": None, "error": detail}
+        failed = sum(1 for result in results if result["error"])
+        return {
+            "status": "success" if not failed else "partial_success",
+            "message": f"Created {len(results) - failed} of {len(results)} associations",
+            "results": results,
+        }
+    except HTTPException as e:
+        logger.error(f"HTTPException in create_associations_batch: {e.detail}")
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error in create_associations_batch: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+@router.post("/associations/{object_type}/{to_object_type}/batch/read", status_code=status.HTTP_200_OK)
+async def batch_read_associations(object_type: str, to_object_type: str, data: BatchReadInput, hubspot_client: HubSpotClient = Depends(get_hubspot_client)):
+    """
+    Retrieves the associations of many objects of one type to another type.
+    """
+    if len(data.ids) > settings.BATCH_READ_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {settings.BATCH_READ_MAX_IDS} IDs can be read in one request",
+        )
+    try:
+        associations = await hubspot_client.batch_read_associations(object_type, data.ids, to_object_type)
+        return {"results": [{"id": object_id, "associations": associations.get(object_id, [])} for object_id in data.ids]}
+    except HTTPException as e:
+        logger.error(f"HTTPException in batch_read_associations: {e.detail}")
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error in batch_read_associations: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+# Declared before the generic three-segment read below, which would otherwise match it
+@router.get("/associations/graph/{object_type}/{object_id}", status_code=status.HTTP_200_OK)
+async def get_association_graph(object_type: str, object_id: str, path: str, hydrate: bool = True, hubspot_client: HubSpotClient = Depends(get_hubspot_client)):
+    """
+    Expands the associations of one object along a path such as
+    ``contacts -> companies -> tickets`` and returns the objects and edges as one graph document.
+    """
+    try:
+        object_types = parse_path(object_type, path)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    try:
+        return await expand_association_graph(
+            hubspot_client,
+            object_type,
+            object_id,
+            object_types,
+            hydrate=hydrate,
+            max_nodes=settings.GRAPH_MAX_NODES,
+        )
+    except HTTPException as e:
+        logger.error(f"HTTPException in get_association_graph: {e.detail}")
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error in get_association_graph: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
 @router.get("/associations/{object_type}/{object_id}/{to_object_type}", status_code=status.HTTP_200_OK)
-async def get_associations(object_type: str, object_id: str, to_object_type: str):
+async def get_associations(object_type: str, object_id: str, to_object_type: str, hubspot_client: HubSpotClient = Depends(get_hubspot_client)):
     """
-    Retrieves associations for a given HubSpot object.
+    Retrieves all associations for a given HubSpot object, following HubSpot's pagination.
     """
     try:
         response = await hubspot_client.get_associations(object_type, object_id, to_object_type)
@@ -1,59 +1,182 @@
-from fastapi import APIRouter, HTTPException, status
-from pydantic import BaseModel
-from typing import Type, Any
-from hubspot_client import HubSpotClient
+import asyncio
+import json
+import orjson
+import zlib
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import Type, Any, AsyncIterator, Dict, List, Optional, Tuple
+from hubspot_client import HubSpotClient, get_hubspot_client
 from models.api_response_model import APIResponse
+from models.batch_models import BatchReadInput
+from json_stream import iter_json_records
+from write_queue import WriteQueue, get_write_queue, register_writer
+from idempotency import IDEMPOTENCY_HEADER, IdempotencyStore, get_idempotency_store, request_fingerprint
+from config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+class _RequestBodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body iterator itself consumes the request body.
+
+    Starlette's default implementation listens for client disconnects by reading
+    ``receive()`` concurrently, which would swallow request body chunks that the iterator
+    is still reading. A disconnect surfaces as ClientDisconnect from ``request.stream()``.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+def _selector(value: Optional[str]) -> Optional[List[str]]:
+    # "email, firstname" -> ["email", "firstname"]; empty selections mean HubSpot's defaults
+    names = [name.strip() for name in value.split(",") if name.strip()] if value else []
+    return names or None
+
+def _selection(properties: Optional[List[str]], properties_with_history: Optional[List[str]], associations: Optional[List[str]] = None) -> Dict[str, List[str]]:
+    # Keyword arguments for the client's read methods, holding only the selections made
+    selected = {"properties": properties, "properties_with_history": properties_with_history, "associations": associations}
+    return {name: value for name, value in selected.items() if value}
+
+def _properties(data: BaseModel, **options: Any) -> Dict[str, Any]:
+    # A record's associations travel with it but are not HubSpot properties
+    return data.dict(by_alias=True, exclude={"associations"}, **options)
+
+def _associations(data: BaseModel) -> List[Dict[str, Any]]:
+    return [association.dict() for association in getattr(data, "associations", None) or []]
+
+def _with_associations(payload: Dict[str, Any], associations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return dict(payload, associations=associations) if associations else payload
+
+def _queued_record(data: BaseModel) -> Dict[str, Any]:
+    # Only the fields the caller set are stored. The worker parses the record again, so a
+    # create gets the full _properties(data) and an update only the set fields, as when
+    # the record is written right away.
+    return _with_associations(_properties(data, exclude_unset=True), _associations(data))
+
+def _response_id_field(object_type: str) -> str:
+    # "contacts" -> "hubspot_contact_id", "companies" -> "hubspot_company_id"
+    singular = object_type[:-3] + "y" if object_type.endswith("ies") else object_type.rstrip("s")
+    return f"hubspot_{singular}_id"
+
 def create_crud_router(
     object_type: str,
     create_schema: Type[BaseModel],
     response_schema: Type[BaseModel],
-    search_property: str = None
+    search_property: str = None,
+    search_property_is_unique: bool = False
 ) -> APIRouter:
+    """
+    Builds the CRUD router for a HubSpot object type.
+
+    When ``search_property_is_unique`` is set, ``search_property`` is a HubSpot unique-value
+    property (e.g. contact ``email``) and writes use a single native upsert call. Otherwise
+    the object is looked up via the search API and then updated or created.
+    """
     router = APIRouter()
-    hubspot_client = HubSpotClient()
+    id_field = _response_id_field(object_type)
 
-    @router.post(f"/{object_type}", response_model=APIResponse, status_code=status.HTTP_200_OK)
-    async def create_or_update_object(data: create_schema):
-        """
-        Creates a new HubSpot object or updates an existing one.
-        """
+    async def unchanged_response(object_id: str, associations: List[Dict[str, Any]], hubspot_client: HubSpotClient) -> APIResponse:
+        if associations:
+            await hubspot_client.associate_object(object_type, object_id, associations)
+        return APIResponse(
+            status="success",
+            message=f"{object_type.capitalize()} unchanged; no update sent",
+            **{id_field: object_id},
+            action="unchanged"
+        )
+
+    async def write_object(data: BaseModel, prefer: Optional[str], hubspot_client: HubSpotClient, write_queue: Optional[WriteQueue]) -> Any:
         try:
-            existing_object = None
-            if search_property and getattr(data, search_property, None):
-                existing_object = await hubspot_client.search_object(
-                    object_type,
-                    search_property,
-                    getattr(data, search_property),
-                    response_schema
+            search_value = getattr(data, search_property, None) if search_property else None
+            if write_queue and prefer and "respond-async" in prefer.lower():
+                job_id = await write_queue.enqueue(object_type, _queued_record(data), record_key=search_value)
+                return JSONResponse(
+                    status_code=status.HTTP_202_ACCEPTED,
+                    content={
+                        "status": "accepted",
+                        "message": f"{object_type.capitalize()} write queued",
+                        "job_id": job_id,
+                        "status_url": f"/jobs/{job_id}",
+                    },
+                    headers={"Location": f"/jobs/{job_id}", "Preference-Applied": "respond-async"},
                 )
 
-            if existing_object:
-                updated_object = await hubspot_client.update_object(
+            associations = _associations(data)
+            if search_value and search_property_is_unique:
+                properties = _properties(data, exclude_unset=True)
+                known_id = await hubspot_client.find_object_id(object_type, search_property, search_value, search=False)
+                if known_id and not await hubspot_client.properties_to_write(object_type, known_id, properties, trim=False):
+                    return await unchanged_response(known_id, associations, hubspot_client)
+                upserted_object, created = await hubspot_client.upsert_object(
                     object_type,
-                    existing_object.id,
-                    data.dict(exclude_unset=True, by_alias=True),
+                    search_property,
+                    search_value,
+                    properties,
                     response_schema
                 )
+                if associations:
+                    # HubSpot's upsert takes no inline associations
+                    await hubspot_client.associate_object(object_type, upserted_object.id, associations)
+                action = "created" if created else "updated"
+                return APIResponse(
+                    status="success",
+                    message=f"{object_type.capitalize()} {action} successfully",
+                    **{id_field: upserted_object.id},
+                    action=action
+                )
+
+            updated_object = None
+            if search_value:
+                existing_id = await hubspot_client.find_object_id(object_type, search_property, search_value)
+                try:
+                    if existing_id:
+                        changes = await hubspot_client.properties_to_write(object_type, existing_id, _properties(data, exclude_unset=True))
+                        if not changes:
+                            return await unchanged_response(existing_id, associations, hubspot_client)
+                        updated_object = await hubspot_client.update_object(
+                            object_type,
+                            existing_id,
+                            changes,
+                            response_schema
+                        )
+                except HTTPException as e:
+                    if e.status_code != status.HTTP_404_NOT_FOUND:
+                        raise
+                    # The ID was stale (record deleted or merged); its index, mirror and cache
+                    # entries have been dropped, so the identifier is resolved again by search
+                    existing_id = await hubspot_client.find_object_id(object_type, search_property, search_value)
+                    if existing_id:
+                        updated_object = await hubspot_client.update_object(
+                            object_type,
+                            existing_id,
+                            _properties(data, exclude_unset=True),
+                            response_schema
+                        )
+
+            if updated_object:
+                if associations:
+                    await hubspot_client.associate_object(object_type, updated_object.id, associations)
                 return APIResponse(
                     status="success",
                     message=f"{object_type.capitalize()} updated successfully",
-                    **{f"hubspot_{object_type}_id": updated_object.id},
+                    **{id_field: updated_object.id},
                     action="updated"
                 )
             else:
                 new_object = await hubspot_client.create_object(
                     object_type,
-                    data.dict(by_alias=True),
-                    response_schema
+                    _properties(data),
+                    response_schema,
+                    associations=associations
                 )
                 return APIResponse(
                     status="success",
                     message=f"{object_type.capitalize()} created successfully",
-                    **{f"hubspot_{object_type}_id": new_object.id},
+                    **{id_field: new_object.id},
                     action="created"
                 )
         except HTTPException as e:
@@ -63,13 +186,161 @@ def create_crud_router(
             logger.error(f"Unexpected error in {object_type} POST: {e}", exc_info=True)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
 
-    @router.get(f"/{object_type}/{{object_id}}", response_model=response_schema, status_code=status.HTTP_200_OK)
-    async def get_object(object_id: str):
+    @router.post(f"/{object_type}", response_model=APIResponse, status_code=status.HTTP_200_OK)
+    async def create_or_update_object(
+        data: create_schema,
+        prefer: Optional[str] = Header(None),
+        idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
+        hubspot_client: HubSpotClient = Depends(get_hubspot_client),
+        write_queue: Optional[WriteQueue] = Depends(get_write_queue),
+        idempotency_store: Optional[IdempotencyStore] = Depends(get_idempotency_store),
+    ):
+        """
+        Creates a new HubSpot object or updates an existing one.
+
+        Writes are compared with the object's last known state first (see
+        ``HubSpotClient.properties_to_write``): an unchanged record is not sent and reports
+        ``action="unchanged"``, and an update sends only the properties that changed.
+
+        With ``Prefer: respond-async`` and the write queue enabled, the record is queued
+        durably and ``202`` is returned right away with a job ID to poll at ``/jobs/{job_id}``.
+
+        With an ``Idempotency-Key`` header the write runs once per key; retries get the
+        stored response back (see ``IdempotencyStore``).
+        """
+        if idempotency_key and idempotency_store:
+            fingerprint = request_fingerprint("POST", f"/{object_type}", data.dict(by_alias=True), prefer)
+            return await idempotency_store.run(idempotency_key, fingerprint, lambda: write_object(data, prefer, hubspot_client, write_queue))
+        return await write_object(data, prefer, hubspot_client, write_queue)
+
+    async def export_lines(first_page: Dict[str, Any], selection: Dict[str, List[str]], hubspot_client: HubSpotClient) -> AsyncIterator[bytes]:
+        # At most two pages are held at once: the one being sent and the prefetched next one
+        page = first_page
+        next_page = None
+        try:
+            while True:
+                after = ((page.get("paging") or {}).get("next") or {}).get("after")
+                if after:
+                    next_page = asyncio.create_task(hubspot_client.list_objects_page(object_type, after=after, **selection))
+                yield b"".join(orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE) for obj in page.get("results", []))
+                if next_page is None:
+                    break
+                page, next_page = await next_page, None
+        except Exception as e:
+            # Headers are already sent, so the failure is reported as the final line
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            logger.error(f"{object_type.capitalize()} export failed mid-stream: {error}")
+            yield (json.dumps({"error": error}) + "\n").encode("utf-8")
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+
+    @router.post(f"/{object_type}/batch/read", status_code=status.HTTP_200_OK)
+    async def batch_read(data: BatchReadInput, hubspot_client: HubSpotClient = Depends(get_hubspot_client)):
+        """
+        Retrieves many HubSpot objects by ID.
+
+        Cached objects are served locally; the rest are fetched with HubSpot batch reads of
+        up to 100 IDs, run concurrently. Results follow the input order, one per requested
+        ID, with ``found`` set to false for IDs HubSpot does not know.
+
+        ``properties`` and ``propertiesWithHistory`` are passed to HubSpot. For each object
+        type in ``associations`` the objects' v4 associations are read in batches and added
+        under ``associations.<type>.results``.
+        """
+        if len(data.ids) > settings.BATCH_READ_MAX_IDS:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"At most {settings.BATCH_READ_MAX_IDS} IDs can be read in one request",
+            )
+        try:
+            selection = _selection(data.properties, data.properties_with_history)
+            objects = await hubspot_client.batch_read_objects(object_type, data.ids, use_cache=True, **selection)
+            if data.associations and objects:
+                edges = await asyncio.gather(*(
+                    hubspot_client.batch_read_associations(object_type, list(objects), to_object_type, use_cache=True)
+                    for to_object_type in data.associations
+                ))
+                # Cached objects are shared, so associations go on copies
+                objects = {
+                    object_id: dict(obj, associations={
+                        to_object_type: {"results": by_id.get(object_id, [])} for to_object_type, by_id in zip(data.associations, edges)
+                    })
+                    for object_id, obj in objects.items()
+                }
+            results = [
+                {"id": object_id, "found": object_id in objects, "object": objects.get(object_id)}
+                for object_id in data.ids
+            ]
+            # Raw HubSpot objects need no encoding beyond orjson
+            return Response(content=orjson.dumps({"status": "success", "results": results}), media_type="application/json")
+        except HTTPException as e:
+            logger.error(f"HTTPException in {object_type} batch read: {e.detail}")
+            raise e
+        except Exception as e:
+            logger.error(f"Unexpected error in {object_type} batch read: {e}", exc_info=True)
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+    @router.get(f"/{object_type}/export", status_code=status.HTTP_200_OK)
+    async def export_objects(
+        request: Request,
+        properties: Optional[str] = None,
+        properties_with_history: Optional[str] = Query(None, alias="propertiesWithHistory"),
+        associations: Optional[str] = None,
+        hubspot_client: HubSpotClient = Depends(get_hubspot_client),
+    ):
+        """
+        Streams every HubSpot object of this type as NDJSON, one raw object per line.
+
+        ``properties``, ``propertiesWithHistory`` and ``associations`` are comma-separated
+        selections passed to HubSpot (HubSpot's default properties otherwise). Pages are fetched
+        with HubSpot's ``after`` cursor while the previous page is being sent. The body is
+        gzip-compressed when the client sends ``Accept-Encoding: gzip``.
+        """
+        try:
+            selection = _selection(_selector(properties), _selector(properties_with_history), _selector(associations))
+            # The first page is fetched up front so upstream errors still get a proper status code
+            first_page = await hubspot_client.list_objects_page(object_type, **selection)
+        except HTTPException as e:
+            logger.error(f"HTTPException in {object_type} export: {e.detail}")
+            raise e
+        except Exception as e:
+            logger.error(f"Unexpected error in {object_type} export: {e}", exc_info=True)
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+
+        body = export_lines(first_page, selection, hubspot_client)
+        headers = {"Vary": "Accept-Encoding"}
+        if "gzip" in request.headers.get("accept-encoding", "").lower():
+            body = _gzip_stream(body)
+            headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
+
+    @router.get(f"/{object_type}/{{object_id}}", response_model=response_schema, response_model_exclude_unset=True, status_code=status.HTTP_200_OK)
+    async def get_object(
+        object_id: str,
+        properties: Optional[str] = None,
+        properties_with_history: Optional[str] = Query(None, alias="propertiesWithHistory"),
+        associations: Optional[str] = None,
+        hubspot_client: HubSpotClient = Depends(get_hubspot_client),
+    ):
         """
         Retrieves a HubSpot object by its ID.
+
+        ``properties``, ``propertiesWithHistory`` and ``associations`` are comma-separated
+        selections passed to HubSpot, so only the selected data is fetched. A plain property
+        selection is served from the cache when a cached copy carries every selected property.
+
+        With ``HUBSPOT_READ_PASSTHROUGH`` (the default) HubSpot's JSON body is returned as
+        is, without building and validating ``response_schema``; it has the same shape.
         """
+        selection = _selection(_selector(properties), _selector(properties_with_history), _selector(associations))
         try:
-            obj = await hubspot_client.get_object_by_id(object_type, object_id, response_schema)
+            if settings.HUBSPOT_READ_PASSTHROUGH:
+                body = await hubspot_client.get_object_json(object_type, object_id, **selection)
+                if body is None:
+                    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"{object_type.capitalize()} not found")
+                return Response(content=body, media_type="application/json")
+            obj = await hubspot_client.get_object_by_id(object_type, object_id, response_schema, **selection)
             if not obj:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"{object_type.capitalize()} not found")
             return obj
@@ -80,4 +351,181 @@ def create_crud_router(
             logger.error(f"Unexpected error in {object_type} GET: {e}", exc_info=True)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
 
+    async def unchanged_line(index: int, object_id: str, associations: List[Dict[str, Any]], hubspot_client: HubSpotClient) -> Dict[str, Any]:
+        try:
+            if associations:
+                await hubspot_client.associate_object(object_type, object_id, associations)
+        except HTTPException as e:
+            return {"index": index, "id": None, "action": None, "error": e.detail, "_status": e.status_code, "_operation": "update"}
+        return {"index": index, "id": object_id, "action": "unchanged", "error": None}
+
+    async def write_records(records: List[Tuple[int, BaseModel]], existing_ids: Dict[str, str], hubspot_client: HubSpotClient) -> List[Dict[str, Any]]:
+        groups: Dict[str, List[Tuple[int, Dict[str, Any], str]]] = {"upsert": [], "update": [], "create": []}
+        lines = []
+        for index, data in records:
+            search_value = getattr(data, search_property, None) if search_property else None
+            associations = _associations(data)
+            if search_value and search_property_is_unique:
+                properties = _properties(data, exclude_unset=True)
+                known_id = await hubspot_client.find_object_id(object_type, search_property, search_value, search=False)
+                if known_id and not await hubspot_client.properties_to_write(object_type, known_id, properties, trim=False):
+                    lines.append(await unchanged_line(index, known_id, associations, hubspot_client))
+                    continue
+                payload = {"idProperty": search_property, "id": search_value, "properties": properties}
+                groups["upsert"].append((index, _with_associations(payload, associations), None))
+            elif search_value in existing_ids:
+                object_id = existing_ids[search_value]
+                changes = await hubspot_client.properties_to_write(object_type, object_id, _properties(data, exclude_unset=True))
+                if not changes:
+                    lines.append(await unchanged_line(index, object_id, associations, hubspot_client))
+                    continue
+                groups["update"].append((index, _with_associations({"id": object_id, "properties": changes}, associations), "updated"))
+            else:
+                groups["create"].append((index, _with_associations({"properties": _properties(data)}, associations), "created"))
+
+        operations = [operation for operation, group in groups.items() if group]
+        # A failed batch call must not discard the results of the others, which HubSpot has already applied
+        outcomes = await asyncio.gather(*(
+            hubspot_client.batch_write_records(object_type, operation, [payload for _, payload, _ in groups[operation]])
+            for operation in operations
+        ), return_exceptions=True)
+
+        for operation, results in zip(operations, outcomes):
+            if isinstance(results, BaseException):
+                results = [results] * len(groups[operation])
+            for (index, _, action), result in zip(groups[operation], results):
+                if isinstance(result, BaseException):
+                    error = result.detail if isinstance(result, HTTPException) else str(result)
+                    status_code = result.status_code if isinstance(result, HTTPException) else None
+                    lines.append({"index": index, "id": None, "action": None, "error": error, "_status": status_code, "_operation": operation})
+                else:
+                    if action is None:
+                        action = "created" if result.get("new") else "updated"
+                    lines.append({"index": index, "id": result.get("id"), "action": action, "error": None})
+        return lines
+
+    async def write_chunk(chunk: List[Tuple[int, BaseModel]], hubspot_client: HubSpotClient) -> List[Dict[str, Any]]:
+        """
+        Writes one chunk of validated records with as few batch calls as possible and
+        returns one result line per record. Failed lines keep the HubSpot status code and
+        operation under ``_status`` and ``_operation`` for callers that retry.
+        """
+        lookup = search_property and not search_property_is_unique
+        existing_ids: Dict[str, str] = {}
+        if lookup:
+            values = [getattr(data, search_property) for _, data in chunk if getattr(data, search_property, None)]
+            existing_ids = await hubspot_client.find_object_ids(object_type, search_property, values)
+
+        lines = await write_records(chunk, existing_ids, hubspot_client)
+
+        if lookup:
+            # Updates that hit a stale indexed ID (404) are resolved again and retried once
+            stale = {line["index"] for line in lines if line.get("_operation") == "update" and line.get("_status") == status.HTTP_404_NOT_FOUND}
+            if stale:
+                retry = [(index, data) for index, data in chunk if index in stale]
+                values = [getattr(data, search_property) for _, data in retry]
+                try:
+                    existing_ids = await hubspot_client.find_object_ids(object_type, search_property, values)
+                    retried = {line["index"]: line for line in await write_records(retry, existing_ids, hubspot_client)}
+                except Exception as e:
+                    # The rest of the chunk is already written, so its lines are kept; the stale ones stay failed
+                    logger.error(f"Retrying stale {object_type} updates failed: {e}")
+                    retried = {}
+                lines = [retried.get(line["index"], line) for line in lines]
+        return lines
+
+    async def write_queued(records: List[Tuple[int, Dict[str, Any]]], hubspot_client: HubSpotClient) -> List[Dict[str, Any]]:
+        return await write_chunk([(index, create_schema.parse_obj(payload)) for index, payload in records], hubspot_client)
+
+    register_writer(object_type, write_queued)
+
+    async def bulk_results(body: AsyncIterator[bytes], hubspot_client: HubSpotClient) -> AsyncIterator[bytes]:
+        # Result lines are produced by the chunk writers and streamed out as soon as they are ready;
+        # the bounded queue and semaphore apply back-pressure to reading the request body.
+        results: asyncio.Queue = asyncio.Queue(maxsize=settings.BULK_CHUNK_SIZE * settings.BULK_MAX_CONCURRENCY)
+        slots = asyncio.Semaphore(settings.BULK_MAX_CONCURRENCY)
+        writers = set()
+
+        async def run_chunk(chunk: List[Tuple[int, BaseModel]]) -> None:
+            try:
+                lines = await write_chunk(chunk, hubspot_client)
+                for line in lines:
+                    line.pop("_status", None)
+                    line.pop("_operation", None)
+            except Exception as e:
+                error = e.detail if isinstance(e, HTTPException) else str(e)
+                logger.error(f"Bulk {object_type} chunk failed: {error}")
+                lines = [{"index": index, "id": None, "action": None, "error": error} for index, _ in chunk]
+            finally:
+                slots.release()
+            for line in lines:
+                await results.put(line)
+
+        async def start_chunk(chunk: List[Tuple[int, BaseModel]]) -> None:
+            await slots.acquire()
+            writer = asyncio.create_task(run_chunk(chunk))
+            writers.add(writer)
+            writer.add_done_callback(writers.discard)
+
+        async def read_body() -> None:
+            chunk: List[Tuple[int, BaseModel]] = []
+            index = -1
+            try:
+                async for index, record in _enumerate(iter_json_records(body)):
+                    try:
+                        chunk.append((index, create_schema.parse_obj(record)))
+                    except (ValidationError, TypeError) as e:
+                        await results.put({"index": index, "id": None, "action": None, "error": f"Validation error: {e}"})
+                        continue
+                    if len(chunk) >= settings.BULK_CHUNK_SIZE:
+                        await start_chunk(chunk)
+                        chunk = []
+            except ValueError as e:
+                await results.put({"index": index + 1, "id": None, "action": None, "error": f"Malformed request body: {e}"})
+            except Exception as e:
+                logger.error(f"Unexpected error reading {object_type} bulk body: {e}", exc_info=True)
+                await results.put({"index": index + 1, "id": None, "action": None, "error": f"Internal server error: {e}"})
+            if chunk:
+                await start_chunk(chunk)
+            if writers:
+                await asyncio.gather(*writers)
+            await results.put(None)
+
+        reader = asyncio.create_task(read_body())
+        try:
+            while True:
+                line = await results.get()
+                if line is None:
+                    break
+                yield (json.dumps(line) + "\n").encode("utf-8")
+        finally:
+            reader.cancel()
+            for writer in list(writers):
+                writer.cancel()
+
+    @router.post(f"/{object_type}/batch", status_code=status.HTTP_200_OK)
+    async def bulk_create_or_update(request: Request, hubspot_client: HubSpotClient = Depends(get_hubspot_client)):
+        """
+        Creates or updates many HubSpot objects from a streamed NDJSON body or JSON array.
+
+        Records are validated as they arrive, written upstream in batch-sized chunks and
+        reported back as NDJSON lines of ``{"index", "id", "action", "error"}`` in completion order.
+        """
+        return _RequestBodyStreamingResponse(bulk_results(request.stream(), hubspot_client), media_type="application/x-ndjson")
+
     return router
+
+async def _gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    # wbits=31 selects the gzip container; each chunk is sync-flushed so clients see progress
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+async def _enumerate(records: AsyncIterator[Any]) -> AsyncIterator[Tuple[int, Any]]:
+    index = 0
+    async for record in records:
+        yield index, record
+        index += 1
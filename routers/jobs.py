@@ -0,0 +1,24 @@
+import logging
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Any, Dict, Optional
+from write_queue import WriteQueue, get_write_queue
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/jobs/{job_id}", status_code=status.HTTP_200_OK)
+async def get_job(job_id: str, write_queue: Optional[WriteQueue] = Depends(get_write_queue)) -> Dict[str, Any]:
+    """
+    Returns the status of a write accepted with 202: "queued", "running", "succeeded"
+    (with the HubSpot ID and action) or "failed" (with the last error).
+    """
+    if write_queue is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="The write queue is not enabled")
+    try:
+        job = await write_queue.get_job(job_id)
+    except Exception as e:
+        logger.error(f"Unexpected error in get_job: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {e}")
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
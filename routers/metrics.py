@@ -0,0 +1,33 @@
+from typing import Optional
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from hubspot_client import HubSpotClient, get_hubspot_client
+from rate_limiter import RateLimiter, get_rate_limiter
+from routers.webhooks import get_webhook_pipeline
+from telemetry import PROMETHEUS_CONTENT_TYPE, render_metrics
+from webhook_pipeline import WebhookPipeline
+from write_queue import WriteQueue, get_write_queue
+from idempotency import IdempotencyStore, get_idempotency_store
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(
+    hubspot_client: HubSpotClient = Depends(get_hubspot_client),
+    webhook_pipeline: WebhookPipeline = Depends(get_webhook_pipeline),
+    rate_limiter: Optional[RateLimiter] = Depends(get_rate_limiter),
+    write_queue: Optional[WriteQueue] = Depends(get_write_queue),
+    idempotency_store: Optional[IdempotencyStore] = Depends(get_idempotency_store),
+) -> PlainTextResponse:
+    """
+    Returns request latency, HubSpot call latency, retries, throttling, connection pool,
+    queue and cache metrics in the Prometheus text format.
+    """
+    stats = dict(hubspot_client.stats(), webhooks=webhook_pipeline.stats())
+    if rate_limiter:
+        stats["rate_limiter"] = rate_limiter.stats()
+    if write_queue:
+        stats["write_queue"] = write_queue.stats()
+    if idempotency_store:
+        stats["idempotency"] = idempotency_store.stats()
+    return PlainTextResponse(render_metrics(stats), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,34 @@
+import logging
+from fastapi import APIRouter, Depends, status
+from typing import Dict, Any, Optional
+from hubspot_client import HubSpotClient, get_hubspot_client
+from rate_limiter import RateLimiter, get_rate_limiter
+from routers.webhooks import get_webhook_pipeline
+from webhook_pipeline import WebhookPipeline
+from write_queue import WriteQueue, get_write_queue
+from idempotency import IdempotencyStore, get_idempotency_store
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/stats", status_code=status.HTTP_200_OK)
+async def get_stats(
+    hubspot_client: HubSpotClient = Depends(get_hubspot_client),
+    webhook_pipeline: WebhookPipeline = Depends(get_webhook_pipeline),
+    rate_limiter: Optional[RateLimiter] = Depends(get_rate_limiter),
+    write_queue: Optional[WriteQueue] = Depends(get_write_queue),
+    idempotency_store: Optional[IdempotencyStore] = Depends(get_idempotency_store),
+) -> Dict[str, Any]:
+    """
+    Returns runtime statistics for the shared HubSpot client (connection pool usage, etc.),
+    the webhook processing pipeline, the inbound rate limiter, the write queue and the
+    idempotency store.
+    """
+    stats = dict(hubspot_client.stats(), webhooks=webhook_pipeline.stats())
+    if rate_limiter:
+        stats["rate_limiter"] = rate_limiter.stats()
+    if write_queue:
+        stats["write_queue"] = write_queue.stats()
+    if idempotency_store:
+        stats["idempotency"] = idempotency_store.stats()
+    return stats
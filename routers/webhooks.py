@@ -1,54 +1,185 @@
 import logging
-from fastapi import APIRouter, Request, HTTPException, status
-from typing import List, Dict, Any
+import re
+from fastapi import APIRouter, Depends, Request, HTTPException, status
+from typing import List, Dict, Any, Optional, Tuple
+from hubspot_client import HubSpotClient
+from upstream_scheduler import PRIORITY_LOW
+from webhook_pipeline import RefreshCoalescer, WebhookPipeline, verify_v3_signature
+from config import settings
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Webhook subscription prefixes mapped to the CRM object types used by the routers
+WEBHOOK_OBJECT_TYPES = {
+    "contact": "contacts",
+    "company": "companies",
+    "ticket": "tickets",
+    "deal": "deals",
+}
+
+# Escapes HubSpot decodes in the URI before signing it; every other escape is signed as sent
+SIGNATURE_DECODED_ESCAPES = re.compile(r"%(3A|2F|3F|40|21|24|27|28|29|2A|2C|3B)", re.IGNORECASE)
+
+# Event kinds after which any cached copy of the object is out of date
+CACHE_INVALIDATING_EVENTS = {"propertyChange", "deletion", "merge", "restore", "privacyDeletion"}
+
+# Event kinds after which the identifier index must no longer point at the object
+ID_INDEX_REMOVING_EVENTS = {"deletion", "merge", "privacyDeletion"}
+
+# Event kinds after which the object is fetched again (coalesced into batch reads)
+REFRESHING_EVENTS = {"creation", "propertyChange", "restore", "merge", "associationChange"}
+
+def parse_subscription_type(event: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Splits ``subscriptionType`` (e.g. "contact.propertyChange") into the router object type
+    ("contacts") and the event kind ("propertyChange").
+    """
+    subscription_type = event.get("subscriptionType") or ""
+    prefix, _, kind = subscription_type.partition(".")
+    return WEBHOOK_OBJECT_TYPES.get(prefix), kind or None
+
+def affected_object_ids(event: Dict[str, Any]) -> List[str]:
+    """
+    Returns every object ID touched by an event. Merge events name the surviving and merged records.
+    """
+    ids = [event.get("objectId"), event.get("primaryObjectId"), event.get("newObjectId")]
+    ids.extend(event.get("mergedObjectIds") or [])
+    return list(dict.fromkeys(str(object_id) for object_id in ids if object_id is not None))
+
+def association_change_edges(event: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+    """
+    Returns the ``(object_type, object_id, to_object_type)`` edge lists changed by an
+    ``associationChange`` event, in both directions. ``associationType`` looks like
+    "CONTACT_TO_COMPANY".
+    """
+    from_prefix, _, to_prefix = (event.get("associationType") or "").lower().partition("_to_")
+    from_type, to_type = WEBHOOK_OBJECT_TYPES.get(from_prefix), WEBHOOK_OBJECT_TYPES.get(to_prefix)
+    from_id, to_id = event.get("fromObjectId"), event.get("toObjectId")
+    if not from_type or not to_type or from_id is None or to_id is None:
+        return []
+    return [(from_type, str(from_id), to_type), (to_type, str(to_id), from_type)]
+
+def register_default_handlers(pipeline: WebhookPipeline, hubspot_client: HubSpotClient) -> None:
+    """
+    Keeps the connector's own state (object cache, identifier index) in step with HubSpot.
+    """
+
+    async def invalidate_cached_object(event: Dict[str, Any]) -> None:
+        object_type, kind = parse_subscription_type(event)
+        if object_type and kind in CACHE_INVALIDATING_EVENTS:
+            for object_id in affected_object_ids(event):
+                await hubspot_client.invalidate_cached_object(object_type, object_id)
+
+    async def invalidate_cached_associations(event: Dict[str, Any]) -> None:
+        for object_type, object_id, to_object_type in association_change_edges(event):
+            await hubspot_client.invalidate_cached_associations(object_type, object_id, to_object_type)
+
+    async def update_id_index(event: Dict[str, Any]) -> None:
+        object_type, kind = parse_subscription_type(event)
+        if not object_type:
+            return
+        if kind in ID_INDEX_REMOVING_EVENTS:
+            hubspot_client.forget_object_ids(object_type, affected_object_ids(event))
+        elif kind in ("propertyChange", "creation") and event.get("propertyName") and event.get("objectId") is not None:
+            hubspot_client.reindex_object_property(object_type, str(event["objectId"]), event["propertyName"], event.get("propertyValue"))
+
+    async def schedule_refresh(event: Dict[str, Any]) -> None:
+        if pipeline.coalescer is None:
+            return
+        object_type, kind = parse_subscription_type(event)
+        if not object_type:
+            return
+        if kind in ID_INDEX_REMOVING_EVENTS:
+            for object_id in affected_object_ids(event):
+                pipeline.coalescer.discard(object_type, object_id)
+        if kind == "merge":
+            # Only the surviving record still exists after a merge
+            surviving_id = event.get("primaryObjectId") or event.get("newObjectId") or event.get("objectId")
+            if surviving_id is not None:
+                pipeline.coalescer.add(object_type, str(surviving_id))
+        elif kind in REFRESHING_EVENTS and event.get("objectId") is not None:
+            pipeline.coalescer.add(object_type, str(event["objectId"]))
+
+    async def log_event(event: Dict[str, Any]) -> None:
+        logger.debug(
+            f"Webhook event {event.get('eventId')}: {event.get('subscriptionType')} "
+            f"object={event.get('objectId')} property={event.get('propertyName')} source={event.get('changeSource')}"
+        )
+
+    pipeline.register("*", invalidate_cached_object)
+    pipeline.register("associationChange", invalidate_cached_associations)
+    pipeline.register("*", update_id_index)
+    pipeline.register("*", schedule_refresh)
+    pipeline.register("*", log_event)
+
+def build_webhook_pipeline(hubspot_client: HubSpotClient) -> WebhookPipeline:
+    coalescer = None
+    if settings.WEBHOOK_REFRESH_WINDOW_MS > 0:
+
+        async def refresh_objects(object_type: str, object_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+            # Background refreshes yield to interactive requests in the scheduler queue
+            return await hubspot_client.batch_read_objects(object_type, object_ids, priority=PRIORITY_LOW)
+
+        coalescer = RefreshCoalescer(refresh_objects, window=settings.WEBHOOK_REFRESH_WINDOW_MS / 1000)
+        coalescer.subscribe(hubspot_client.store_refreshed_objects)
+    pipeline = WebhookPipeline(
+        workers=settings.WEBHOOK_WORKERS,
+        max_queue=settings.WEBHOOK_MAX_QUEUE,
+        dedupe_size=settings.WEBHOOK_DEDUPE_SIZE,
+        coalescer=coalescer,
+    )
+    register_default_handlers(pipeline, hubspot_client)
+    return pipeline
+
+def signed_uri(request: Request) -> str:
+    """
+    Rebuilds the URI HubSpot signed: the public URL it called, which differs from the one
+    this app sees when a proxy terminates TLS. ``WEBHOOK_PUBLIC_BASE_URL`` takes precedence;
+    otherwise ``X-Forwarded-Proto``/``X-Forwarded-Host`` are used when the proxy is trusted.
+    Like HubSpot, a few URL-encoded characters (``%3A``, ``%2F``, ``%3F``, ...) are decoded.
+    """
+    path = request.url.path + (f"?{request.url.query}" if request.url.query else "")
+    if settings.WEBHOOK_PUBLIC_BASE_URL:
+        uri = settings.WEBHOOK_PUBLIC_BASE_URL.rstrip("/") + path
+    elif settings.WEBHOOK_TRUST_FORWARDED_HEADERS:
+        # Proxies chaining the headers append values; the first one is what the client used
+        scheme = (request.headers.get("X-Forwarded-Proto") or request.url.scheme).split(",")[0].strip()
+        host = (request.headers.get("X-Forwarded-Host") or request.url.netloc).split(",")[0].strip()
+        uri = f"{scheme}://{host}{path}"
+    else:
+        uri = str(request.url)
+    return SIGNATURE_DECODED_ESCAPES.sub(lambda match: bytes.fromhex(match.group(1)).decode("ascii"), uri)
+
+def get_webhook_pipeline(request: Request) -> WebhookPipeline:
+    return request.app.state.webhook_pipeline
+
 @router.post("/webhooks/hubspot", status_code=status.HTTP_200_OK)
-async def receive_hubspot_webhook(request: Request, events: List[Dict[str, Any]]):
+async def receive_hubspot_webhook(request: Request, events: List[Dict[str, Any]], pipeline: WebhookPipeline = Depends(get_webhook_pipeline)):
     """
     Receives webhook events from HubSpot.
-    
-    Note: Full signature verification is not implemented in this basic example.
-    In a production environment, you MUST verify the X-HubSpot-Signature header.
+
+    The X-HubSpot-Signature-v3 header is verified when HUBSPOT_WEBHOOK_SECRET is set. Events
+    are queued for asynchronous processing and the endpoint returns immediately; a full
+    queue answers 503 so HubSpot retries the batch later.
     """
     try:
-        # For production, implement HubSpot signature verification here:
-        # from config import settings
-        # import hashlib
-        # import hmac
-        #
-        # signature = request.headers.get("X-HubSpot-Signature")
-        # if not signature:
-        #     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing HubSpot signature")
-        #
-        # # Reconstruct the string to sign
-        # # This depends on the webhook version. For v3, it's usually method + path + body + app_secret
-        # # For simplicity, let's assume body is the main part for now.
-        # body = await request.body()
-        # expected_signature = hmac.new(settings.HUBSPOT_WEBHOOK_SECRET.encode("utf-8"), body, hashlib.sha256).hexdigest()
-        #
-        # if not hmac.compare_digest(signature, expected_signature):
-        #     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid HubSpot signature")
-
-        logger.info(f"Received {len(events)} HubSpot webhook events:")
-        for event in events:
-            logger.info(f"  Event Type: {event.get('eventType')}")
-            logger.info(f"  Object Type: {event.get('objectType')}")
-            logger.info(f"  Object ID: {event.get('objectId')}")
-            logger.info(f"  Change Source: {event.get('changeSource')}")
-            logger.info(f"  Change Flag: {event.get('changeFlag')}")
-            logger.info(f"  Subscription ID: {event.get('subscriptionId')}")
-            logger.info(f"  Portal ID: {event.get('portalId')}")
-            logger.info(f"  App ID: {event.get('appId')}")
-            logger.info(f"  Occurred At: {event.get('occurredAt')}")
-            logger.info(f"  Properties: {event.get('properties')}")
-            logger.info("--------------------------------------------------")
-
-        # In a real application, you would process these events here.
-        # For example, update your internal database, trigger other integrations, etc.
+        if settings.HUBSPOT_WEBHOOK_SECRET:
+            body = await request.body()
+            if not verify_v3_signature(
+                settings.HUBSPOT_WEBHOOK_SECRET,
+                request.method,
+                signed_uri(request),
+                body,
+                request.headers.get("X-HubSpot-Signature-v3"),
+                request.headers.get("X-HubSpot-Request-Timestamp"),
+            ):
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid HubSpot signature")
+
+        if not pipeline.enqueue(events):
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Webhook queue is full; retry later")
 
+        logger.info(f"Queued {len(events)} HubSpot webhook events")
         return {"status": "success", "message": f"Received {len(events)} events"}
     except HTTPException as e:
         logger.error(f"HTTPException in webhook: {e.detail}")
@@ -0,0 +1,27 @@
+import asyncio
+import sqlite3
+from typing import Any
+
+class SQLiteStore:
+    """
+    Base for the stores kept in a local SQLite file (the write queue and the CRM mirror).
+    The database runs in WAL mode, so other processes can read while one writes.
+
+    sqlite3 is blocking, so every call runs in a worker thread; a lock keeps calls on the
+    single connection one at a time.
+    """
+
+    def __init__(self, path: str, schema: str):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(schema)
+        self._lock = asyncio.Lock()
+
+    async def _run(self, function, *args) -> Any:
+        async with self._lock:
+            return await asyncio.to_thread(function, *args)
+
+    def close(self) -> None:
+        self._db.close()
@@ -0,0 +1,376 @@
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from opentelemetry import propagate, trace
+except ImportError:  # tracing is optional; without the API spans are skipped
+    propagate = trace = None
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers cache hits (sub-millisecond) up to slow retried HubSpot calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+def render_family(name: str, kind: str, documentation: str, samples: List[Sample]) -> List[str]:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for suffix, labels, value in samples:
+        lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+    return lines
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        samples = [("", dict(zip(self.labelnames, labels)), value) for labels, value in sorted(self._values.items())]
+        return render_family(self.name, "counter", self.documentation, samples)
+
+class Histogram:
+    """
+    Fixed-bucket histogram. ``observe`` is a bisect plus two additions, so it is cheap
+    enough to run on every request.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (last slot is +Inf), sum of observations
+        self._counts: Dict[Labels, List[int]] = {}
+        self._sums: Dict[Labels, float] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            self._sums[labels] = 0.0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def count(self, *labels: str) -> int:
+        return sum(self._counts.get(labels, ()))
+
+    def render(self) -> List[str]:
+        samples: List[Sample] = []
+        for labels, counts in sorted(self._counts.items()):
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append(("_bucket", dict(base, le=_format_value(bound)), cumulative))
+            samples.append(("_sum", base, self._sums[labels]))
+            samples.append(("_count", base, cumulative))
+        return render_family(self.name, "histogram", self.documentation, samples)
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> List[str]:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return lines
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    "hubspot_connector_http_request_duration_seconds",
+    "Time spent handling inbound requests, by route template and status code.",
+    ("method", "route", "status_code"),
+)
+UPSTREAM_REQUEST_DURATION = registry.histogram(
+    "hubspot_connector_upstream_request_duration_seconds",
+    "Duration of individual HubSpot API calls (each retry counts separately), by object type, operation and status code.",
+    ("object_type", "operation", "status_code"),
+)
+UPSTREAM_QUEUE_WAIT = registry.histogram(
+    "hubspot_connector_upstream_queue_wait_seconds",
+    "Time HubSpot calls waited for a rate-limit token, by scheduler lane.",
+    ("lane",),
+)
+UPSTREAM_RETRIES = registry.counter(
+    "hubspot_connector_upstream_retries_total",
+    "HubSpot calls retried, by object type, operation and the status code (or network_error) that caused the retry.",
+    ("object_type", "operation", "reason"),
+)
+
+# Label values for upstream calls. Object types come from caller-supplied paths (e.g.
+# /associations/{from}/{to}), so anything outside these sets is reported as "other"
+KNOWN_OBJECT_TYPES = frozenset({
+    "contacts", "companies", "deals", "tickets", "line_items", "products", "quotes",
+    "calls", "emails", "meetings", "notes", "tasks",
+})
+_BATCH_OPERATIONS = frozenset({"read", "create", "update", "upsert", "archive"})
+_ASSOCIATION_OPERATIONS = frozenset({"read", "create", "archive"})
+OTHER = "other"
+
+def _known(value: str, allowed: frozenset) -> str:
+    return value if value in allowed else OTHER
+
+def upstream_operation(method: str, url: str) -> Tuple[str, str]:
+    """
+    Maps a HubSpot API call to a low-cardinality ``(object_type, operation)`` pair, e.g.
+    ``PATCH .../crm/v3/objects/contacts/123`` to ``("contacts", "update")``. Object types
+    and operations outside a fixed set become ``"other"``.
+    """
+    parts = url.split("?", 1)[0].split("/crm/", 1)[-1].strip("/").split("/")
+    # v3: objects/{type}[/...]   v4: objects/{type}/{id}/associations/{to}, associations/{from}/{to}/batch/{op}
+    if len(parts) >= 5 and parts[1] == "associations":
+        object_type = _known(parts[2], KNOWN_OBJECT_TYPES)
+        if parts[4] == "labels":
+            return object_type, "associations_labels"
+        return object_type, f"associations_batch_{_known(parts[-1], _ASSOCIATION_OPERATIONS)}"
+    if len(parts) < 3 or parts[1] != "objects":
+        return "unknown", method.lower()
+    object_type, rest = _known(parts[2], KNOWN_OBJECT_TYPES), parts[3:]
+    if not rest:
+        return object_type, "list" if method == "GET" else "create"
+    if rest[0] == "search":
+        return object_type, "search"
+    if rest[0] == "batch" and len(rest) > 1:
+        return object_type, f"batch_{_known(rest[1], _BATCH_OPERATIONS)}"
+    if len(rest) > 1 and rest[1] == "associations":
+        return object_type, "associations_read"
+    return object_type, {"GET": "read", "PATCH": "update", "DELETE": "archive"}.get(method, method.lower())
+
+_BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+def _stats_samples(stats: Dict[str, Any]) -> List[Tuple[str, str, str, List[Sample]]]:
+    """
+    Turns the ``/stats`` document into metric families. Values are read at scrape time
+    from counters the components keep anyway, so exposing them costs nothing per request.
+    """
+    families: List[Tuple[str, str, str, List[Sample]]] = []
+
+    def add(name: str, kind: str, documentation: str, samples: List[Tuple[Dict[str, str], Any]]) -> None:
+        present = [("", labels, value) for labels, value in samples if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        if present:
+            families.append((f"hubspot_connector_{name}", kind, documentation, present))
+
+    pool = stats.get("pool") or {}
+    add("pool_connections", "gauge", "Open upstream connections by state.", [
+        ({"state": "active"}, pool.get("active_connections")),
+        ({"state": "idle"}, pool.get("idle_connections")),
+    ])
+    add("pool_max_connections", "gauge", "Configured upstream connection limit.", [({}, pool.get("max_connections"))])
+    add("pool_queued_requests", "gauge", "Requests waiting for a free upstream connection.", [({}, pool.get("queued_requests"))])
+    add("upstream_in_flight_requests", "gauge", "HubSpot calls currently in progress.", [({}, pool.get("in_flight_requests"))])
+    add("upstream_requests_sent_total", "counter", "HubSpot calls sent, including retries.", [({}, pool.get("requests_sent"))])
+
+    scheduler = stats.get("scheduler") or {}
+    lanes = scheduler.get("lanes") or {}
+    add("scheduler_queued_requests", "gauge", "HubSpot calls waiting for a rate-limit token, by lane.",
+        [({"lane": lane}, values.get("queued")) for lane, values in lanes.items()])
+    add("scheduler_rate_per_second", "gauge", "Current outbound rate per lane (lowered after 429s).",
+        [({"lane": lane}, values.get("rate_per_second")) for lane, values in lanes.items()])
+    add("upstream_throttled_total", "counter", "HubSpot 429 responses, by lane.",
+        [({"lane": lane}, values.get("throttled")) for lane, values in lanes.items()])
+    add("scheduler_dispatched_total", "counter", "HubSpot calls released by the scheduler, by lane.",
+        [({"lane": lane}, values.get("dispatched")) for lane, values in lanes.items()])
+    add("daily_limit_remaining", "gauge", "Remaining daily HubSpot API calls as last reported by HubSpot.", [({}, scheduler.get("daily_remaining"))])
+
+    single_flight = stats.get("single_flight") or {}
+    add("single_flight_coalesced_total", "counter", "Reads answered by sharing another caller's identical HubSpot call.", [({}, single_flight.get("coalesced"))])
+
+    breakers = {lane: values for lane, values in (stats.get("circuit_breakers") or {}).items() if isinstance(values, dict)}
+    add("circuit_breaker_state", "gauge", "Circuit breaker state by lane: 0 closed, 1 half-open, 2 open.",
+        [({"lane": lane}, _BREAKER_STATES.get(values.get("state"))) for lane, values in breakers.items()])
+    add("circuit_breaker_opened_total", "counter", "Times a lane's circuit breaker opened.",
+        [({"lane": lane}, values.get("opened")) for lane, values in breakers.items()])
+    add("circuit_breaker_rejected_total", "counter", "HubSpot calls failed fast by an open circuit breaker, by lane.",
+        [({"lane": lane}, values.get("rejected")) for lane, values in breakers.items()])
+    add("stale_reads_total", "counter", "Reads answered with a stale copy while a circuit breaker was open.",
+        [({}, (stats.get("circuit_breakers") or {}).get("stale_reads"))])
+
+    hedging = stats.get("hedging") or {}
+    add("hedged_requests_total", "counter", "Duplicate HubSpot reads sent because the first copy was slow.", [({}, hedging.get("hedges_sent"))])
+    add("hedge_wins_total", "counter", "Hedged reads answered by the duplicate first.", [({}, hedging.get("hedge_wins"))])
+    add("hedge_win_ratio", "gauge", "Share of hedged reads answered by the duplicate first.", [({}, hedging.get("win_ratio"))])
+
+    cache = stats.get("object_cache") or {}
+    add("cache_hits_total", "counter", "Object cache hits, by kind.", [({"kind": "object"}, cache.get("hits")), ({"kind": "association"}, cache.get("association_hits"))])
+    add("cache_misses_total", "counter", "Object cache misses, by kind.", [({"kind": "object"}, cache.get("misses")), ({"kind": "association"}, cache.get("association_misses"))])
+    add("cache_hit_ratio", "gauge", "Object cache hit ratio since start, by kind.",
+        [({"kind": "object"}, cache.get("hit_ratio")), ({"kind": "association"}, cache.get("association_hit_ratio"))])
+    add("cache_entries", "gauge", "Entries in the in-memory object cache.", [({}, cache.get("entries"))])
+
+    index = stats.get("id_index") or {}
+    add("id_index_hits_total", "counter", "Identifier lookups answered by the ID index.", [({}, index.get("hits"))])
+    add("id_index_misses_total", "counter", "Identifier lookups the ID index could not answer.", [({}, index.get("misses"))])
+
+    batching = stats.get("write_batching") or {}
+    add("write_batch_pending_records", "gauge", "Writes waiting to be sent in a batch.", [({}, batching.get("pending_records"))])
+    add("write_batch_records_total", "counter", "Writes sent through the write batcher.", [({}, batching.get("records_sent"))])
+
+    suppression = stats.get("write_suppression") or {}
+    add("write_suppression_checked_total", "counter", "Writes compared with the object's last known state.", [({}, suppression.get("checked"))])
+    add("write_suppression_writes_total", "counter", "Checked writes skipped as unchanged or trimmed to the changed properties, by outcome.", [
+        ({"outcome": "skipped"}, suppression.get("skipped")),
+        ({"outcome": "trimmed"}, suppression.get("trimmed")),
+    ])
+    add("write_suppression_properties_total", "counter", "Property values left out of writes because they were unchanged.", [({}, suppression.get("properties_skipped"))])
+
+    mirror = stats.get("mirror") or {}
+    add("mirror_hits_total", "counter", "Reads served from the local mirror.", [({}, mirror.get("hits"))])
+    add("mirror_misses_total", "counter", "Reads the local mirror could not serve.", [({}, mirror.get("misses"))])
+
+    limiter = stats.get("rate_limiter") or {}
+    add("rate_limit_allowed_total", "counter", "Inbound requests within their rate limit.", [({}, limiter.get("allowed"))])
+    add("rate_limit_limited_total", "counter", "Inbound requests rejected with 429.", [({}, limiter.get("limited"))])
+    add("rate_limit_redis_round_trips_total", "counter", "Redis calls made by the rate limiter.", [({}, limiter.get("round_trips"))])
+
+    write_queue = stats.get("write_queue") or {}
+    add("write_queue_depth", "gauge", "Queued writes not yet finished.", [({}, write_queue.get("depth"))])
+    add("write_queue_jobs_total", "counter", "Queued writes by outcome.", [
+        ({"outcome": "succeeded"}, write_queue.get("jobs_succeeded")),
+        ({"outcome": "failed"}, write_queue.get("jobs_failed")),
+        ({"outcome": "retried"}, write_queue.get("jobs_retried")),
+        ({"outcome": "rejected"}, write_queue.get("jobs_rejected")),
+        ({"outcome": "reclaimed"}, write_queue.get("jobs_reclaimed")),
+    ])
+
+    idempotency = stats.get("idempotency") or {}
+    add("idempotency_requests_total", "counter", "Writes sent with an Idempotency-Key, by outcome.", [
+        ({"outcome": "stored"}, idempotency.get("stored")),
+        ({"outcome": "replayed"}, idempotency.get("replayed")),
+        ({"outcome": "waited"}, idempotency.get("waited")),
+        ({"outcome": "conflict"}, idempotency.get("conflicts")),
+        ({"outcome": "mismatch"}, idempotency.get("mismatches")),
+    ])
+
+    webhooks = stats.get("webhooks") or {}
+    add("webhook_queued_events", "gauge", "Webhook events waiting to be processed.", [({}, webhooks.get("queued_events"))])
+    add("webhook_oldest_batch_age_seconds", "gauge", "Age of the oldest queued webhook batch.", [({}, webhooks.get("oldest_batch_age_seconds"))])
+    add("webhook_events_processed_total", "counter", "Webhook events processed.", [({}, webhooks.get("events_processed"))])
+    add("webhook_handler_errors_total", "counter", "Webhook handler failures.", [({}, webhooks.get("handler_errors"))])
+    refresh = webhooks.get("refresh") or {}
+    add("webhook_refresh_pending_ids", "gauge", "Objects waiting to be refreshed after webhooks.", [({}, refresh.get("pending_ids"))])
+    return families
+
+def render_metrics(stats: Dict[str, Any]) -> str:
+    """
+    Renders the request and upstream instruments plus the runtime stats in the
+    Prometheus text exposition format.
+    """
+    lines = registry.render()
+    for name, kind, documentation, samples in _stats_samples(stats):
+        lines.extend(render_family(name, kind, documentation, samples))
+    return "\n".join(lines) + "\n"
+
+def _tracer():
+    return trace.get_tracer("hubspot_connector") if trace is not None else None
+
+@contextmanager
+def upstream_span(method: str, url: str, object_type: str, operation: str) -> Iterator[Optional[Any]]:
+    """
+    Opens a client span for a HubSpot call, a child of the inbound request's span. Yields
+    None when OpenTelemetry is not installed.
+    """
+    tracer = _tracer()
+    if tracer is None:
+        yield None
+        return
+    attributes = {"http.request.method": method, "url.full": url, "hubspot.object_type": object_type, "hubspot.operation": operation}
+    with tracer.start_as_current_span(f"HubSpot {operation}", kind=trace.SpanKind.CLIENT, attributes=attributes) as span:
+        yield span
+
+def inject_trace_headers(headers: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """
+    Returns ``headers`` plus W3C ``traceparent`` (and ``tracestate``) for the current span.
+    """
+    headers = dict(headers or {})
+    if propagate is not None:
+        propagate.inject(headers)
+    return headers
+
+class TelemetryMiddleware:
+    """
+    ASGI middleware that records a latency histogram per route template and status code
+    and, when OpenTelemetry is installed, opens a server span per request that continues
+    an incoming ``traceparent``. Timing covers the whole response, including streamed bodies.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        tracer = _tracer()
+        if tracer is None:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                self._record(scope, status_code, started, None)
+            return
+
+        carrier = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope.get("headers", [])}
+        with tracer.start_as_current_span(
+            f"{scope['method']} {scope['path']}",
+            context=propagate.extract(carrier),
+            kind=trace.SpanKind.SERVER,
+            attributes={"http.request.method": scope["method"], "url.path": scope["path"]},
+        ) as span:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                self._record(scope, status_code, started, span)
+
+    @staticmethod
+    def _record(scope: Dict[str, Any], status_code: int, started: float, span: Optional[Any]) -> None:
+        # Label by the matched route template, never the raw path, to keep cardinality bounded
+        route = getattr(scope.get("route"), "path", None) or "unmatched"
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, scope["method"], route, str(status_code))
+        if span is not None and span.is_recording():
+            span.update_name(f"{scope['method']} {route}")
+            span.set_attribute("http.route", route)
+            span.set_attribute("http.response.status_code", status_code)
@@ -1,6 +1,9 @@
 import pytest
+import pytest_asyncio
 from unittest.mock import AsyncMock, MagicMock
-from hubspot_client import HubSpotClient
+from hubspot_client import HubSpotClient, get_hubspot_client
+from main import app
+from routers.webhooks import build_webhook_pipeline, get_webhook_pipeline
 
 @pytest.fixture
 def mock_hubspot_client():
@@ -10,6 +13,23 @@ def mock_hubspot_client():
     client.update_object.return_value = MagicMock(id="mock_id", properties={})
     client.get_object_by_id.return_value = MagicMock(id="mock_id", properties={})
     client.search_object.return_value = None # Default to not found
+    client.find_object_id.return_value = None # Default to not found
+    client.find_object_ids.return_value = {}
+    # No known state: every write is sent as is
+    client.properties_to_write.side_effect = lambda object_type, object_id, properties, trim=True: properties
+    client.upsert_object.return_value = (MagicMock(id="mock_id", properties={}), True)
     client.create_association.return_value = {}
     client.get_associations.return_value = {"results": []}
-    return client
+    # Routers receive the shared client through a dependency, so swap in the mock there
+    app.dependency_overrides[get_hubspot_client] = lambda: client
+    yield client
+    app.dependency_overrides.pop(get_hubspot_client, None)
+
+@pytest_asyncio.fixture
+async def webhook_pipeline(mock_hubspot_client):
+    pipeline = build_webhook_pipeline(mock_hubspot_client)
+    await pipeline.start()
+    app.dependency_overrides[get_webhook_pipeline] = lambda: pipeline
+    yield pipeline
+    app.dependency_overrides.pop(get_webhook_pipeline, None)
+    await pipeline.stop(drain=False)
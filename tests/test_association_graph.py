@@ -0,0 +1,56 @@
+import pytest
+from association_graph import expand_association_graph, parse_path
+
+class FakeGraphClient:
+    """
+    Serves associations and objects from dictionaries and records every batched call.
+    """
+
+    def __init__(self, edges):
+        self.edges = edges
+        self.association_calls = []
+        self.object_calls = []
+
+    async def batch_read_associations(self, object_type, object_ids, to_object_type, use_cache=False):
+        self.association_calls.append((object_type, list(object_ids), to_object_type))
+        return {
+            object_id: [{"toObjectId": int(to_id), "associationTypes": []} for to_id in self.edges.get((object_type, object_id, to_object_type), [])]
+            for object_id in object_ids
+        }
+
+    async def batch_read_objects(self, object_type, object_ids, use_cache=False):
+        self.object_calls.append((object_type, list(object_ids)))
+        return {object_id: {"id": object_id, "properties": {}} for object_id in object_ids if object_id != "404"}
+
+def test_parse_path_accepts_arrows_commas_and_optional_root():
+    assert parse_path("contacts", "contacts -> companies -> tickets") == ["companies", "tickets"]
+    assert parse_path("contacts", "companies,tickets") == ["companies", "tickets"]
+    with pytest.raises(ValueError):
+        parse_path("contacts", "contacts")
+
+@pytest.mark.asyncio
+async def test_each_level_is_expanded_and_hydrated_with_one_batched_call():
+    client = FakeGraphClient({
+        ("contacts", "1", "companies"): ["10", "11"],
+        ("companies", "10", "tickets"): ["100", "404"],
+        ("companies", "11", "tickets"): ["100"],
+    })
+
+    graph = await expand_association_graph(client, "contacts", "1", ["companies", "tickets"])
+
+    assert client.association_calls == [("contacts", ["1"], "companies"), ("companies", ["10", "11"], "tickets")]
+    assert sorted(client.object_calls) == [("companies", ["10", "11"]), ("contacts", ["1"]), ("tickets", ["100", "404"])]
+    assert list(graph["nodes"]["tickets"]) == ["100", "404"]
+    assert graph["nodes"]["tickets"]["404"] is None
+    assert len(graph["edges"]) == 5
+    assert graph["path"] == ["contacts", "companies", "tickets"]
+    assert graph["truncated"] is False
+
+@pytest.mark.asyncio
+async def test_expansion_stops_at_max_nodes():
+    client = FakeGraphClient({("contacts", "1", "companies"): ["10", "11", "12"]})
+
+    graph = await expand_association_graph(client, "contacts", "1", ["companies"], max_nodes=3)
+
+    assert list(graph["nodes"]["companies"]) == ["10", "11"]
+    assert graph["truncated"] is True
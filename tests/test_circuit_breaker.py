@@ -0,0 +1,68 @@
+import time
+import pytest
+from fastapi import HTTPException
+from httpx import AsyncClient, MockTransport, Response
+from circuit_breaker import BREAKER_CLOSED, BREAKER_HALF_OPEN, BREAKER_OPEN, CircuitBreaker, CircuitOpenError
+from hubspot_client import HubSpotClient
+from object_cache import MemoryCacheBackend, ObjectCache
+from upstream_scheduler import UpstreamScheduler
+
+def test_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker("crm", failure_threshold=2, reset_timeout=0.05)
+
+    breaker.record(False)
+    breaker.record(True)  # a success resets the count
+    breaker.record(False)
+    assert breaker.state == BREAKER_CLOSED
+    breaker.record(False)
+    assert breaker.state == BREAKER_OPEN
+
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.check()
+    assert error.value.status_code == 503
+    assert error.value.headers["Retry-After"] == "1"
+
+    time.sleep(0.06)
+    breaker.check()  # the probe goes through
+    assert breaker.state == BREAKER_HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.check()  # only one probe per interval
+    breaker.record(False)
+    assert breaker.state == BREAKER_OPEN
+
+    time.sleep(0.06)
+    breaker.check()
+    breaker.record(True)
+    assert breaker.state == BREAKER_CLOSED
+    assert breaker.stats() == {"state": BREAKER_CLOSED, "consecutive_failures": 0, "opened": 2, "rejected": 2}
+
+@pytest.mark.asyncio
+async def test_open_breaker_fails_fast_and_serves_stale_reads():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        if len(calls) == 1:
+            return Response(200, json={"id": "1", "properties": {"email": "a@example.com"}, "updatedAt": "2023-01-01T00:00:00Z"})
+        return Response(503, json={"message": "unavailable"})
+
+    scheduler = UpstreamScheduler(lanes={"crm": (1000.0, 1000.0)}, max_retries=0)
+    cache = ObjectCache(MemoryCacheBackend(max_entries=10, ttl=0.01, stale_ttl=60))
+    breakers = {"crm": CircuitBreaker("crm", failure_threshold=2, reset_timeout=60)}
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), object_cache=cache, scheduler=scheduler, breakers=breakers)
+
+    await client.get_object_json("contacts", "1")
+    time.sleep(0.02)  # the cached copy expires
+    for object_id in ("2", "3"):
+        with pytest.raises(HTTPException):
+            await client.get_object_json("contacts", object_id)
+    assert breakers["crm"].state == BREAKER_OPEN
+    assert len(calls) == 3
+
+    stale = await client.get_object_json("contacts", "1")
+    assert b"a@example.com" in stale
+    with pytest.raises(CircuitOpenError):
+        await client.get_object_json("contacts", "4")
+    assert len(calls) == 3  # nothing reached HubSpot while the breaker was open
+    stats = client.stats()["circuit_breakers"]
+    assert (stats["crm"]["rejected"], stats["stale_reads"]) == (2, 1)
@@ -0,0 +1,125 @@
+import pytest
+from crm_mirror import CrmMirror, MirrorStore
+from fastapi import HTTPException
+from hubspot_client import HubSpotClient
+from models.contact_models import HubSpotContactOutput
+from httpx import AsyncClient, MockTransport, Response
+
+def contact(object_id, email, modified="2024-01-01T00:00:00Z"):
+    return {
+        "id": object_id,
+        "properties": {"email": email, "lastmodifieddate": modified},
+        "createdAt": "2024-01-01T00:00:00Z",
+        "updatedAt": modified,
+        "archived": False,
+    }
+
+class FakeSyncClient:
+    def __init__(self, pages, modified):
+        self.pages = pages
+        self.modified = modified
+        self.searches = []
+
+    async def list_objects_page(self, object_type, after=None, use_mirror=True):
+        assert use_mirror is False
+        return self.pages[after]
+
+    async def search_modified_since(self, object_type, property_name, since_ms, after=None):
+        self.searches.append((property_name, since_ms))
+        return {"results": self.modified}
+
+async def build_mirror():
+    mirror = CrmMirror(MirrorStore(":memory:", {"contacts": ["email"]}), ["contacts"])
+    # Load the sync state as start() does, without starting the background loop
+    mirror._state["contacts"] = await mirror.store.load_state("contacts")
+    return mirror
+
+@pytest.mark.asyncio
+async def test_backfill_then_sweep_serves_reads_and_lookups():
+    mirror = await build_mirror()
+    client = FakeSyncClient(
+        pages={None: {"results": [contact("1", "a@example.com")], "paging": {"next": {"after": "1"}}}, "1": {"results": [contact("2", "b@example.com")]}},
+        modified=[contact("2", "new@example.com", "2099-01-01T00:00:00Z")],
+    )
+
+    await mirror.sync(client, "contacts")
+
+    assert mirror.is_fresh("contacts")
+    assert (await mirror.get_object("contacts", "1"))["properties"]["email"] == "a@example.com"
+    assert await mirror.find_object_id("contacts", "email", "NEW@example.com") == "2"
+    assert await mirror.find_object_id("contacts", "email", "b@example.com") is None
+    assert client.searches[0][0] == "lastmodifieddate"
+    stats = mirror.stats()["object_types"]["contacts"]
+    # The first sweep starts from the backfill's start time and advances to the newest change seen
+    assert client.searches[0][1] <= 4070908800000
+    assert (stats["objects"], stats["backfilled"], stats["watermark"]) == (2, True, 4070908800000)
+
+@pytest.mark.asyncio
+async def test_stale_mirror_falls_back_and_export_pages_use_mirror_cursors():
+    mirror = await build_mirror()
+    client = FakeSyncClient(pages={None: {"results": [contact(str(i), f"{i}@example.com") for i in range(3)]}}, modified=[])
+    await mirror.sync(client, "contacts")
+
+    first = await mirror.list_page("contacts", None, limit=2)
+    assert [obj["id"] for obj in first["results"]] == ["0", "1"]
+    second = await mirror.list_page("contacts", first["paging"]["next"]["after"], limit=2)
+    assert [obj["id"] for obj in second["results"]] == ["2"] and "paging" not in second
+
+    mirror.max_staleness = -1
+    assert await mirror.get_object("contacts", "1") is None
+    assert mirror.serves_page("contacts", None) is False
+    assert mirror.serves_page("contacts", first["paging"]["next"]["after"]) is True
+    assert mirror.stats()["stale_fallbacks"] == 1
+
+@pytest.mark.asyncio
+async def test_client_reads_from_fresh_mirror_and_forgets_changed_objects():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return Response(200, json=contact("1", "remote@example.com"))
+
+    mirror = await build_mirror()
+    await mirror.sync(FakeSyncClient(pages={None: {"results": [contact("1", "local@example.com")]}}, modified=[]), "contacts")
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), mirror=mirror)
+
+    local = await client.get_object_by_id("contacts", "1", HubSpotContactOutput)
+    assert local.properties["email"] == "local@example.com"
+    assert calls == []
+
+    await client.invalidate_cached_object("contacts", "1")
+    remote = await client.get_object_by_id("contacts", "1", HubSpotContactOutput)
+    assert remote.properties["email"] == "remote@example.com"
+    assert calls == ["/crm/v3/objects/contacts/1"]
+
+@pytest.mark.asyncio
+async def test_write_to_contact_deleted_upstream_searches_again():
+    calls = []
+
+    def handler(request):
+        calls.append((request.method, request.url.path))
+        if request.url.path.endswith("/search"):
+            return Response(200, json={"results": []})
+        if request.method == "POST":
+            return Response(201, json=contact("2", "a@example.com"))
+        return Response(404, json={"message": "Object not found"})
+
+    mirror = await build_mirror()
+    await mirror.sync(FakeSyncClient(pages={None: {"results": [contact("1", "a@example.com")]}}, modified=[]), "contacts")
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), mirror=mirror)
+
+    assert await client.find_object_id("contacts", "email", "a@example.com") == "1"
+    with pytest.raises(HTTPException) as error:
+        await client.update_object("contacts", "1", {"firstname": "A"}, HubSpotContactOutput)
+    assert error.value.status_code == 404
+
+    # The deleted record is gone from the mirror, so the retry searches and then creates
+    assert await mirror.get_object("contacts", "1") is None
+    assert await client.find_object_id("contacts", "email", "a@example.com") is None
+    created = await client.create_object("contacts", {"email": "a@example.com"}, HubSpotContactOutput)
+    assert created.id == "2"
+    assert calls == [
+        ("PATCH", "/crm/v3/objects/contacts/1"),
+        ("POST", "/crm/v3/objects/contacts/search"),
+        ("POST", "/crm/v3/objects/contacts"),
+    ]
@@ -1,10 +1,19 @@
+import asyncio
+import json
 import pytest
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from hubspot_client import HubSpotClient
+from object_cache import MemoryCacheBackend, ObjectCache
+from upstream_scheduler import UpstreamScheduler
 from models.contact_models import HubSpotContactOutput
 from models.company_models import HubSpotCompanyOutput
 from models.ticket_models import HubSpotTicketOutput
-from httpx import HTTPStatusError, Request, Response
+from fastapi import HTTPException
+from httpx import AsyncClient, HTTPStatusError, MockTransport, Request, Response
+
+def mock_response_request():
+    # The patched request coroutine must resolve to a plain (synchronous) response mock
+    return AsyncMock(return_value=MagicMock())
 
 @pytest.fixture
 def hubspot_client_instance():
@@ -12,7 +21,7 @@ def hubspot_client_instance():
 
 @pytest.mark.asyncio
 async def test_create_object_success(hubspot_client_instance):
-    with patch('httpx.AsyncClient.request', new_callable=AsyncMock) as mock_request:
+    with patch('httpx.AsyncClient.request', new_callable=mock_response_request) as mock_request:
         mock_request.return_value.json.return_value = {
             "id": "123",
             "properties": {"email": "test@example.com"},
@@ -31,7 +40,7 @@ async def test_create_object_success(hubspot_client_instance):
 
 @pytest.mark.asyncio
 async def test_get_object_by_id_success(hubspot_client_instance):
-    with patch('httpx.AsyncClient.request', new_callable=AsyncMock) as mock_request:
+    with patch('httpx.AsyncClient.request', new_callable=mock_response_request) as mock_request:
         mock_request.return_value.json.return_value = {
             "id": "123",
             "properties": {"email": "test@example.com"},
@@ -48,7 +57,7 @@ async def test_get_object_by_id_success(hubspot_client_instance):
 
 @pytest.mark.asyncio
 async def test_get_object_by_id_not_found(hubspot_client_instance):
-    with patch('httpx.AsyncClient.request', new_callable=AsyncMock) as mock_request:
+    with patch('httpx.AsyncClient.request', new_callable=mock_response_request) as mock_request:
         mock_request.return_value.raise_for_status.side_effect = HTTPStatusError(
             "Not Found", request=Request(method="GET", url="http://test.com"), response=Response(404)
         )
@@ -60,7 +69,7 @@ async def test_get_object_by_id_not_found(hubspot_client_instance):
 
 @pytest.mark.asyncio
 async def test_update_object_success(hubspot_client_instance):
-    with patch('httpx.AsyncClient.request', new_callable=AsyncMock) as mock_request:
+    with patch('httpx.AsyncClient.request', new_callable=mock_response_request) as mock_request:
         mock_request.return_value.json.return_value = {
             "id": "123",
             "properties": {"email": "updated@example.com"},
@@ -77,9 +86,33 @@ async def test_update_object_success(hubspot_client_instance):
         assert result.properties["email"] == "updated@example.com"
         mock_request.assert_called_once()
 
+@pytest.mark.asyncio
+async def test_upsert_object_single_call(hubspot_client_instance):
+    with patch('httpx.AsyncClient.request', new_callable=mock_response_request) as mock_request:
+        mock_request.return_value.json.return_value = {"status": "COMPLETE", "results": [
+            {
+                "id": "123",
+                "properties": {"email": "test@example.com"},
+                "createdAt": "2023-01-01T00:00:00Z",
+                "updatedAt": "2023-01-01T00:00:00Z",
+                "archived": False,
+                "new": False
+            }
+        ]}
+        mock_request.return_value.raise_for_status.return_value = None
+
+        result, created = await hubspot_client_instance.upsert_object("contacts", "email", "test@example.com", {"firstname": "Test"}, HubSpotContactOutput)
+
+        assert result.id == "123"
+        assert created is False
+        mock_request.assert_called_once()
+        method, url = mock_request.call_args.args
+        assert (method, url) == ("POST", "https://api.hubapi.com/crm/v3/objects/contacts/batch/upsert")
+        assert mock_request.call_args.kwargs["json"] == {"inputs": [{"idProperty": "email", "id": "test@example.com", "properties": {"firstname": "Test"}}]}
+
 @pytest.mark.asyncio
 async def test_search_object_success(hubspot_client_instance):
-    with patch('httpx.AsyncClient.request', new_callable=AsyncMock) as mock_request:
+    with patch('httpx.AsyncClient.request', new_callable=mock_response_request) as mock_request:
         mock_request.return_value.json.return_value = {"results": [
             {
                 "id": "123",
@@ -99,7 +132,7 @@ async def test_search_object_success(hubspot_client_instance):
 
 @pytest.mark.asyncio
 async def test_search_object_not_found(hubspot_client_instance):
-    with patch('httpx.AsyncClient.request', new_callable=AsyncMock) as mock_request:
+    with patch('httpx.AsyncClient.request', new_callable=mock_response_request) as mock_request:
         mock_request.return_value.json.return_value = {"results": []}
         mock_request.return_value.raise_for_status.return_value = None
 
@@ -110,18 +143,18 @@ async def test_search_object_not_found(hubspot_client_instance):
 
 @pytest.mark.asyncio
 async def test_create_association_success(hubspot_client_instance):
-    with patch('httpx.AsyncClient.request', new_callable=AsyncMock) as mock_request:
+    with patch('httpx.AsyncClient.request', new_callable=mock_response_request) as mock_request:
         mock_request.return_value.json.return_value = {}
         mock_request.return_value.raise_for_status.return_value = None
 
-        result = await hubspot_client_instance.create_association("contact", "1", "company", "2", "279")
+        result = await hubspot_client_instance.create_association("contacts", "1", "companies", "2", "279")
 
         assert result == {}
         mock_request.assert_called_once()
 
 @pytest.mark.asyncio
 async def test_get_associations_success(hubspot_client_instance):
-    with patch('httpx.AsyncClient.request', new_callable=AsyncMock) as mock_request:
+    with patch('httpx.AsyncClient.request', new_callable=mock_response_request) as mock_request:
         mock_request.return_value.json.return_value = {"results": [{"id": "2", "type": "company"}]}
         mock_request.return_value.raise_for_status.return_value = None
 
@@ -129,3 +162,451 @@ async def test_get_associations_success(hubspot_client_instance):
 
         assert result["results"][0]["id"] == "2"
         mock_request.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_requests_share_pooled_client():
+    def handler(request):
+        return Response(200, json={
+            "id": request.url.path.rsplit("/", 1)[-1],
+            "properties": {},
+            "createdAt": "2023-01-01T00:00:00Z",
+            "updatedAt": "2023-01-01T00:00:00Z",
+            "archived": False
+        })
+
+    http_client = AsyncClient(transport=MockTransport(handler))
+    client = HubSpotClient(http_client=http_client)
+
+    first = await client.get_object_by_id("contacts", "1", HubSpotContactOutput)
+    second = await client.get_object_by_id("contacts", "2", HubSpotContactOutput)
+
+    assert (first.id, second.id) == ("1", "2")
+    assert client._client is http_client
+    stats = client.pool_stats()
+    assert stats["requests_sent"] == 2
+    assert stats["in_flight_requests"] == 0
+
+    await client.aclose()
+    assert http_client.is_closed
+
+@pytest.mark.asyncio
+async def test_get_object_by_id_served_from_cache_until_invalidated():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return Response(200, json={
+            "id": "1",
+            "properties": {"email": "test@example.com"},
+            "createdAt": "2023-01-01T00:00:00Z",
+            "updatedAt": "2023-01-01T00:00:00Z",
+            "archived": False
+        })
+
+    cache = ObjectCache(MemoryCacheBackend(max_entries=10, ttl=60))
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), object_cache=cache)
+
+    await client.get_object_by_id("contacts", "1", HubSpotContactOutput)
+    cached = await client.get_object_by_id("contacts", "1", HubSpotContactOutput)
+    assert cached.properties["email"] == "test@example.com"
+    assert len(calls) == 1
+
+    await client.invalidate_cached_object("contacts", "1")
+    await client.get_object_by_id("contacts", "1", HubSpotContactOutput)
+    assert len(calls) == 2
+    assert client.stats()["object_cache"]["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_get_object_json_passes_upstream_body_through():
+    body = b'{"id":"1","properties":{"email":"test@example.com"},"createdAt":"2023-01-01T00:00:00Z","updatedAt":"2023-01-01T00:00:00Z","archived":false}'
+
+    def handler(request):
+        if request.url.path.endswith("/404"):
+            return Response(404, json={"message": "Object not found"})
+        return Response(200, content=body, headers={"Content-Type": "application/json"})
+
+    cache = ObjectCache(MemoryCacheBackend(max_entries=10, ttl=60))
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), object_cache=cache)
+
+    assert await client.get_object_json("contacts", "1") == body
+    # A cache hit is encoded again from the stored object
+    cached = await client.get_object_json("contacts", "1")
+    assert json.loads(cached) == json.loads(body)
+    assert client.stats()["object_cache"]["hits"] == 1
+    assert await client.get_object_json("contacts", "404") is None
+
+@pytest.mark.asyncio
+async def test_selected_properties_are_fetched_once_and_served_from_cache():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.url.path.endswith("/batch/read"):
+            body = json.loads(request.content)
+            return Response(200, json={"results": [
+                {"id": item["id"], "properties": {name: f"{name}-{item['id']}" for name in body["properties"]}, "updatedAt": "2023-01-01T00:00:00Z"}
+                for item in body["inputs"]
+            ]})
+        selected = request.url.params["properties"].split(",")
+        return Response(200, json={"id": "1", "properties": {name: f"{name}-1" for name in selected}, "updatedAt": "2023-01-01T00:00:00Z"})
+
+    cache = ObjectCache(MemoryCacheBackend(max_entries=10, ttl=60))
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), object_cache=cache)
+
+    await client.get_object_json("contacts", "1", properties=["email", "tier"])
+    narrower = json.loads(await client.get_object_json("contacts", "1", properties=["tier"]))
+    assert narrower["properties"] == {"tier": "tier-1"}
+    assert len(requests) == 1
+    assert requests[0].url.params["properties"] == "email,tier"
+
+    # History and associations always go to HubSpot
+    await client.get_object_json("contacts", "1", properties=["tier"], associations=["companies"])
+    assert requests[-1].url.params["associations"] == "companies"
+
+    objects = await client.batch_read_objects("contacts", ["1", "2"], use_cache=True, properties=["tier"])
+    assert objects["2"]["properties"] == {"tier": "tier-2"}
+    assert json.loads(requests[-1].content) == {"properties": ["tier"], "inputs": [{"id": "2"}]}
+    assert len(requests) == 3
+
+@pytest.mark.asyncio
+async def test_repeated_write_is_suppressed_against_the_last_known_state():
+    def handler(request):
+        body = json.loads(request.content)
+        properties = dict({"name": "Example", "phone": None, "employees": "10"}, **body["properties"])
+        return Response(200, json={"id": "1", "properties": properties, "createdAt": "2023-01-01T00:00:00Z", "updatedAt": "2023-01-02T00:00:00Z", "archived": False})
+
+    cache = ObjectCache(MemoryCacheBackend(max_entries=10, ttl=60))
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), object_cache=cache, scheduler=_fast_scheduler(), write_suppression=True)
+    incoming = {"name": "Example", "phone": "", "employees": 10.0}
+
+    # Nothing is known before the first write
+    assert await client.properties_to_write("companies", "1", incoming) == incoming
+    await client.update_object("companies", "1", incoming, HubSpotCompanyOutput)
+
+    assert await client.properties_to_write("companies", "1", incoming) == {}
+    assert await client.properties_to_write("companies", "1", dict(incoming, name="Renamed")) == {"name": "Renamed"}
+    assert await client.properties_to_write("companies", "1", dict(incoming, name="Renamed"), trim=False) == dict(incoming, name="Renamed")
+    assert await client.properties_to_write("companies", "1", dict(incoming, city="Berlin")) == {"city": "Berlin"}
+    assert client.stats()["write_suppression"] == {"checked": 5, "skipped": 1, "trimmed": 2, "properties_skipped": 8}
+
+@pytest.mark.asyncio
+async def test_write_suppression_is_off_by_default():
+    cache = ObjectCache(MemoryCacheBackend(max_entries=10, ttl=60))
+    await cache.merge_properties("companies", "1", {"id": "1", "properties": {"name": "Example"}})
+    client = HubSpotClient(object_cache=cache)
+
+    assert await client.properties_to_write("companies", "1", {"name": "Example"}) == {"name": "Example"}
+    assert "write_suppression" not in client.stats()
+
+@pytest.mark.asyncio
+async def test_create_object_sends_associations_inline():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.url.path.endswith("/labels"):
+            return Response(200, json={"results": [
+                {"category": "HUBSPOT_DEFINED", "typeId": 16, "label": None},
+                {"category": "USER_DEFINED", "typeId": 41, "label": "Reporter"},
+            ]})
+        return Response(201, json={"id": "7", "properties": {"subject": "Printer on fire"}, "createdAt": "2023-01-01T00:00:00Z", "updatedAt": "2023-01-01T00:00:00Z", "archived": False})
+
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), scheduler=_fast_scheduler())
+    associations = [
+        {"to_object_type": "contacts", "to_object_id": "1"},
+        {"to_object_type": "companies", "to_object_id": "2"},
+        {"to_object_type": "contacts", "to_object_id": "3", "association_type_id": "41"},
+    ]
+
+    ticket = await client.create_object("tickets", {"subject": "Printer on fire"}, HubSpotTicketOutput, associations=associations)
+    await client.create_object("tickets", {"subject": "Again"}, HubSpotTicketOutput, associations=associations[2:])
+
+    assert ticket.id == "7"
+    creates = [json.loads(request.content) for request in requests if request.method == "POST"]
+    assert len(creates) == 2
+    assert creates[0]["associations"] == [
+        {"to": {"id": "1"}, "types": [{"associationCategory": "HUBSPOT_DEFINED", "associationTypeId": 16}]},
+        {"to": {"id": "2"}, "types": [{"associationCategory": "HUBSPOT_DEFINED", "associationTypeId": 339}]},
+        {"to": {"id": "3"}, "types": [{"associationCategory": "USER_DEFINED", "associationTypeId": 41}]},
+    ]
+    # Default types need no lookup and looked-up labels are cached
+    assert client.stats()["association_types"] == {"cached_pairs": 1, "lookups": 1}
+
+    with pytest.raises(HTTPException) as error:
+        await client.create_object("tickets", {"subject": "Unknown"}, HubSpotTicketOutput, associations=[{"to_object_type": "contacts", "to_object_id": "1", "association_type_id": "99"}])
+    assert error.value.status_code == 422
+
+@pytest.mark.asyncio
+async def test_batch_writes_link_associations_inline_or_afterwards():
+    requests = []
+
+    def handler(request):
+        requests.append((request.url.path, json.loads(request.content)))
+        if "/crm/v4/" in request.url.path:
+            return Response(200, json={"results": [{}]})
+        return Response(200, json={"results": [{"id": str(n), "properties": {}} for n in range(len(json.loads(request.content)["inputs"]))]})
+
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), object_cache=ObjectCache(MemoryCacheBackend(10, 60)), scheduler=_fast_scheduler())
+    link = [{"to_object_type": "contacts", "to_object_id": "1"}]
+
+    await client.batch_write_records("tickets", "create", [{"properties": {"subject": "A"}, "associations": link}])
+    await client.batch_write_records("companies", "update", [{"id": "0", "properties": {"name": "B"}, "associations": link}])
+
+    (create_path, create), (update_path, update), (link_path, linked) = requests
+    assert create_path.endswith("/tickets/batch/create")
+    assert create["inputs"][0]["associations"] == [{"to": {"id": "1"}, "types": [{"associationCategory": "HUBSPOT_DEFINED", "associationTypeId": 16}]}]
+    assert "associations" not in update["inputs"][0]
+    assert link_path.endswith("/crm/v4/associations/companies/contacts/batch/create")
+    assert linked["inputs"] == [{"from": {"id": "0"}, "to": {"id": "1"}, "types": [{"associationCategory": "HUBSPOT_DEFINED", "associationTypeId": 280}]}]
+
+@pytest.mark.asyncio
+async def test_find_object_id_uses_index_after_first_search():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        if request.url.path.endswith("/search"):
+            return Response(200, json={"results": [{"id": "42", "properties": {"domain": "example.com"}}]})
+        return Response(404, json={"message": "Object not found"})
+
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)))
+
+    assert await client.find_object_id("companies", "domain", "example.com") == "42"
+    assert await client.find_object_id("companies", "domain", "example.com") == "42"
+    assert calls == ["/crm/v3/objects/companies/search"]
+
+    # A 404 on update reveals the indexed ID is stale and drops it
+    with pytest.raises(HTTPException):
+        await client.update_object("companies", "42", {"name": "Example"}, HubSpotCompanyOutput)
+    await client.find_object_id("companies", "domain", "example.com")
+    assert calls[-1] == "/crm/v3/objects/companies/search"
+    assert client.stats()["id_index"]["stale_corrections"] == 1
+
+def _fast_scheduler():
+    lanes = {"crm": (1000.0, 1000.0), "search": (1000.0, 1000.0), "batch": (1000.0, 1000.0)}
+    return UpstreamScheduler(lanes=lanes, retry_base_delay=0.001, retry_max_delay=0.01)
+
+@pytest.mark.asyncio
+async def test_throttled_request_is_retried_after_retry_after():
+    responses = iter([
+        Response(429, headers={"Retry-After": "0"}, json={"message": "Too many requests"}),
+        Response(200, json={"results": []}),
+    ])
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(lambda request: next(responses))), scheduler=_fast_scheduler())
+
+    result = await client.search_object("contacts", "email", "test@example.com", HubSpotContactOutput)
+
+    assert result is None
+    assert client.stats()["scheduler"]["retries"] == 1
+    assert client.stats()["scheduler"]["lanes"]["search"]["throttled"] == 1
+
+@pytest.mark.asyncio
+async def test_retry_after_beyond_the_cap_fails_fast():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return Response(429, headers={"Retry-After": "3600"}, json={"message": "Too many requests"})
+
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), scheduler=_fast_scheduler())
+
+    with pytest.raises(HTTPException) as exc_info:
+        await client.search_object("contacts", "email", "test@example.com", HubSpotContactOutput)
+
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers["Retry-After"] == "3600"
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+async def test_non_idempotent_create_is_not_retried_on_server_error():
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        return Response(502, json={"message": "Bad gateway"})
+
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), scheduler=_fast_scheduler())
+
+    with pytest.raises(HTTPException) as exc_info:
+        await client.create_object("contacts", {"email": "test@example.com"}, HubSpotContactOutput)
+    assert exc_info.value.status_code == 502
+    assert calls == ["POST"]
+
+@pytest.mark.asyncio
+async def test_batch_read_objects_chunks_ids_and_fills_cache():
+    bodies = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        bodies.append(body)
+        # HubSpot omits IDs it cannot find
+        return Response(200, json={"results": [{"id": item["id"], "properties": {}} for item in body["inputs"] if item["id"] != "7"]})
+
+    cache = ObjectCache(MemoryCacheBackend(max_entries=1000, ttl=60))
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), object_cache=cache, scheduler=_fast_scheduler())
+
+    found = await client.batch_read_objects("contacts", [str(i) for i in range(150)] + ["1"])
+
+    assert [len(body["inputs"]) for body in bodies] == [100, 50]
+    assert len(found) == 149 and "7" not in found
+    assert await cache.get("contacts", "42") == {"id": "42", "properties": {}}
+
+@pytest.mark.asyncio
+async def test_list_objects_page_passes_cursor_and_properties():
+    seen = []
+
+    def handler(request):
+        seen.append(dict(request.url.params))
+        return Response(200, json={"results": []})
+
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), scheduler=_fast_scheduler())
+
+    await client.list_objects_page("contacts", after="abc", properties=["email", "firstname"])
+
+    assert seen == [{"limit": "100", "after": "abc", "properties": "email,firstname"}]
+
+@pytest.mark.asyncio
+async def test_batch_read_objects_serves_cache_hits_locally():
+    requested = []
+
+    def handler(request):
+        ids = [item["id"] for item in json.loads(request.content)["inputs"]]
+        requested.extend(ids)
+        return Response(200, json={"results": [{"id": object_id, "properties": {}} for object_id in ids]})
+
+    cache = ObjectCache(MemoryCacheBackend(max_entries=1000, ttl=60))
+    await cache.set("contacts", "1", {"id": "1", "properties": {"email": "cached@example.com"}})
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), object_cache=cache, scheduler=_fast_scheduler())
+
+    found = await client.batch_read_objects("contacts", ["1", "2"], use_cache=True)
+
+    assert requested == ["2"]
+    assert found["1"]["properties"]["email"] == "cached@example.com"
+    assert set(found) == {"1", "2"}
+
+@pytest.mark.asyncio
+async def test_create_associations_chunks_pairs_and_reports_rejected_ones():
+    bodies = []
+
+    def handler(request):
+        inputs = json.loads(request.content)["inputs"]
+        bodies.append(inputs)
+        results = [{"fromObjectId": int(item["from"]["id"]), "toObjectId": int(item["to"]["id"])} for item in inputs if item["to"]["id"] != "999"]
+        errors = [{"status": "error", "category": "VALIDATION_ERROR", "message": "Object 999 not found"}] if len(results) < len(inputs) else []
+        return Response(207 if errors else 201, json={"results": results, "errors": errors})
+
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), scheduler=_fast_scheduler())
+    pairs = [(str(i), "1", "279") for i in range(149)] + [("149", "999", "279")]
+
+    outcomes = await client.create_associations("contacts", "companies", pairs)
+
+    assert [len(inputs) for inputs in bodies] == [100, 50]
+    assert bodies[0][0]["types"] == [{"associationCategory": "HUBSPOT_DEFINED", "associationTypeId": 279}]
+    assert outcomes[:149] == [None] * 149
+    assert isinstance(outcomes[149], HTTPException)
+
+@pytest.mark.asyncio
+async def test_association_categories_come_from_the_type_registry():
+    bodies = []
+
+    def handler(request):
+        if request.url.path.endswith("/labels"):
+            return Response(200, json={"results": [{"category": "USER_DEFINED", "typeId": 41, "label": "Billing contact"}]})
+        bodies.append(json.loads(request.content)["inputs"])
+        return Response(201, json={"results": [{"fromObjectId": 1, "toObjectId": 2}], "errors": []})
+
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), scheduler=_fast_scheduler())
+
+    await client.create_association("companies", "1", "contacts", "2", "41")
+    assert bodies[0][0]["types"] == [{"associationCategory": "USER_DEFINED", "associationTypeId": 41}]
+
+    # A non-numeric type ID is rejected before anything is sent, alone or within a batch
+    with pytest.raises(HTTPException) as exc_info:
+        await client.create_association("companies", "1", "contacts", "2", "primary")
+    assert exc_info.value.status_code == 422
+    outcomes = await client.create_associations("companies", "contacts", [("1", "2", "41"), ("1", "3", "primary")])
+    assert outcomes[0] is None and outcomes[1].status_code == 422
+    assert [len(inputs) for inputs in bodies] == [1, 1]
+
+@pytest.mark.asyncio
+async def test_association_reads_follow_pagination():
+    def handler(request):
+        if request.url.path.endswith("/batch/read"):
+            return Response(200, json={"results": [
+                {"from": {"id": "1"}, "to": [{"toObjectId": 10}], "paging": {"next": {"after": "p2"}}},
+                {"from": {"id": "2"}, "to": [{"toObjectId": 20}]},
+            ]})
+        if request.url.params.get("after") == "p2":
+            return Response(200, json={"results": [{"toObjectId": 11}]})
+        return Response(200, json={"results": [{"toObjectId": 10}], "paging": {"next": {"after": "p2"}}})
+
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), scheduler=_fast_scheduler())
+
+    single = await client.get_associations("contacts", "1", "companies")
+    assert [item["toObjectId"] for item in single["results"]] == [10, 11]
+
+    many = await client.batch_read_associations("contacts", ["1", "2", "3"], "companies")
+    assert {object_id: [item["toObjectId"] for item in items] for object_id, items in many.items()} == {"1": [10, 11], "2": [20], "3": []}
+
+@pytest.mark.asyncio
+async def test_association_edges_are_cached_until_an_association_is_created():
+    reads = []
+
+    def handler(request):
+        if request.url.path.endswith("/batch/read"):
+            reads.append([item["id"] for item in json.loads(request.content)["inputs"]])
+            return Response(200, json={"results": [{"from": {"id": "1"}, "to": [{"toObjectId": 10}]}]})
+        return Response(201, json={"results": []})
+
+    cache = ObjectCache(MemoryCacheBackend(max_entries=100, ttl=60))
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), object_cache=cache, scheduler=_fast_scheduler())
+
+    await client.batch_read_associations("contacts", ["1"], "companies", use_cache=True)
+    cached = await client.batch_read_associations("contacts", ["1"], "companies", use_cache=True)
+    assert cached == {"1": [{"toObjectId": 10}]}
+    assert reads == [["1"]]
+
+    await client.create_association("contacts", "1", "companies", "11", "279")
+    await client.batch_read_associations("contacts", ["1"], "companies", use_cache=True)
+    assert reads == [["1"], ["1"]]
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_reads_share_one_upstream_call():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(0.01)
+        if request.url.path.endswith("/404"):
+            return Response(500, json={"message": "boom"})
+        return Response(200, json={"id": "1", "properties": {}, "createdAt": "2023-01-01T00:00:00Z", "updatedAt": "2023-01-01T00:00:00Z", "archived": False})
+
+    scheduler = UpstreamScheduler(lanes={"crm": (1000.0, 1000.0), "search": (1000.0, 1000.0), "batch": (1000.0, 1000.0)}, max_retries=0)
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), object_cache=ObjectCache(MemoryCacheBackend(0, 60)), scheduler=scheduler)
+
+    results = await asyncio.gather(*(client.get_object_by_id("contacts", "1", HubSpotContactOutput) for _ in range(5)))
+    assert [result.id for result in results] == ["1"] * 5
+    assert calls == ["/crm/v3/objects/contacts/1"]
+
+    errors = await asyncio.gather(*(client.get_object_by_id("contacts", "404", HubSpotContactOutput) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(error, HTTPException) and error.status_code == 500 for error in errors)
+    assert len(calls) == 2
+
+    stats = client.stats()["single_flight"]
+    assert (stats["upstream_calls"], stats["coalesced"], stats["in_flight"]) == (2, 6, 0)
+
+@pytest.mark.asyncio
+async def test_writes_are_never_shared():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.method)
+        await asyncio.sleep(0.01)
+        return Response(200, json={"id": "1", "properties": {}, "createdAt": "2023-01-01T00:00:00Z", "updatedAt": "2023-01-01T00:00:00Z", "archived": False})
+
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), scheduler=_fast_scheduler())
+
+    await asyncio.gather(*(client.update_object("contacts", "1", {"firstname": "A"}, HubSpotContactOutput) for _ in range(3)))
+
+    assert calls == ["PATCH"] * 3
+    assert client.stats()["single_flight"]["coalesced"] == 0
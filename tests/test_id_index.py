@@ -0,0 +1,41 @@
+from id_index import IdIndex, parse_tracked_properties
+
+def _index(max_entries=10):
+    return IdIndex(parse_tracked_properties("contacts:email,companies:domain"), max_entries)
+
+def test_lookup_is_case_insensitive():
+    index = _index()
+    index.put("companies", "domain", "Example.com", "1")
+
+    assert index.get("companies", "domain", "example.COM") == "1"
+    assert index.get("companies", "domain", "other.com") is None
+    assert (index.hits, index.misses) == (1, 1)
+
+def test_record_object_indexes_tracked_properties_only():
+    index = _index()
+    index.record_object("contacts", {"id": "5", "properties": {"email": "a@example.com", "firstname": "A"}})
+
+    assert index.get("contacts", "email", "a@example.com") == "5"
+    assert index.stats()["entries"] == 1
+
+def test_forget_id_removes_all_values_for_object():
+    index = _index()
+    index.put("contacts", "email", "old@example.com", "5")
+    index.put("contacts", "email", "new@example.com", "5")
+
+    index.forget_id("contacts", "5", stale=True)
+
+    assert index.get("contacts", "email", "old@example.com") is None
+    assert index.get("contacts", "email", "new@example.com") is None
+    assert index.stats()["stale_corrections"] == 1
+
+def test_size_bounded_lru_eviction():
+    index = _index(max_entries=2)
+    index.put("companies", "domain", "a.com", "1")
+    index.put("companies", "domain", "b.com", "2")
+    index.get("companies", "domain", "a.com")
+    index.put("companies", "domain", "c.com", "3")
+
+    assert index.get("companies", "domain", "b.com") is None
+    assert index.get("companies", "domain", "a.com") == "1"
+    assert index.stats()["evictions"] == 1
@@ -0,0 +1,55 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from idempotency import IdempotencyStore, MemoryIdempotencyBackend, request_fingerprint
+
+@pytest.mark.asyncio
+async def test_concurrent_retries_wait_for_the_first_request_and_replay_it():
+    store = IdempotencyStore(MemoryIdempotencyBackend(max_entries=10, ttl=60))
+    calls = 0
+
+    async def create():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"status": "success", "hubspot_ticket_id": "1", "action": "created"}
+
+    fingerprint = request_fingerprint("POST", "/tickets", {"subject": "Printer on fire"})
+    first, second = await asyncio.gather(store.run("key-1", fingerprint, create), store.run("key-1", fingerprint, create))
+    later = await store.run("key-1", fingerprint, create)
+
+    assert calls == 1
+    assert first.body == second.body == later.body
+    assert "idempotent-replayed" not in first.headers
+    assert later.headers["idempotent-replayed"] == "true"
+    assert store.stats()["waited"] == 1
+
+    # The same key for a different request is rejected
+    with pytest.raises(HTTPException) as error:
+        await store.run("key-1", request_fingerprint("POST", "/tickets", {"subject": "Other"}), create)
+    assert error.value.status_code == 422
+
+@pytest.mark.asyncio
+async def test_server_errors_are_not_stored_and_other_workers_get_409():
+    backend = MemoryIdempotencyBackend(max_entries=10, ttl=60)
+    store, other_worker = IdempotencyStore(backend), IdempotencyStore(backend)
+    outcomes = [HTTPException(status_code=503, detail="unavailable"), {"status": "success"}]
+
+    async def create():
+        await asyncio.sleep(0.01)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    with pytest.raises(HTTPException):
+        await store.run("key-2", "fingerprint", create)
+    # The 503 left nothing behind, so the retry runs; meanwhile another worker sees the claim
+    retry = asyncio.create_task(store.run("key-2", "fingerprint", create))
+    await asyncio.sleep(0)
+    with pytest.raises(HTTPException) as error:
+        await other_worker.run("key-2", "fingerprint", create)
+    assert error.value.status_code == 409
+    assert (await retry).status_code == 200
+    assert (await other_worker.run("key-2", "fingerprint", create)).headers["idempotent-replayed"] == "true"
+    assert not outcomes
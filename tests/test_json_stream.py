@@ -0,0 +1,29 @@
+import json
+import pytest
+from json_stream import iter_json_records
+
+async def _collect(body: str, chunk_size: int):
+    async def chunks():
+        data = body.encode("utf-8")
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+    return [record async for record in iter_json_records(chunks())]
+
+RECORDS = [{"email": "a@example.com", "note": "quote \" and ] inside"}, {"nested": [1, {"x": "é"}]}, {"email": "b@example.com"}]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunk_size", [1, 3, 64])
+async def test_json_array_split_across_chunks(chunk_size):
+    assert await _collect(json.dumps(RECORDS, ensure_ascii=False), chunk_size) == RECORDS
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunk_size", [1, 5, 64])
+async def test_ndjson_split_across_chunks(chunk_size):
+    body = "\n".join(json.dumps(record) for record in RECORDS) + "\n"
+    assert await _collect(body, chunk_size) == RECORDS
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("body", ["[{\"a\": 1}", "[{\"a\": 1},,{}]", "[{}] trailing"])
+async def test_malformed_array_raises(body):
+    with pytest.raises(ValueError):
+        await _collect(body, 4)
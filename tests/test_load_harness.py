@@ -0,0 +1,41 @@
+import httpx
+import pytest
+from hubspot_client import HubSpotClient
+from benchmarks.fake_hubspot import FakeHubSpot, build_fake_hubspot_app
+from benchmarks.load_harness import compare, percentile
+
+def test_percentile_uses_nearest_rank():
+    samples = [float(n) for n in range(1, 101)]
+    assert percentile(samples, 50) == 50.0
+    assert percentile(samples, 99) == 99.0
+    assert percentile([], 95) == 0.0
+
+def test_compare_reports_change_against_latest_matching_baseline():
+    baseline = [
+        {"scenario": "get", "concurrency": 50, "git_commit": "old", "throughput_rps": 50.0, "p50_ms": 10.0},
+        {"scenario": "get", "concurrency": 50, "git_commit": "abc123", "throughput_rps": 100.0, "p50_ms": 20.0},
+        {"scenario": "upsert", "concurrency": 50, "git_commit": "abc123", "throughput_rps": 10.0},
+    ]
+    result = {"scenario": "get", "concurrency": 50, "throughput_rps": 150.0, "p50_ms": 10.0}
+
+    summary = compare(result, baseline)
+
+    assert summary.startswith("get vs abc123")
+    assert "throughput_rps 100.0 -> 150.0 (+50.0%)" in summary
+    assert "p50_ms 20.0 -> 10.0 (-50.0%)" in summary
+    assert compare({"scenario": "graph", "concurrency": 50}, baseline) is None
+
+@pytest.mark.asyncio
+async def test_fake_hubspot_serves_the_client_and_counts_calls():
+    fake = FakeHubSpot(seed=1)
+    contact_id = fake.seed_objects("contacts", 1, lambda i: {"email": "a@example.com"})[0]
+    transport = httpx.ASGITransport(app=build_fake_hubspot_app(fake))
+    client = HubSpotClient(http_client=httpx.AsyncClient(transport=transport))
+
+    assert await client.find_object_id("contacts", "email", "A@example.com") == contact_id
+    found = await client.batch_read_objects("contacts", [contact_id, "999999"])
+    await client.aclose()
+
+    assert list(found) == [contact_id]
+    assert fake.calls["POST /crm/v3/objects/contacts/search"] == 1
+    assert fake.calls["POST /crm/v3/objects/contacts/batch/read"] == 1
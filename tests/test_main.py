@@ -1,12 +1,24 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
 import pytest
+from fastapi import HTTPException
 from httpx import AsyncClient
 from main import app
-from unittest.mock import AsyncMock, patch
+from models.contact_models import HubSpotContactOutput
+from rate_limiter import MemoryRateLimitBackend, RateLimiter, parse_rate_limit
+from routers.webhooks import get_webhook_pipeline
+from upstream_scheduler import PRIORITY_LOW
+from webhook_pipeline import WebhookPipeline
+from write_queue import WriteQueue, WriteQueueStore
+from idempotency import IdempotencyStore, MemoryIdempotencyBackend
+from unittest.mock import MagicMock, patch
 
 @pytest.mark.asyncio
 async def test_create_contact_success(mock_hubspot_client):
-    mock_hubspot_client.search_object.return_value = None
-    mock_hubspot_client.create_object.return_value.id = "new_contact_id"
+    mock_hubspot_client.upsert_object.return_value = (MagicMock(id="new_contact_id"), True)
 
     async with AsyncClient(app=app, base_url="http://test") as client:
         response = await client.post(
@@ -22,13 +34,13 @@ async def test_create_contact_success(mock_hubspot_client):
     assert response.json()["status"] == "success"
     assert response.json()["action"] == "created"
     assert response.json()["hubspot_contact_id"] == "new_contact_id"
-    mock_hubspot_client.search_object.assert_called_once()
-    mock_hubspot_client.create_object.assert_called_once()
+    mock_hubspot_client.upsert_object.assert_called_once()
+    mock_hubspot_client.search_object.assert_not_called()
+    mock_hubspot_client.create_object.assert_not_called()
 
 @pytest.mark.asyncio
 async def test_update_contact_success(mock_hubspot_client):
-    mock_hubspot_client.search_object.return_value.id = "existing_contact_id"
-    mock_hubspot_client.update_object.return_value.id = "existing_contact_id"
+    mock_hubspot_client.upsert_object.return_value = (MagicMock(id="existing_contact_id"), False)
 
     async with AsyncClient(app=app, base_url="http://test") as client:
         response = await client.post(
@@ -43,32 +55,131 @@ async def test_update_contact_success(mock_hubspot_client):
     assert response.json()["status"] == "success"
     assert response.json()["action"] == "updated"
     assert response.json()["hubspot_contact_id"] == "existing_contact_id"
-    mock_hubspot_client.search_object.assert_called_once()
+    args = mock_hubspot_client.upsert_object.call_args.args
+    assert args[:3] == ("contacts", "email", "test@example.com")
+    assert args[3] == {"email": "test@example.com", "firstname": "Updated"}
+    mock_hubspot_client.search_object.assert_not_called()
+    mock_hubspot_client.update_object.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_create_company_falls_back_to_search(mock_hubspot_client):
+    mock_hubspot_client.find_object_id.return_value = None
+    mock_hubspot_client.create_object.return_value.id = "new_company_id"
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/companies", json={"name": "Example", "domain": "example.com"})
+
+    assert response.status_code == 200
+    assert response.json()["action"] == "created"
+    assert response.json()["hubspot_company_id"] == "new_company_id"
+    mock_hubspot_client.find_object_id.assert_called_once_with("companies", "domain", "example.com")
+    mock_hubspot_client.create_object.assert_called_once()
+    mock_hubspot_client.upsert_object.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_update_company_falls_back_to_search(mock_hubspot_client):
+    mock_hubspot_client.find_object_id.return_value = "existing_company_id"
+    mock_hubspot_client.update_object.return_value.id = "existing_company_id"
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/companies", json={"name": "Example", "domain": "example.com"})
+
+    assert response.status_code == 200
+    assert response.json()["action"] == "updated"
+    assert response.json()["hubspot_company_id"] == "existing_company_id"
+    mock_hubspot_client.find_object_id.assert_called_once()
     mock_hubspot_client.update_object.assert_called_once()
 
+@pytest.mark.asyncio
+async def test_unchanged_company_write_is_not_sent(mock_hubspot_client):
+    mock_hubspot_client.find_object_id.return_value = "existing_company_id"
+    mock_hubspot_client.properties_to_write.side_effect = None
+    mock_hubspot_client.properties_to_write.return_value = {}
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/companies", json={"name": "Example", "domain": "example.com"})
+
+    assert response.status_code == 200
+    assert response.json()["action"] == "unchanged"
+    assert response.json()["hubspot_company_id"] == "existing_company_id"
+    mock_hubspot_client.update_object.assert_not_called()
+    mock_hubspot_client.create_object.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_update_company_sends_only_changed_properties(mock_hubspot_client):
+    mock_hubspot_client.find_object_id.return_value = "existing_company_id"
+    mock_hubspot_client.properties_to_write.side_effect = None
+    mock_hubspot_client.properties_to_write.return_value = {"name": "Renamed"}
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/companies", json={"name": "Renamed", "domain": "example.com"})
+
+    assert response.json()["action"] == "updated"
+    assert mock_hubspot_client.update_object.call_args.args[2] == {"name": "Renamed"}
+
+@pytest.mark.asyncio
+async def test_update_company_with_stale_indexed_id_resolves_again(mock_hubspot_client):
+    mock_hubspot_client.find_object_id.side_effect = ["stale_id", "current_id"]
+    mock_hubspot_client.update_object.side_effect = [HTTPException(status_code=404, detail="Not found"), MagicMock(id="current_id")]
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/companies", json={"name": "Example", "domain": "example.com"})
+
+    assert response.status_code == 200
+    assert response.json()["action"] == "updated"
+    assert response.json()["hubspot_company_id"] == "current_id"
+    assert [call.args[1] for call in mock_hubspot_client.update_object.call_args_list] == ["stale_id", "current_id"]
+
 @pytest.mark.asyncio
 async def test_get_contact_success(mock_hubspot_client):
-    mock_hubspot_client.get_object_by_id.return_value.id = "contact_123"
-    mock_hubspot_client.get_object_by_id.return_value.properties = {"email": "test@example.com"}
+    body = json.dumps({
+        "id": "contact_123",
+        "properties": {"email": "test@example.com"},
+        "createdAt": "2023-01-01T00:00:00Z",
+        "updatedAt": "2023-01-01T00:00:00Z",
+        "archived": False
+    }).encode()
+    mock_hubspot_client.get_object_json.return_value = body
 
     async with AsyncClient(app=app, base_url="http://test") as client:
         response = await client.get("/contacts/contact_123")
 
     assert response.status_code == 200
-    assert response.json()["id"] == "contact_123"
+    assert response.headers["content-type"] == "application/json"
+    assert response.content == body
     assert response.json()["properties"]["email"] == "test@example.com"
-    mock_hubspot_client.get_object_by_id.assert_called_once()
+    mock_hubspot_client.get_object_json.assert_called_once_with("contacts", "contact_123")
+    mock_hubspot_client.get_object_by_id.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_get_contact_validated_without_passthrough(mock_hubspot_client):
+    mock_hubspot_client.get_object_by_id.return_value = HubSpotContactOutput(
+        id="contact_123",
+        properties={"email": "test@example.com"},
+        createdAt="2023-01-01T00:00:00Z",
+        updatedAt="2023-01-01T00:00:00Z",
+        archived=False
+    )
+
+    with patch("routers.crud_router.settings.HUBSPOT_READ_PASSTHROUGH", False):
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.get("/contacts/contact_123")
+
+    assert response.status_code == 200
+    assert response.json()["id"] == "contact_123"
+    assert response.json()["createdAt"] == "2023-01-01T00:00:00Z"
+    mock_hubspot_client.get_object_json.assert_not_called()
 
 @pytest.mark.asyncio
 async def test_get_contact_not_found(mock_hubspot_client):
-    mock_hubspot_client.get_object_by_id.return_value = None
+    mock_hubspot_client.get_object_json.return_value = None
 
     async with AsyncClient(app=app, base_url="http://test") as client:
         response = await client.get("/contacts/nonexistent_id")
 
     assert response.status_code == 404
     assert response.json()["detail"] == "Contacts not found"
-    mock_hubspot_client.get_object_by_id.assert_called_once()
+    mock_hubspot_client.get_object_json.assert_called_once()
 
 # Similar tests for companies and tickets would follow the same pattern
 
@@ -105,7 +216,7 @@ async def test_get_associations_success(mock_hubspot_client):
     mock_hubspot_client.get_associations.assert_called_once()
 
 @pytest.mark.asyncio
-async def test_receive_hubspot_webhook_success():
+async def test_receive_hubspot_webhook_success(mock_hubspot_client, webhook_pipeline):
     async with AsyncClient(app=app, base_url="http://test") as client:
         response = await client.post(
             "/webhooks/hubspot",
@@ -131,3 +242,442 @@ async def test_receive_hubspot_webhook_success():
     assert response.status_code == 200
     assert response.json()["status"] == "success"
     assert response.json()["message"] == "Received 1 events"
+    await webhook_pipeline.drain()
+    mock_hubspot_client.invalidate_cached_object.assert_called_once_with("contacts", "1")
+
+@pytest.mark.asyncio
+async def test_webhook_merge_invalidates_all_merged_objects(mock_hubspot_client, webhook_pipeline):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/webhooks/hubspot",
+            json=[{"eventId": 2, "subscriptionType": "company.merge", "objectId": 10, "primaryObjectId": 10, "mergedObjectIds": [11, 12]}]
+        )
+
+    assert response.status_code == 200
+    await webhook_pipeline.drain()
+    invalidated = [call.args for call in mock_hubspot_client.invalidate_cached_object.call_args_list]
+    assert invalidated == [("companies", "10"), ("companies", "11"), ("companies", "12")]
+    mock_hubspot_client.batch_read_objects.assert_called_once_with("companies", ["10"], priority=PRIORITY_LOW)
+
+@pytest.mark.asyncio
+async def test_webhook_property_changes_coalesce_into_one_batch_read(mock_hubspot_client, webhook_pipeline):
+    events = [
+        {"eventId": 100 + i, "subscriptionType": "contact.propertyChange", "objectId": object_id, "propertyName": f"prop{i}"}
+        for i, object_id in enumerate([1, 1, 1, 2, 2])
+    ]
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.post("/webhooks/hubspot", json=events[:3])
+        await client.post("/webhooks/hubspot", json=events[3:])
+
+    await webhook_pipeline.drain()
+    mock_hubspot_client.batch_read_objects.assert_called_once_with("contacts", ["1", "2"], priority=PRIORITY_LOW)
+    assert webhook_pipeline.stats()["refresh"]["ids_coalesced"] == 3
+
+@pytest.mark.asyncio
+async def test_bulk_contacts_streams_per_record_results(mock_hubspot_client):
+    async def batch_write_records(object_type, operation, payloads):
+        return [{"id": f"id-{payload['id']}", "new": i == 0} for i, payload in enumerate(payloads)]
+    mock_hubspot_client.batch_write_records.side_effect = batch_write_records
+
+    body = "\n".join([
+        '{"email": "first@example.com", "firstname": "First"}',
+        '{"firstname": "No email"}',
+        '{"email": "second@example.com"}',
+    ])
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/contacts/batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    lines = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda line: line["index"])
+    assert lines[0] == {"index": 0, "id": "id-first@example.com", "action": "created", "error": None}
+    assert lines[1]["index"] == 1 and lines[1]["error"].startswith("Validation error")
+    assert lines[2] == {"index": 2, "id": "id-second@example.com", "action": "updated", "error": None}
+    mock_hubspot_client.batch_write_records.assert_called_once()
+    assert mock_hubspot_client.batch_write_records.call_args.args[1] == "upsert"
+
+@pytest.mark.asyncio
+async def test_bulk_contacts_skips_unchanged_records(mock_hubspot_client):
+    async def batch_write_records(object_type, operation, payloads):
+        return [{"id": "id-changed", "new": False} for _ in payloads]
+    mock_hubspot_client.batch_write_records.side_effect = batch_write_records
+    mock_hubspot_client.find_object_id.side_effect = lambda object_type, name, value, search=True: f"id-{value.split('@')[0]}"
+    mock_hubspot_client.properties_to_write.side_effect = lambda object_type, object_id, properties, trim=True: {} if object_id == "id-same" else properties
+
+    body = '{"email": "same@example.com"}\n{"email": "changed@example.com", "firstname": "New"}'
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/contacts/batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    lines = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda line: line["index"])
+    assert lines == [
+        {"index": 0, "id": "id-same", "action": "unchanged", "error": None},
+        {"index": 1, "id": "id-changed", "action": "updated", "error": None},
+    ]
+    payloads = mock_hubspot_client.batch_write_records.call_args.args[2]
+    assert [payload["id"] for payload in payloads] == ["changed@example.com"]
+
+@pytest.mark.asyncio
+async def test_bulk_companies_keep_created_records_when_the_update_call_fails(mock_hubspot_client):
+    async def batch_write_records(object_type, operation, payloads):
+        if operation == "update":
+            raise HTTPException(status_code=502, detail="Bad gateway")
+        return [{"id": "id-new"} for _ in payloads]
+    mock_hubspot_client.batch_write_records.side_effect = batch_write_records
+    mock_hubspot_client.find_object_ids.return_value = {"old.example.com": "id-old"}
+
+    body = '{"name": "Old", "domain": "old.example.com"}\n{"name": "New", "domain": "new.example.com"}'
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/companies/batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    lines = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda line: line["index"])
+    assert lines == [
+        {"index": 0, "id": None, "action": None, "error": "Bad gateway"},
+        {"index": 1, "id": "id-new", "action": "created", "error": None},  # not reported as failed, so not sent again
+    ]
+
+@pytest.mark.asyncio
+async def test_bulk_tickets_accepts_json_array(mock_hubspot_client):
+    async def batch_write_records(object_type, operation, payloads):
+        return [{"id": str(i)} for i, _ in enumerate(payloads)]
+    mock_hubspot_client.batch_write_records.side_effect = batch_write_records
+
+    tickets = [{"hs_pipeline": "0", "hs_pipeline_stage": "1", "subject": f"Ticket {i}"} for i in range(3)]
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/tickets/batch", json=tickets)
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["action"] for line in lines] == ["created"] * 3
+    assert mock_hubspot_client.batch_write_records.call_args.args[:2] == ("tickets", "create")
+
+@pytest.mark.asyncio
+async def test_webhook_signature_is_verified(mock_hubspot_client, webhook_pipeline):
+    body = json.dumps([{"eventId": 3, "subscriptionType": "contact.deletion", "objectId": 5}])
+    timestamp = str(int(time.time() * 1000))
+    url = "http://test/webhooks/hubspot"
+    digest = hmac.new(b"secret", ("POST" + url + body + timestamp).encode("utf-8"), hashlib.sha256).digest()
+    valid_signature = base64.b64encode(digest).decode("utf-8")
+
+    with patch("routers.webhooks.settings.HUBSPOT_WEBHOOK_SECRET", "secret"):
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            rejected = await client.post("/webhooks/hubspot", content=body, headers={
+                "Content-Type": "application/json", "X-HubSpot-Signature-v3": "invalid", "X-HubSpot-Request-Timestamp": timestamp
+            })
+            accepted = await client.post("/webhooks/hubspot", content=body, headers={
+                "Content-Type": "application/json", "X-HubSpot-Signature-v3": valid_signature, "X-HubSpot-Request-Timestamp": timestamp
+            })
+
+    assert rejected.status_code == 401
+    assert accepted.status_code == 200
+    assert webhook_pipeline.stats()["batches_received"] == 1
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("overrides, headers", [
+    ({"WEBHOOK_PUBLIC_BASE_URL": "https://connector.example.com/"}, {}),
+    ({"WEBHOOK_TRUST_FORWARDED_HEADERS": True}, {"X-Forwarded-Proto": "https", "X-Forwarded-Host": "connector.example.com"}),
+])
+async def test_webhook_signature_uses_public_url_behind_proxy(mock_hubspot_client, webhook_pipeline, overrides, headers):
+    body = json.dumps([{"eventId": 4, "subscriptionType": "contact.deletion", "objectId": 6}])
+    timestamp = str(int(time.time() * 1000))
+    # HubSpot signs the public HTTPS URL; the app itself is reached over plain HTTP
+    url = "https://connector.example.com/webhooks/hubspot"
+    digest = hmac.new(b"secret", ("POST" + url + body + timestamp).encode("utf-8"), hashlib.sha256).digest()
+    headers = dict(headers, **{
+        "Content-Type": "application/json",
+        "X-HubSpot-Signature-v3": base64.b64encode(digest).decode("utf-8"),
+        "X-HubSpot-Request-Timestamp": timestamp,
+    })
+
+    with patch("routers.webhooks.settings.HUBSPOT_WEBHOOK_SECRET", "secret"):
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            rejected = await client.post("/webhooks/hubspot", content=body, headers=headers)
+            with patch.multiple("routers.webhooks.settings", **overrides):
+                accepted = await client.post("/webhooks/hubspot", content=body, headers=headers)
+
+    assert rejected.status_code == 401
+    assert accepted.status_code == 200
+
+@pytest.mark.asyncio
+async def test_webhook_signature_covers_the_decoded_query(mock_hubspot_client, webhook_pipeline):
+    body = json.dumps([{"eventId": 5, "subscriptionType": "contact.deletion", "objectId": 7}])
+    timestamp = str(int(time.time() * 1000))
+    # HubSpot decodes %3A, %2F and friends before signing but keeps other escapes such as %20
+    url = "http://test/webhooks/hubspot?next=https://example.com/a%20b&tag=(x)%20y"
+    digest = hmac.new(b"secret", ("POST" + url + body + timestamp).encode("utf-8"), hashlib.sha256).digest()
+
+    with patch("routers.webhooks.settings.HUBSPOT_WEBHOOK_SECRET", "secret"):
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post(
+                "/webhooks/hubspot?next=https%3A%2F%2Fexample.com%2Fa%20b&tag=%28x%29%20y",
+                content=body,
+                headers={
+                    "Content-Type": "application/json",
+                    "X-HubSpot-Signature-v3": base64.b64encode(digest).decode("utf-8"),
+                    "X-HubSpot-Request-Timestamp": timestamp,
+                },
+            )
+
+    assert response.status_code == 200
+
+@pytest.mark.asyncio
+async def test_webhook_returns_503_when_queue_is_full(mock_hubspot_client):
+    pipeline = WebhookPipeline(workers=1, max_queue=1)
+    app.dependency_overrides[get_webhook_pipeline] = lambda: pipeline
+    pipeline._accepting = True  # queue without workers so it stays full
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            first = await client.post("/webhooks/hubspot", json=[{"eventId": 1}])
+            second = await client.post("/webhooks/hubspot", json=[{"eventId": 2}])
+    finally:
+        app.dependency_overrides.pop(get_webhook_pipeline, None)
+
+    assert first.status_code == 200
+    assert second.status_code == 503
+    assert pipeline.stats()["batches_rejected"] == 1
+
+@pytest.mark.asyncio
+async def test_export_streams_all_pages_as_ndjson(mock_hubspot_client):
+    pages = {
+        None: {"results": [{"id": "1", "properties": {"email": "a@example.com"}}], "paging": {"next": {"after": "1"}}},
+        "1": {"results": [{"id": "2", "properties": {"email": "b@example.com"}}]},
+    }
+
+    async def list_objects_page(object_type, after=None, properties=None):
+        assert properties == ["email", "firstname"]
+        return pages[after]
+    mock_hubspot_client.list_objects_page.side_effect = list_objects_page
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/contacts/export", params={"properties": "email,firstname"}, headers={"Accept-Encoding": "identity"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == ["1", "2"]
+    assert mock_hubspot_client.list_objects_page.call_count == 2
+
+@pytest.mark.asyncio
+async def test_export_gzip_and_mid_stream_error(mock_hubspot_client):
+    async def list_objects_page(object_type, after=None, properties=None):
+        if after:
+            raise HTTPException(status_code=502, detail="HubSpot API error: 502")
+        return {"results": [{"id": "1", "properties": {}}], "paging": {"next": {"after": "1"}}}
+    mock_hubspot_client.list_objects_page.side_effect = list_objects_page
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/companies/export", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [{"id": "1", "properties": {}}, {"error": "HubSpot API error: 502"}]
+
+@pytest.mark.asyncio
+async def test_batch_read_returns_results_in_input_order_with_not_found_markers(mock_hubspot_client):
+    mock_hubspot_client.batch_read_objects.return_value = {
+        "2": {"id": "2", "properties": {}},
+        "1": {"id": "1", "properties": {}},
+    }
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/contacts/batch/read", json={"ids": ["1", "3", "2"]})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [(result["id"], result["found"]) for result in results] == [("1", True), ("3", False), ("2", True)]
+    assert results[1]["object"] is None
+    mock_hubspot_client.batch_read_objects.assert_called_once_with("contacts", ["1", "3", "2"], use_cache=True)
+
+@pytest.mark.asyncio
+async def test_read_selectors_are_passed_to_the_client(mock_hubspot_client):
+    mock_hubspot_client.get_object_json.return_value = b'{"id":"1","properties":{"email":"a@example.com"}}'
+    mock_hubspot_client.batch_read_objects.return_value = {"1": {"id": "1", "properties": {"email": "a@example.com"}}}
+    mock_hubspot_client.batch_read_associations.return_value = {"1": [{"toObjectId": 10, "associationTypes": []}]}
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        single = await client.get("/contacts/1", params={"properties": "email, firstname", "associations": "companies"})
+        batch = await client.post("/contacts/batch/read", json={"ids": ["1"], "propertiesWithHistory": ["lifecyclestage"], "associations": ["companies"]})
+
+    assert single.status_code == 200
+    mock_hubspot_client.get_object_json.assert_called_once_with("contacts", "1", properties=["email", "firstname"], associations=["companies"])
+    assert batch.status_code == 200
+    mock_hubspot_client.batch_read_objects.assert_called_once_with("contacts", ["1"], use_cache=True, properties_with_history=["lifecyclestage"])
+    mock_hubspot_client.batch_read_associations.assert_called_once_with("contacts", ["1"], "companies", use_cache=True)
+    assert batch.json()["results"][0]["object"]["associations"] == {"companies": {"results": [{"toObjectId": 10, "associationTypes": []}]}}
+
+@pytest.mark.asyncio
+async def test_batch_read_rejects_too_many_ids(mock_hubspot_client):
+    with patch("routers.crud_router.settings.BATCH_READ_MAX_IDS", 2):
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post("/tickets/batch/read", json={"ids": ["1", "2", "3"]})
+
+    assert response.status_code == 422
+    mock_hubspot_client.batch_read_objects.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_create_associations_batch_groups_pairs_by_object_types(mock_hubspot_client):
+    async def create_associations(from_type, to_type, pairs):
+        return [HTTPException(status_code=400, detail="bad pair") if to_id == "bad" else None for _, to_id, _ in pairs]
+    mock_hubspot_client.create_associations.side_effect = create_associations
+
+    associations = [
+        {"from_object_type": "contacts", "from_object_id": "1", "to_object_type": "companies", "to_object_id": "10", "association_type_id": "279"},
+        {"from_object_type": "contacts", "from_object_id": "1", "to_object_type": "tickets", "to_object_id": "bad", "association_type_id": "15"},
+        {"from_object_type": "contacts", "from_object_id": "2", "to_object_type": "companies", "to_object_id": "10", "association_type_id": "279"},
+    ]
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/associations/batch", json={"associations": associations})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "partial_success"
+    assert [(result["index"], result["action"]) for result in body["results"]] == [(0, "created"), (1, None), (2, "created")]
+    assert mock_hubspot_client.create_associations.call_count == 2
+    mock_hubspot_client.create_associations.assert_any_call("contacts", "companies", [("1", "10", "279"), ("2", "10", "279")])
+
+@pytest.mark.asyncio
+async def test_association_graph_endpoint(mock_hubspot_client):
+    async def batch_read_associations(object_type, object_ids, to_object_type, use_cache=False):
+        return {"1": [{"toObjectId": 10, "associationTypes": []}]} if object_type == "contacts" else {"10": []}
+
+    async def batch_read_objects(object_type, object_ids, use_cache=False):
+        return {object_id: {"id": object_id} for object_id in object_ids}
+
+    mock_hubspot_client.batch_read_associations.side_effect = batch_read_associations
+    mock_hubspot_client.batch_read_objects.side_effect = batch_read_objects
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/associations/graph/contacts/1", params={"path": "contacts->companies->tickets"})
+        invalid = await client.get("/associations/graph/contacts/1", params={"path": "contacts"})
+
+    assert response.status_code == 200
+    graph = response.json()
+    assert graph["nodes"] == {"contacts": {"1": {"id": "1"}}, "companies": {"10": {"id": "10"}}, "tickets": {}}
+    assert graph["edges"][0]["to_id"] == "10"
+    assert invalid.status_code == 422
+
+@pytest.mark.asyncio
+async def test_webhook_association_change_invalidates_both_edge_lists(mock_hubspot_client, webhook_pipeline):
+    event = {"eventId": 300, "subscriptionType": "contact.associationChange", "associationType": "CONTACT_TO_COMPANY", "fromObjectId": 1, "toObjectId": 10}
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.post("/webhooks/hubspot", json=[event])
+
+    await webhook_pipeline.drain()
+    invalidated = [call.args for call in mock_hubspot_client.invalidate_cached_associations.call_args_list]
+    assert invalidated == [("contacts", "1", "companies"), ("companies", "10", "contacts")]
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_route_latency_and_stats(mock_hubspot_client, webhook_pipeline):
+    mock_hubspot_client.stats = MagicMock(return_value={"pool": {"active_connections": 1, "idle_connections": 4}})
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.get("/associations/contacts/42/companies")
+        response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'route="/associations/{object_type}/{object_id}/{to_object_type}",status_code="200"' in response.text
+    assert "/contacts/42" not in response.text
+    assert 'hubspot_connector_pool_connections{state="idle"} 4' in response.text
+
+@pytest.mark.asyncio
+async def test_requests_over_the_inbound_rate_limit_get_429(mock_hubspot_client):
+    app.state.rate_limiter = RateLimiter(MemoryRateLimitBackend(), parse_rate_limit("1/minute"))
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            first = await client.get("/associations/contacts/1/companies")
+            second = await client.get("/associations/contacts/1/companies")
+    finally:
+        app.state.rate_limiter = None
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert "Retry-After" in second.headers
+
+@pytest.mark.asyncio
+async def test_async_write_returns_202_and_job_status(mock_hubspot_client):
+    app.state.write_queue = WriteQueue(WriteQueueStore(":memory:"))
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            accepted = await client.post("/contacts", json={"email": "test@example.com"}, headers={"Prefer": "respond-async"})
+            job = await client.get(accepted.json()["status_url"])
+            missing = await client.get("/jobs/unknown")
+    finally:
+        app.state.write_queue = None
+
+    assert accepted.status_code == 202
+    assert accepted.headers["Location"] == f"/jobs/{accepted.json()['job_id']}"
+    assert job.json()["status"] == "queued"
+    assert missing.status_code == 404
+    mock_hubspot_client.upsert_object.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_queued_create_sends_the_same_properties_as_a_direct_one(mock_hubspot_client):
+    async def batch_write_records(object_type, operation, payloads):
+        return [{"id": "ticket_2"} for _ in payloads]
+    mock_hubspot_client.batch_write_records.side_effect = batch_write_records
+    ticket = {"hs_pipeline": "0", "hs_pipeline_stage": "1", "subject": "Printer on fire"}
+    app.state.write_queue = WriteQueue(WriteQueueStore(":memory:"))
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            await client.post("/tickets", json=ticket)
+            accepted = await client.post("/tickets", json=ticket, headers={"Prefer": "respond-async"})
+            await app.state.write_queue._process(await app.state.write_queue.store.claim(10), mock_hubspot_client)
+            job = await client.get(accepted.json()["status_url"])
+    finally:
+        app.state.write_queue = None
+
+    assert job.json()["status"] == "succeeded"
+    direct = mock_hubspot_client.create_object.call_args.args[1]
+    queued = mock_hubspot_client.batch_write_records.call_args.args[2][0]["properties"]
+    assert queued == direct and direct["hs_ticket_priority"] is None  # unset fields are sent by both
+
+@pytest.mark.asyncio
+async def test_ticket_retry_with_idempotency_key_does_not_create_a_duplicate(mock_hubspot_client):
+    mock_hubspot_client.create_object.return_value.id = "ticket_1"
+    ticket = {"hs_pipeline": "0", "hs_pipeline_stage": "1", "subject": "Printer on fire"}
+    app.state.idempotency_store = IdempotencyStore(MemoryIdempotencyBackend(max_entries=10, ttl=60))
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            first = await client.post("/tickets", json=ticket, headers={"Idempotency-Key": "retry-1"})
+            retry = await client.post("/tickets", json=ticket, headers={"Idempotency-Key": "retry-1"})
+            reused = await client.post("/tickets", json=dict(ticket, subject="Other"), headers={"Idempotency-Key": "retry-1"})
+            association = [await client.post("/associations", json={
+                "from_object_type": "tickets", "from_object_id": "ticket_1", "to_object_type": "contacts",
+                "to_object_id": "2", "association_type_id": "16",
+            }, headers={"Idempotency-Key": "assoc-1"}) for _ in range(2)]
+    finally:
+        app.state.idempotency_store = None
+
+    assert first.json() == retry.json()
+    assert first.json()["hubspot_ticket_id"] == "ticket_1"
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert reused.status_code == 422
+    mock_hubspot_client.create_object.assert_called_once()
+    assert [response.status_code for response in association] == [200, 200]
+    mock_hubspot_client.create_association.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_ticket_is_created_with_inline_associations(mock_hubspot_client):
+    mock_hubspot_client.create_object.return_value.id = "ticket_1"
+    mock_hubspot_client.find_object_id.return_value = "existing_company_id"
+    ticket = {
+        "hs_pipeline": "0", "hs_pipeline_stage": "1", "subject": "Printer on fire",
+        "associations": [{"to_object_type": "contacts", "to_object_id": "1"}, {"to_object_type": "companies", "to_object_id": "2"}],
+    }
+    company = {"name": "Example", "domain": "example.com", "associations": [{"to_object_type": "contacts", "to_object_id": "1"}]}
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        created = await client.post("/tickets", json=ticket)
+        updated = await client.post("/companies", json=company)
+
+    assert created.json()["action"] == "created"
+    args, kwargs = mock_hubspot_client.create_object.call_args
+    assert "associations" not in args[1]
+    assert kwargs["associations"] == [
+        {"to_object_type": "contacts", "to_object_id": "1", "association_type_id": None},
+        {"to_object_type": "companies", "to_object_id": "2", "association_type_id": None},
+    ]
+    mock_hubspot_client.create_association.assert_not_called()
+    # Updates take no inline associations, so they are linked after the write
+    assert updated.json()["action"] == "updated"
+    assert "associations" not in mock_hubspot_client.update_object.call_args.args[2]
+    mock_hubspot_client.associate_object.assert_called_once_with(
+        "companies", "mock_id", [{"to_object_type": "contacts", "to_object_id": "1", "association_type_id": None}]
+    )
@@ -0,0 +1,106 @@
+import pytest
+from unittest.mock import AsyncMock
+from object_cache import MemoryCacheBackend, ObjectCache
+
+@pytest.mark.asyncio
+async def test_hits_misses_and_lru_eviction():
+    cache = ObjectCache(MemoryCacheBackend(max_entries=2, ttl=60))
+
+    await cache.set("contacts", "1", {"id": "1"})
+    await cache.set("contacts", "2", {"id": "2"})
+    assert await cache.get("contacts", "1") == {"id": "1"}  # "1" becomes most recently used
+    await cache.set("contacts", "3", {"id": "3"})  # evicts "2"
+
+    assert await cache.get("contacts", "2") is None
+    assert await cache.get("contacts", "3") == {"id": "3"}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (2, 1, 1, 2)
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_ttl():
+    cache = ObjectCache(MemoryCacheBackend(max_entries=10, ttl=0))
+
+    await cache.set("contacts", "1", {"id": "1"})
+
+    assert await cache.get("contacts", "1") is None
+    assert cache.stats()["expirations"] == 1
+
+@pytest.mark.asyncio
+async def test_invalidate_removes_entry():
+    cache = ObjectCache(MemoryCacheBackend(max_entries=10, ttl=60))
+    await cache.set("companies", "7", {"id": "7"})
+
+    await cache.invalidate("companies", "7")
+
+    assert await cache.get("companies", "7") is None
+
+@pytest.mark.asyncio
+async def test_backend_errors_are_treated_as_misses():
+    backend = AsyncMock()
+    backend.get.side_effect = ConnectionError("redis down")
+    backend.stats = lambda: {"backend": "redis"}
+    cache = ObjectCache(backend)
+
+    assert await cache.get("contacts", "1") is None
+    assert cache.stats()["errors"] == 1
+
+@pytest.mark.asyncio
+async def test_association_edges_are_cached_separately_from_objects():
+    cache = ObjectCache(MemoryCacheBackend(max_entries=10, ttl=60))
+
+    await cache.set("contacts", "1", {"id": "1"})
+    await cache.set_associations("contacts", "1", "companies", [{"toObjectId": 10}])
+
+    assert await cache.get_associations("contacts", "1", "companies") == [{"toObjectId": 10}]
+    assert await cache.get_associations("contacts", "1", "tickets") is None
+    await cache.invalidate_associations("contacts", "1", "companies")
+    assert await cache.get_associations("contacts", "1", "companies") is None
+    assert await cache.get("contacts", "1") == {"id": "1"}
+    assert (cache.stats()["association_hits"], cache.stats()["association_misses"]) == (1, 2)
+
+@pytest.mark.asyncio
+async def test_property_selections_are_served_from_wider_entries():
+    cache = ObjectCache(MemoryCacheBackend(max_entries=10, ttl=60))
+    version = {"id": "1", "createdAt": "2023-01-01T00:00:00Z", "updatedAt": "2023-01-02T00:00:00Z", "archived": False}
+    await cache.set("contacts", "1", dict(version, properties={"email": "a@example.com", "firstname": "Ada"}))
+
+    # A subset of the full object's properties
+    assert (await cache.get_projection("contacts", "1", ["email"]))["properties"] == {"email": "a@example.com"}
+    assert await cache.get_projection("contacts", "1", ["email", "tier"]) is None
+
+    # Values from selected reads of the same version accumulate
+    await cache.merge_properties("contacts", "1", dict(version, properties={"tier": "gold"}))
+    await cache.merge_properties("contacts", "1", dict(version, properties={"region": "EU"}, associations={"companies": {}}))
+    projected = await cache.get_projection("contacts", "1", ["tier", "region"])
+    assert projected == dict(version, properties={"tier": "gold", "region": "EU"})
+
+    # A newer version replaces the collected values instead of mixing with them
+    await cache.merge_properties("contacts", "1", dict(version, updatedAt="2023-01-03T00:00:00Z", properties={"tier": "silver"}))
+    assert await cache.get_projection("contacts", "1", ["region"]) is None
+    assert (await cache.get_projection("contacts", "1", ["tier"]))["properties"] == {"tier": "silver"}
+
+    await cache.invalidate("contacts", "1")
+    assert await cache.get_projection("contacts", "1", ["tier"]) is None
+    assert cache.stats()["invalidations"] == 1
+
+@pytest.mark.asyncio
+async def test_property_selections_skip_values_older_than_the_full_object():
+    cache = ObjectCache(MemoryCacheBackend(max_entries=10, ttl=60))
+    await cache.merge_properties("contacts", "1", {"id": "1", "updatedAt": "2023-01-02T00:00:00Z", "properties": {"tier": "gold", "region": "EU"}})
+    await cache.set("contacts", "1", {"id": "1", "updatedAt": "2023-01-03T00:00:00Z", "properties": {"tier": "silver"}})
+
+    assert (await cache.get_projection("contacts", "1", ["tier"]))["properties"] == {"tier": "silver"}
+    assert await cache.get_projection("contacts", "1", ["region"]) is None  # only known for the older version
+
+@pytest.mark.asyncio
+async def test_known_properties_come_from_the_latest_version():
+    cache = ObjectCache(MemoryCacheBackend(max_entries=10, ttl=60))
+    assert await cache.get_properties("contacts", "1") == {}
+
+    await cache.set("contacts", "1", {"id": "1", "properties": {"email": "a@example.com", "tier": "gold"}, "updatedAt": "2023-01-01T00:00:00Z"})
+    await cache.merge_properties("contacts", "1", {"id": "1", "properties": {"region": "EU"}, "updatedAt": "2023-01-01T00:00:00Z"})
+    assert await cache.get_properties("contacts", "1") == {"email": "a@example.com", "tier": "gold", "region": "EU"}
+
+    # Values from an older version are not mixed in
+    await cache.merge_properties("contacts", "1", {"id": "1", "properties": {"tier": "silver"}, "updatedAt": "2023-01-02T00:00:00Z"})
+    assert await cache.get_properties("contacts", "1") == {"tier": "silver"}
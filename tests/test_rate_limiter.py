@@ -0,0 +1,173 @@
+import asyncio
+import math
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from unittest.mock import AsyncMock
+from rate_limiter import (
+    _REDIS_REFUND_SCRIPT,
+    LeasedRateLimitBackend,
+    MemoryRateLimitBackend,
+    RateLimiter,
+    RedisRateLimitBackend,
+    parse_limit_overrides,
+    parse_rate_limit,
+)
+
+class _FakeRedis:
+    """One shared bucket per key that never refills, so grants are easy to count."""
+
+    def __init__(self):
+        self.tokens = {}
+
+    async def eval(self, script, numkeys, key, rate, burst, requested):
+        tokens = self.tokens.get(key, burst)
+        if script == _REDIS_REFUND_SCRIPT:
+            self.tokens[key] = min(burst, tokens + requested)
+            return 1
+        granted = min(requested, math.floor(tokens))
+        self.tokens[key] = tokens - granted
+        return [granted, "0" if granted else "60"]
+
+class _Route:
+    def __init__(self, path):
+        self.path = path
+
+def _request(path="/contacts", method="GET", api_key=None, host="10.0.0.1", forwarded_for=None):
+    headers = [(b"x-api-key", api_key.encode())] if api_key else []
+    if forwarded_for:
+        headers.append((b"x-forwarded-for", forwarded_for.encode()))
+    return Request({"type": "http", "method": method, "path": path, "headers": headers, "client": (host, 1234), "route": _Route(path)})
+
+def test_parse_rate_limits():
+    assert parse_rate_limit("120/minute") == (2.0, 120.0)
+    assert parse_rate_limit("10/seconds") == (10.0, 10.0)
+    assert parse_rate_limit("none") is None
+    assert parse_limit_overrides("POST /contacts=5/second, /stats=none") == {"POST /contacts": (5.0, 5.0), "/stats": None}
+    with pytest.raises(ValueError):
+        parse_rate_limit("lots")
+
+@pytest.mark.asyncio
+async def test_memory_limiter_rejects_over_limit_per_client():
+    limiter = RateLimiter(MemoryRateLimitBackend(), parse_rate_limit("2/minute"))
+
+    await limiter.check(_request())
+    await limiter.check(_request())
+    with pytest.raises(HTTPException) as exc_info:
+        await limiter.check(_request())
+    await limiter.check(_request(host="10.0.0.2"))  # other clients have their own bucket
+
+    assert exc_info.value.status_code == 429
+    assert int(exc_info.value.headers["Retry-After"]) >= 1
+    assert (limiter.stats()["allowed"], limiter.stats()["limited"]) == (3, 1)
+
+@pytest.mark.asyncio
+async def test_route_and_api_key_overrides():
+    limiter = RateLimiter(
+        MemoryRateLimitBackend(),
+        parse_rate_limit("100/minute"),
+        route_limits=parse_limit_overrides("POST /contacts/batch=1/minute,/metrics=none"),
+        key_limits=parse_limit_overrides("partner=1/minute"),
+    )
+
+    await limiter.check(_request("/contacts/batch", "POST"))
+    with pytest.raises(HTTPException):
+        await limiter.check(_request("/contacts/batch", "POST"))
+    await limiter.check(_request("/contacts/batch", "GET"))  # the override names POST only
+    await limiter.check(_request(api_key="partner"))
+    with pytest.raises(HTTPException):
+        await limiter.check(_request(api_key="partner"))
+    for _ in range(5):
+        await limiter.check(_request("/metrics", api_key="partner"))  # exempt route
+
+@pytest.mark.asyncio
+async def test_unknown_api_keys_share_the_address_bucket():
+    backend = MemoryRateLimitBackend()
+    limiter = RateLimiter(backend, parse_rate_limit("2/minute"), key_limits=parse_limit_overrides("partner=100/minute"))
+
+    await limiter.check(_request(api_key="random-1"))
+    await limiter.check(_request(api_key="random-2"))
+    with pytest.raises(HTTPException):
+        await limiter.check(_request(api_key="random-3"))
+    await limiter.check(_request(api_key="partner"))
+
+    assert backend.stats()["keys"] == 2
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("trust_forwarded_for, buckets", [(False, 1), (True, 2)])
+async def test_forwarded_for_keys_clients_behind_a_proxy(trust_forwarded_for, buckets):
+    backend = MemoryRateLimitBackend()
+    limiter = RateLimiter(backend, parse_rate_limit("1/minute"), trust_forwarded_for=trust_forwarded_for)
+
+    await limiter.check(_request(host="10.0.0.9", forwarded_for="203.0.113.1, 10.0.0.8"))
+    if trust_forwarded_for:
+        await limiter.check(_request(host="10.0.0.9", forwarded_for="203.0.113.2"))
+    else:
+        with pytest.raises(HTTPException):  # the header is ignored; both share the proxy's bucket
+            await limiter.check(_request(host="10.0.0.9", forwarded_for="203.0.113.2"))
+
+    assert backend.stats()["keys"] == buckets
+
+@pytest.mark.asyncio
+async def test_route_rejection_does_not_spend_the_client_token():
+    limiter = RateLimiter(
+        MemoryRateLimitBackend(),
+        parse_rate_limit("2/minute"),
+        route_limits=parse_limit_overrides("POST /contacts/batch=1/minute"),
+    )
+
+    await limiter.check(_request("/contacts/batch", "POST"))
+    with pytest.raises(HTTPException):
+        await limiter.check(_request("/contacts/batch", "POST"))
+    await limiter.check(_request())  # the rejected request left the second overall token
+
+@pytest.mark.asyncio
+async def test_hybrid_backend_spends_leased_tokens_locally():
+    redis = AsyncMock()
+    redis.eval.side_effect = [[5, "0"], [0, "2.5"]]
+    backend = LeasedRateLimitBackend(RedisRateLimitBackend("", redis=redis), lease_size=5)
+
+    waits = await asyncio.gather(*(backend.acquire("client", 1.0, 100.0) for _ in range(5)))
+    rejected = await backend.acquire("client", 1.0, 100.0)
+
+    assert waits == [0.0] * 5
+    assert rejected == 2.5
+    assert redis.eval.await_count == 2
+    assert redis.eval.await_args_list[0].args[-1] == 5  # one lease of five tokens for five requests
+
+@pytest.mark.asyncio
+async def test_backend_failure_lets_requests_through():
+    redis = AsyncMock()
+    redis.eval.side_effect = ConnectionError("redis down")
+    limiter = RateLimiter(RedisRateLimitBackend("", redis=redis), parse_rate_limit("1/minute"))
+
+    await limiter.check(_request())
+    await limiter.check(_request())
+
+    assert limiter.stats()["errors"] == 2
+
+@pytest.mark.asyncio
+async def test_hybrid_backend_leases_again_when_waiters_outnumber_the_lease():
+    redis = AsyncMock()
+    redis.eval.side_effect = [[2, "0"], [2, "0"], [1, "0"]]
+    backend = LeasedRateLimitBackend(RedisRateLimitBackend("", redis=redis), lease_size=2)
+
+    waits = await asyncio.gather(*(backend.acquire("client", 1.0, 100.0) for _ in range(5)))
+
+    assert waits == [0.0] * 5
+    assert redis.eval.await_count == 3
+
+@pytest.mark.asyncio
+async def test_hybrid_backends_credit_unused_lease_tokens_back(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr("rate_limiter.time.monotonic", lambda: clock[0])
+    redis = _FakeRedis()
+    workers = [LeasedRateLimitBackend(RedisRateLimitBackend("", redis=redis), lease_size=4, lease_ttl=1.0) for _ in range(2)]
+
+    waits = []
+    for i in range(20):
+        waits.append(await workers[i % 2].acquire("client", 0.0, 10.0))
+        clock[0] += 1.0  # each lease expires after a single request
+
+    assert sum(wait == 0 for wait in waits) == 10  # the whole burst, not a quarter of it
+    assert workers[0].stats()["refunded"] + workers[1].stats()["refunded"] > 0
@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from httpx import AsyncClient, MockTransport, Response
+from hubspot_client import HubSpotClient
+from request_hedger import RequestHedger
+from upstream_scheduler import UpstreamScheduler
+
+def test_hedge_delay_follows_latency_percentile():
+    hedger = RequestHedger(percentile=90, min_delay=0.01, min_samples=50)
+    for _ in range(49):
+        hedger.observe("crm", 0.005)
+    assert hedger.delay("crm") is None  # not enough samples yet
+
+    # 80 fast and 20 slow calls: the 90th percentile is a slow one
+    for n in range(51):
+        hedger.observe("crm", 0.005 if n < 31 else 0.1)
+    assert hedger.delay("crm") == 0.1
+    assert hedger.delay("search") is None
+
+@pytest.mark.asyncio
+async def test_slow_read_is_hedged_and_the_faster_copy_wins():
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(1)  # the first copy stalls
+        return Response(200, json={"id": "1", "properties": {}})
+
+    hedger = RequestHedger(min_delay=0.02, min_samples=1)
+    for _ in range(25):
+        hedger.observe("crm", 0.001)
+    scheduler = UpstreamScheduler(lanes={"crm": (1000.0, 1000.0)})
+    client = HubSpotClient(http_client=AsyncClient(transport=MockTransport(handler)), object_cache=None, scheduler=scheduler, hedger=hedger, single_flight=False)
+
+    started = asyncio.get_running_loop().time()
+    await client._make_request("GET", client._get_object_url("contacts") + "/1")
+
+    assert asyncio.get_running_loop().time() - started < 0.5
+    assert calls == 2
+    assert hedger.stats()["hedges_sent"] == 1
+    assert hedger.stats()["win_ratio"] == 1.0
+    # Writes are never hedged
+    await client._make_request("PATCH", client._get_object_url("contacts") + "/1", json={"properties": {}})
+    assert calls == 3
@@ -0,0 +1,77 @@
+import pytest
+from httpx import AsyncClient, MockTransport, Response
+from hubspot_client import HubSpotClient
+from telemetry import UPSTREAM_REQUEST_DURATION, UPSTREAM_RETRIES, Histogram, render_metrics, upstream_operation
+from upstream_scheduler import UpstreamScheduler
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5.0, "/a")
+
+    lines = histogram.render()
+
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+    assert "# TYPE latency_seconds histogram" in lines
+
+@pytest.mark.parametrize("method, url, expected", [
+    ("GET", "https://api.hubapi.com/crm/v3/objects/contacts/123?properties=email", ("contacts", "read")),
+    ("PATCH", "https://api.hubapi.com/crm/v3/objects/contacts/123", ("contacts", "update")),
+    ("POST", "https://api.hubapi.com/crm/v3/objects/companies", ("companies", "create")),
+    ("POST", "https://api.hubapi.com/crm/v3/objects/contacts/search", ("contacts", "search")),
+    ("POST", "https://api.hubapi.com/crm/v3/objects/tickets/batch/upsert", ("tickets", "batch_upsert")),
+    ("GET", "https://api.hubapi.com/crm/v4/objects/contacts/1/associations/companies", ("contacts", "associations_read")),
+    ("POST", "https://api.hubapi.com/crm/v4/associations/contacts/companies/batch/read", ("contacts", "associations_batch_read")),
+    ("GET", "https://api.hubapi.com/crm/v4/associations/contacts/companies/labels", ("contacts", "associations_labels")),
+    # Caller-supplied object types and unexpected path segments are bucketed, not labels of their own
+    ("POST", "https://api.hubapi.com/crm/v4/associations/made-up-type/companies/batch/create", ("other", "associations_batch_create")),
+    ("GET", "https://api.hubapi.com/crm/v3/objects/2-12345/1", ("other", "read")),
+    ("POST", "https://api.hubapi.com/crm/v3/objects/contacts/batch/anything", ("contacts", "batch_other")),
+])
+def test_upstream_operation_labels(method, url, expected):
+    assert upstream_operation(method, url) == expected
+
+def test_render_metrics_exposes_runtime_stats():
+    stats = {
+        "pool": {"active_connections": 2, "idle_connections": 3, "queued_requests": 0},
+        "scheduler": {"daily_remaining": None, "lanes": {"search": {"queued": 4, "throttled": 1}}},
+        "object_cache": {"hits": 9, "misses": 1, "hit_ratio": 0.9},
+        "webhooks": {"queued_events": 7},
+        "circuit_breakers": {"crm": {"state": "open", "rejected": 3}, "stale_reads": 2},
+        "hedging": {"hedges_sent": 4, "hedge_wins": 1, "win_ratio": 0.25},
+        "write_suppression": {"checked": 10, "skipped": 6, "trimmed": 2, "properties_skipped": 20},
+        "idempotency": {"stored": 5, "replayed": 3, "waited": 1, "conflicts": 0, "mismatches": 0},
+    }
+
+    text = render_metrics(stats)
+
+    assert 'hubspot_connector_pool_connections{state="active"} 2' in text
+    assert 'hubspot_connector_scheduler_queued_requests{lane="search"} 4' in text
+    assert 'hubspot_connector_upstream_throttled_total{lane="search"} 1' in text
+    assert 'hubspot_connector_cache_hit_ratio{kind="object"} 0.9' in text
+    assert "hubspot_connector_webhook_queued_events 7" in text
+    assert 'hubspot_connector_circuit_breaker_state{lane="crm"} 2' in text
+    assert "hubspot_connector_stale_reads_total 2" in text
+    assert "hubspot_connector_hedge_win_ratio 0.25" in text
+    assert 'hubspot_connector_write_suppression_writes_total{outcome="skipped"} 6' in text
+    assert 'hubspot_connector_idempotency_requests_total{outcome="replayed"} 3' in text
+    assert "daily_limit_remaining" not in text  # unknown values are left out rather than reported as 0
+
+@pytest.mark.asyncio
+async def test_upstream_calls_record_latency_and_retries():
+    responses = iter([Response(503), Response(200, json={"id": "77", "properties": {}})])
+    transport = MockTransport(lambda request: next(responses))
+    scheduler = UpstreamScheduler(lanes={"crm": (100.0, 100.0), "search": (100.0, 100.0), "batch": (100.0, 100.0)}, retry_base_delay=0.001)
+    client = HubSpotClient(http_client=AsyncClient(transport=transport), scheduler=scheduler, single_flight=False)
+    retries = UPSTREAM_RETRIES.value("deals", "update", "503")
+    successes = UPSTREAM_REQUEST_DURATION.count("deals", "update", "200")
+
+    await client._make_request("PATCH", client._get_object_url("deals") + "/77", json={"properties": {}})
+    await client.aclose()
+
+    assert UPSTREAM_RETRIES.value("deals", "update", "503") == retries + 1
+    assert UPSTREAM_REQUEST_DURATION.count("deals", "update", "200") == successes + 1
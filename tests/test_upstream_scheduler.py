@@ -0,0 +1,72 @@
+import asyncio
+import time
+import pytest
+from fastapi import HTTPException
+from upstream_scheduler import PRIORITY_HIGH, PRIORITY_LOW, UpstreamScheduler
+
+def _scheduler(rate=100.0, burst=1.0, **kwargs):
+    return UpstreamScheduler(lanes={"crm": (rate, burst), "search": (rate, burst)}, **kwargs)
+
+def test_lane_for_classifies_endpoints():
+    assert UpstreamScheduler.lane_for("POST", "https://api.hubapi.com/crm/v3/objects/contacts/search") == "search"
+    assert UpstreamScheduler.lane_for("POST", "https://api.hubapi.com/crm/v3/objects/contacts/batch/create") == "batch"
+    assert UpstreamScheduler.lane_for("GET", "https://api.hubapi.com/crm/v3/objects/contacts/1") == "crm"
+
+@pytest.mark.asyncio
+async def test_waiters_are_served_by_priority():
+    scheduler = _scheduler(rate=50.0, burst=1.0)
+    await scheduler.acquire("crm")  # drain the only burst token
+    order = []
+
+    async def request(name, priority):
+        await scheduler.acquire("crm", priority)
+        order.append(name)
+
+    await asyncio.gather(request("low", PRIORITY_LOW), request("high", PRIORITY_HIGH))
+
+    assert order == ["high", "low"]
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_lane_and_halves_rate():
+    scheduler = _scheduler(rate=100.0, burst=10.0)
+
+    retry_after = scheduler.observe("crm", 429, {"Retry-After": "0.05"})
+
+    assert retry_after == 0.05
+    assert scheduler.stats()["lanes"]["crm"]["rate_per_second"] == 50.0
+    started = time.monotonic()
+    await scheduler.acquire("crm")
+    assert time.monotonic() - started >= 0.04
+
+def test_large_retry_after_pauses_lane_for_at_most_the_retry_cap():
+    scheduler = _scheduler(retry_max_delay=2.0)
+
+    assert scheduler.observe("crm", 429, {"Retry-After": "86400"}) == 86400
+    assert scheduler.stats()["lanes"]["crm"]["paused_seconds"] <= 2.0
+
+@pytest.mark.asyncio
+async def test_exhausted_window_header_pauses_lane():
+    scheduler = _scheduler(rate=100.0, burst=10.0)
+
+    scheduler.observe("crm", 200, {"X-HubSpot-RateLimit-Remaining": "0", "X-HubSpot-RateLimit-Interval-Milliseconds": "50"})
+
+    assert scheduler.stats()["lanes"]["crm"]["paused_seconds"] > 0
+
+@pytest.mark.asyncio
+async def test_full_queue_fails_fast():
+    scheduler = _scheduler(rate=0.001, burst=1.0, max_queue=1)
+    await scheduler.acquire("crm")
+    waiter = asyncio.ensure_future(scheduler.acquire("crm"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await scheduler.acquire("crm")
+    assert exc_info.value.status_code == 503
+    waiter.cancel()
+
+def test_retry_delay_uses_jittered_backoff_or_retry_after():
+    scheduler = _scheduler(retry_base_delay=1.0, retry_max_delay=4.0)
+
+    assert scheduler.retry_delay(0, retry_after=2.5) == 2.5
+    assert scheduler.retry_delay(0, retry_after=3600) == 4.0
+    assert all(0 <= scheduler.retry_delay(attempt) <= 4.0 for attempt in range(10))
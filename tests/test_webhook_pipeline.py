@@ -0,0 +1,122 @@
+import asyncio
+import pytest
+from webhook_pipeline import RefreshCoalescer, WebhookPipeline
+
+@pytest.mark.asyncio
+async def test_duplicate_event_ids_are_processed_once():
+    handled = []
+
+    async def handler(event):
+        handled.append(event["eventId"])
+
+    pipeline = WebhookPipeline(workers=2)
+    pipeline.register("propertyChange", handler)
+    await pipeline.start()
+
+    pipeline.enqueue([{"eventId": 1, "subscriptionType": "contact.propertyChange"}, {"eventId": 2, "subscriptionType": "contact.propertyChange"}])
+    pipeline.enqueue([{"eventId": 1, "subscriptionType": "contact.propertyChange"}])
+    await pipeline.drain()
+    await pipeline.stop()
+
+    assert sorted(handled) == [1, 2]
+    assert pipeline.stats()["duplicates_dropped"] == 1
+
+@pytest.mark.asyncio
+async def test_handlers_match_subscription_type_kind_and_wildcard():
+    calls = []
+
+    def recorder(name):
+        async def handler(event):
+            calls.append(name)
+        return handler
+
+    pipeline = WebhookPipeline(workers=1)
+    pipeline.register("contact.deletion", recorder("exact"))
+    pipeline.register("deletion", recorder("kind"))
+    pipeline.register("*", recorder("any"))
+    pipeline.register("company.deletion", recorder("other"))
+
+    await pipeline.process([{"eventId": 1, "subscriptionType": "contact.deletion"}])
+
+    assert calls == ["exact", "kind", "any"]
+
+@pytest.mark.asyncio
+async def test_failing_handler_does_not_stop_others():
+    calls = []
+
+    async def failing(event):
+        raise RuntimeError("boom")
+
+    async def working(event):
+        calls.append(event["eventId"])
+
+    pipeline = WebhookPipeline(workers=1)
+    pipeline.register("*", failing)
+    pipeline.register("*", working)
+
+    await pipeline.process([{"eventId": 7, "subscriptionType": "contact.creation"}])
+
+    assert calls == [7]
+    assert pipeline.stats()["handler_errors"] == 1
+
+@pytest.mark.asyncio
+async def test_stop_drains_queue_and_rejects_new_batches():
+    processed = []
+
+    async def slow(event):
+        await asyncio.sleep(0.01)
+        processed.append(event["eventId"])
+
+    pipeline = WebhookPipeline(workers=1)
+    pipeline.register("*", slow)
+    await pipeline.start()
+    for event_id in range(3):
+        pipeline.enqueue([{"eventId": event_id}])
+
+    await pipeline.stop(drain=True, timeout=5)
+
+    assert processed == [0, 1, 2]
+    assert pipeline.enqueue([{"eventId": 9}]) is False
+
+@pytest.mark.asyncio
+async def test_coalescer_refreshes_each_object_once_per_window():
+    calls = []
+    delivered = []
+
+    async def refresh(object_type, object_ids):
+        calls.append((object_type, object_ids))
+        return {object_id: {"id": object_id} for object_id in object_ids}
+
+    async def listener(object_type, objects):
+        delivered.append((object_type, sorted(objects)))
+
+    coalescer = RefreshCoalescer(refresh, window=0.01)
+    coalescer.subscribe(listener)
+    for object_id in ["1", "2", "1", "1"]:
+        coalescer.add("contacts", object_id)
+    coalescer.add("companies", "9")
+    await asyncio.sleep(0.05)
+    await coalescer.flush()
+
+    assert sorted(calls) == [("companies", ["9"]), ("contacts", ["1", "2"])]
+    assert sorted(delivered) == [("companies", ["9"]), ("contacts", ["1", "2"])]
+    assert coalescer.stats()["ids_coalesced"] == 2
+
+@pytest.mark.asyncio
+async def test_coalescer_sends_full_batches_without_waiting_and_skips_discarded_ids():
+    calls = []
+
+    async def refresh(object_type, object_ids):
+        calls.append(list(object_ids))
+        return {}
+
+    coalescer = RefreshCoalescer(refresh, window=60, max_batch_size=3)
+    for object_id in ["1", "2", "3", "4", "5"]:
+        coalescer.add("tickets", object_id)
+    coalescer.discard("tickets", "5")
+    await asyncio.sleep(0)
+
+    assert calls == [["1", "2", "3"]]
+    await coalescer.flush()
+    assert calls == [["1", "2", "3"], ["4"]]
+    assert coalescer.stats()["ids_discarded"] == 1
@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from write_batcher import WriteBatcher
+
+def _echo_results(inputs):
+    return {"status": "COMPLETE", "results": [
+        {"id": item.get("id", f"new-{item['objectWriteTraceId']}"), "properties": item["properties"], "objectWriteTraceId": item["objectWriteTraceId"]}
+        for item in inputs
+    ]}
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_are_sent_as_one_batch():
+    calls = []
+
+    async def send_batch(object_type, operation, inputs):
+        calls.append((object_type, operation, len(inputs)))
+        return _echo_results(inputs)
+
+    batcher = WriteBatcher(send_batch, window=0.01, max_batch_size=100)
+    results = await asyncio.gather(*(
+        batcher.submit("contacts", "create", {"properties": {"email": f"user{i}@example.com"}})
+        for i in range(10)
+    ))
+
+    assert calls == [("contacts", "create", 10)]
+    assert [result["properties"]["email"] for result in results] == [f"user{i}@example.com" for i in range(10)]
+
+@pytest.mark.asyncio
+async def test_batch_flushes_at_max_size():
+    calls = []
+
+    async def send_batch(object_type, operation, inputs):
+        calls.append(len(inputs))
+        return _echo_results(inputs)
+
+    batcher = WriteBatcher(send_batch, window=10, max_batch_size=3)
+    await asyncio.gather(*(batcher.submit("contacts", "create", {"properties": {}}) for _ in range(6)))
+
+    assert calls == [3, 3]
+
+@pytest.mark.asyncio
+async def test_per_item_error_reaches_only_its_caller():
+    async def send_batch(object_type, operation, inputs):
+        return {
+            "status": "COMPLETE",
+            "results": [{"id": inputs[0]["id"], "properties": {}}],
+            "errors": [{"category": "OBJECT_NOT_FOUND", "message": "Not found", "context": {"ids": [inputs[1]["id"]]}}],
+        }
+
+    batcher = WriteBatcher(send_batch, window=0.01)
+    ok, missing = await asyncio.gather(
+        batcher.submit("contacts", "update", {"id": "1", "properties": {}}),
+        batcher.submit("contacts", "update", {"id": "2", "properties": {}}),
+        return_exceptions=True,
+    )
+
+    assert ok["id"] == "1"
+    assert isinstance(missing, HTTPException) and missing.status_code == 404
+
+@pytest.mark.asyncio
+async def test_rejected_batch_is_retried_per_record():
+    async def send_batch(object_type, operation, inputs):
+        if len(inputs) > 1 or inputs[0]["properties"].get("email") == "invalid":
+            raise HTTPException(status_code=400, detail="Property values were not valid")
+        return _echo_results(inputs)
+
+    batcher = WriteBatcher(send_batch, window=0.01)
+    valid, invalid = await asyncio.gather(
+        batcher.submit("contacts", "create", {"properties": {"email": "valid@example.com"}}),
+        batcher.submit("contacts", "create", {"properties": {"email": "invalid"}}),
+        return_exceptions=True,
+    )
+
+    assert valid["properties"]["email"] == "valid@example.com"
+    assert isinstance(invalid, HTTPException) and invalid.status_code == 400
+
+@pytest.mark.asyncio
+async def test_upsert_results_are_matched_on_the_id_property_not_position():
+    async def send_batch(object_type, operation, inputs):
+        # No trace ids, reversed order, and one record missing from the response
+        return {"status": "COMPLETE", "results": [
+            {"id": "2", "new": True, "properties": {"email": "b@example.com"}},
+            {"id": "1", "new": False, "properties": {"email": "a@example.com"}},
+        ]}
+
+    batcher = WriteBatcher(send_batch, window=0.01, max_batch_size=100)
+    results = await asyncio.gather(*(
+        batcher.submit("contacts", "upsert", {"idProperty": "email", "id": email, "properties": {}})
+        for email in ("A@example.com", "b@example.com", "c@example.com")
+    ), return_exceptions=True)
+
+    assert [result["id"] for result in results[:2]] == ["1", "2"]
+    assert isinstance(results[2], HTTPException) and results[2].status_code == 502
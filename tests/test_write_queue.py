@@ -0,0 +1,142 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from write_queue import JOB_FAILED, JOB_QUEUED, JOB_SUCCEEDED, WriteQueue, WriteQueueStore, register_writer
+
+class RecordingWriter:
+    """Collects the batches it is given and answers from ``outcomes`` (email -> line fields)."""
+
+    def __init__(self, outcomes=None):
+        self.batches = []
+        self.outcomes = outcomes or {}
+
+    async def __call__(self, records, hubspot_client):
+        self.batches.append([payload for _, payload in records])
+        lines = []
+        for index, payload in records:
+            outcome = self.outcomes.get(payload["email"], {"id": f"id-{payload['email']}", "action": "created", "error": None})
+            lines.append(dict(outcome, index=index))
+        return lines
+
+def build_queue(**kwargs):
+    return WriteQueue(WriteQueueStore(":memory:"), retry_base_delay=0, **kwargs)
+
+@pytest.mark.asyncio
+async def test_jobs_of_one_key_are_written_in_order_one_per_batch():
+    writer = RecordingWriter()
+    register_writer("queue_test_contacts", writer)
+    queue = build_queue()
+    first = await queue.enqueue("queue_test_contacts", {"email": "a@example.com", "firstname": "One"}, record_key="A@example.com")
+    second = await queue.enqueue("queue_test_contacts", {"email": "a@example.com", "firstname": "Two"}, record_key="a@example.com")
+    other = await queue.enqueue("queue_test_contacts", {"email": "b@example.com"}, record_key="b@example.com")
+
+    await queue._process(await queue.store.claim(10), hubspot_client=None)
+    await queue._process(await queue.store.claim(10), hubspot_client=None)
+
+    assert [[payload.get("firstname") for payload in batch] for batch in writer.batches] == [["One", None], ["Two"]]
+    for job_id in (first, second, other):
+        job = await queue.get_job(job_id)
+        assert job["status"] == JOB_SUCCEEDED
+    assert (await queue.get_job(other))["result"] == {"id": "id-b@example.com", "action": "created"}
+
+@pytest.mark.asyncio
+async def test_throttled_writes_are_retried_and_client_errors_fail():
+    writer = RecordingWriter({
+        "slow@example.com": {"id": None, "action": None, "error": "HubSpot API error: 429", "_status": 429, "_operation": "upsert"},
+        "bad@example.com": {"id": None, "action": None, "error": "HubSpot API error: 400", "_status": 400, "_operation": "upsert"},
+    })
+    register_writer("queue_test_retries", writer)
+    queue = build_queue(max_attempts=2)
+    slow = await queue.enqueue("queue_test_retries", {"email": "slow@example.com"}, record_key="slow@example.com")
+    bad = await queue.enqueue("queue_test_retries", {"email": "bad@example.com"}, record_key="bad@example.com")
+
+    await queue._process(await queue.store.claim(10), hubspot_client=None)
+    assert (await queue.get_job(slow))["status"] == JOB_QUEUED
+    assert (await queue.get_job(bad))["status"] == JOB_FAILED
+
+    await queue._process(await queue.store.claim(10), hubspot_client=None)
+    job = await queue.get_job(slow)
+    assert (job["status"], job["attempts"]) == (JOB_FAILED, 2)
+    assert queue.stats()["jobs_retried"] == 1
+
+@pytest.mark.asyncio
+async def test_enqueue_rejects_when_queue_is_full():
+    queue = build_queue(max_depth=1)
+    await queue.enqueue("contacts", {"email": "a@example.com"})
+
+    with pytest.raises(HTTPException) as exc_info:
+        await queue.enqueue("contacts", {"email": "b@example.com"})
+
+    assert exc_info.value.status_code == 503
+    assert queue.stats()["jobs_rejected"] == 1
+
+@pytest.mark.asyncio
+async def test_running_jobs_are_only_taken_over_after_their_lease_expires(tmp_path):
+    path = str(tmp_path / "queue.sqlite3")
+    store = WriteQueueStore(path, lease=60)
+    queue = WriteQueue(store)
+    job_id = await queue.enqueue("contacts", {"email": "a@example.com"})
+    assert len(await store.claim(10)) == 1
+
+    # Another process sharing the file (or this one restarted) leaves a live lease alone
+    other = WriteQueueStore(path, lease=60)
+    assert await other.claim(10) == []
+
+    store._db.execute("UPDATE jobs SET lease_until = 0")  # the first worker died without renewing
+    store._db.commit()
+    claimed = await other.claim(10)
+    assert [(job["job_id"], job["reclaimed"]) for job in claimed] == [(job_id, True)]
+
+    # The late first worker can no longer overwrite the outcome of a job it lost
+    await store.finish([(claimed[0]["seq"], JOB_FAILED, None, "late", 0.0)])
+    await other.finish([(claimed[0]["seq"], JOB_SUCCEEDED, {"id": "1", "action": "created"}, None, 0.0)])
+    assert (await other.get(job_id))["status"] == JOB_SUCCEEDED
+    store.close()
+    other.close()
+
+@pytest.mark.asyncio
+async def test_queue_depth_limit_is_shared_between_stores(tmp_path):
+    path = str(tmp_path / "queue.sqlite3")
+    first, second = WriteQueueStore(path), WriteQueueStore(path)
+
+    assert await first.enqueue("job-1", "contacts", None, {}, max_depth=1) is True
+    assert await second.enqueue("job-2", "contacts", None, {}, max_depth=1) is False
+    first.close()
+    second.close()
+
+@pytest.mark.asyncio
+async def test_worker_survives_a_failing_batch():
+    class FailingStore(WriteQueueStore):
+        async def finish(self, updates):
+            raise RuntimeError("disk full")
+
+    register_writer("queue_test_failing", RecordingWriter())
+    queue = WriteQueue(FailingStore(":memory:"), workers=1, poll_interval=0.01)
+    await queue.start(hubspot_client=None)
+    await queue.enqueue("queue_test_failing", {"email": "a@example.com"})
+    for _ in range(100):
+        if queue.stats()["batches_written"]:
+            break
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.02)
+
+    assert queue.stats()["batches_written"] == 1
+    assert not queue._tasks[0].done()
+    await queue.stop(timeout=1)
+
+@pytest.mark.asyncio
+async def test_workers_drain_the_queue():
+    writer = RecordingWriter()
+    register_writer("queue_test_workers", writer)
+    queue = build_queue(workers=2, poll_interval=0.01)
+    await queue.start(hubspot_client=None)
+    job_ids = [await queue.enqueue("queue_test_workers", {"email": f"{n}@example.com"}, record_key=f"{n}@example.com") for n in range(5)]
+
+    for _ in range(100):
+        if queue.stats()["jobs_succeeded"] == 5:
+            break
+        await asyncio.sleep(0.01)
+    statuses = [(await queue.get_job(job_id))["status"] for job_id in job_ids]
+    await queue.stop(timeout=1)
+
+    assert statuses == [JOB_SUCCEEDED] * 5
@@ -0,0 +1,205 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Lower values are dispatched first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+LANE_CRM = "crm"
+LANE_SEARCH = "search"
+LANE_BATCH = "batch"
+
+def _header_number(headers: Any, name: str) -> Optional[float]:
+    value = headers.get(name) if headers is not None else None
+    if not isinstance(value, (str, bytes)):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def time_until_available(self) -> float:
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self._refill()
+        self.tokens -= 1
+
+class _Lane:
+    def __init__(self, name: str, rate: float, burst: float):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self.pump: Optional[asyncio.Task] = None
+        self.paused_until = 0.0
+        self.throttled = 0
+        self.dispatched = 0
+
+class UpstreamScheduler:
+    """
+    Paces outbound HubSpot calls.
+
+    Each endpoint class (general CRM, search, batch) has its own token bucket. Callers
+    that cannot get a token immediately wait in a per-lane priority queue. HubSpot's
+    rate-limit headers and 429 responses pause a lane and temporarily halve its rate
+    (recovering gradually on success). ``retry_delay`` provides Retry-After aware,
+    jittered exponential backoff for retried calls. Retry-After values are capped at
+    ``retry_max_delay``, so an upstream header cannot hold a lane or a caller for longer.
+    """
+
+    def __init__(
+        self,
+        lanes: Dict[str, Tuple[float, float]],
+        max_queue: int = 1000,
+        max_retries: int = 3,
+        retry_base_delay: float = 0.5,
+        retry_max_delay: float = 10.0,
+    ):
+        self._lanes = {name: _Lane(name, rate, burst) for name, (rate, burst) in lanes.items()}
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._sequence = itertools.count()
+        self.daily_remaining: Optional[float] = None
+        self.retries = 0
+
+    @staticmethod
+    def lane_for(method: str, url: str) -> str:
+        if url.endswith("/search"):
+            return LANE_SEARCH
+        if "/batch/" in url:
+            return LANE_BATCH
+        return LANE_CRM
+
+    def try_acquire(self, lane_name: str) -> bool:
+        """
+        Takes a token only if one is free right now and nobody is waiting for it.
+        """
+        lane = self._lanes[lane_name]
+        if not lane.waiters and lane.paused_until <= time.monotonic() and lane.bucket.time_until_available() == 0:
+            lane.bucket.take()
+            lane.dispatched += 1
+            return True
+        return False
+
+    async def acquire(self, lane_name: str, priority: int = PRIORITY_NORMAL) -> None:
+        if self.try_acquire(lane_name):
+            return
+        lane = self._lanes[lane_name]
+        if len(lane.waiters) >= self.max_queue:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"HubSpot {lane_name} request queue is full; try again later",
+            )
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(lane.waiters, (priority, next(self._sequence), future))
+        if lane.pump is None or lane.pump.done():
+            lane.pump = asyncio.get_running_loop().create_task(self._pump(lane))
+        await future
+
+    async def _pump(self, lane: _Lane) -> None:
+        while lane.waiters:
+            wait = max(lane.paused_until - time.monotonic(), lane.bucket.time_until_available())
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(lane.waiters)
+            if future.done():
+                continue  # the waiting caller was cancelled
+            lane.bucket.take()
+            lane.dispatched += 1
+            future.set_result(None)
+
+    def observe(self, lane_name: str, status_code: int, headers: Any) -> Optional[float]:
+        """
+        Updates a lane from a HubSpot response. Returns the Retry-After delay (seconds) for
+        throttled responses, if HubSpot sent one.
+        """
+        lane = self._lanes[lane_name]
+        daily_remaining = _header_number(headers, "X-HubSpot-RateLimit-Daily-Remaining")
+        if daily_remaining is not None:
+            self.daily_remaining = daily_remaining
+
+        if status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+            lane.throttled += 1
+            lane.bucket.rate = max(lane.bucket.max_rate / 10, lane.bucket.rate / 2)
+            lane.bucket.tokens = min(lane.bucket.tokens, 0)
+            retry_after = _header_number(headers, "Retry-After")
+            pause = min(retry_after, self.retry_max_delay) if retry_after is not None else self.retry_base_delay
+            lane.paused_until = max(lane.paused_until, time.monotonic() + pause)
+            logger.warning(f"HubSpot throttled the {lane_name} lane; pausing {pause:.2f}s, rate now {lane.bucket.rate:.2f}/s")
+            return retry_after
+
+        # Additive recovery towards the configured rate after a throttle
+        if lane.bucket.rate < lane.bucket.max_rate:
+            lane.bucket.rate = min(lane.bucket.max_rate, lane.bucket.rate + lane.bucket.max_rate * 0.05)
+
+        remaining = _header_number(headers, "X-HubSpot-RateLimit-Remaining")
+        interval_ms = _header_number(headers, "X-HubSpot-RateLimit-Interval-Milliseconds")
+        if remaining is not None and remaining <= 0 and interval_ms:
+            # The rolling window is exhausted; hold the lane rather than collecting a 429
+            lane.paused_until = max(lane.paused_until, time.monotonic() + interval_ms / 1000)
+        return None
+
+    def retry_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        self.retries += 1
+        if retry_after is not None:
+            return min(retry_after, self.retry_max_delay)
+        # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt)))
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "retries": self.retries,
+            "daily_remaining": self.daily_remaining,
+            "lanes": {
+                name: {
+                    "rate_per_second": round(lane.bucket.rate, 3),
+                    "configured_rate_per_second": lane.bucket.max_rate,
+                    "queued": len(lane.waiters),
+                    "paused_seconds": round(max(0.0, lane.paused_until - now), 3),
+                    "throttled": lane.throttled,
+                    "dispatched": lane.dispatched,
+                }
+                for name, lane in self._lanes.items()
+            },
+        }
+
+def build_upstream_scheduler() -> UpstreamScheduler:
+    return UpstreamScheduler(
+        lanes={
+            LANE_CRM: (settings.HUBSPOT_CRM_RATE_PER_SECOND, settings.HUBSPOT_CRM_BURST),
+            LANE_SEARCH: (settings.HUBSPOT_SEARCH_RATE_PER_SECOND, settings.HUBSPOT_SEARCH_BURST),
+            LANE_BATCH: (settings.HUBSPOT_BATCH_RATE_PER_SECOND, settings.HUBSPOT_BATCH_BURST),
+        },
+        max_queue=settings.HUBSPOT_SCHEDULER_MAX_QUEUE,
+        max_retries=settings.HUBSPOT_MAX_RETRIES,
+        retry_base_delay=settings.HUBSPOT_RETRY_BASE_DELAY,
+        retry_max_delay=settings.HUBSPOT_RETRY_MAX_DELAY,
+    )
@@ -0,0 +1,291 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+RefreshFunction = Callable[[str, List[str]], Awaitable[Dict[str, Dict[str, Any]]]]
+RefreshListener = Callable[[str, Dict[str, Dict[str, Any]]], Awaitable[None]]
+
+# HubSpot rejects v3 signatures older than five minutes; replayed requests are refused the same way
+SIGNATURE_MAX_AGE_SECONDS = 300
+
+def verify_v3_signature(secret: str, method: str, uri: str, body: bytes, signature: Optional[str], timestamp: Optional[str]) -> bool:
+    """
+    Verifies an ``X-HubSpot-Signature-v3`` header: base64(HMAC-SHA256(secret, method + uri + body + timestamp)).
+    """
+    if not signature or not timestamp:
+        return False
+    try:
+        if abs(time.time() * 1000 - int(timestamp)) > SIGNATURE_MAX_AGE_SECONDS * 1000:
+            return False
+    except ValueError:
+        return False
+    message = method.encode("utf-8") + uri.encode("utf-8") + body + timestamp.encode("utf-8")
+    expected = base64.b64encode(hmac.new(secret.encode("utf-8"), message, hashlib.sha256).digest()).decode("utf-8")
+    return hmac.compare_digest(signature, expected)
+
+class RefreshCoalescer:
+    """
+    Collapses bursts of webhook events into batched object refreshes.
+
+    Editing one record in HubSpot produces one ``propertyChange`` event per changed
+    property. Object IDs are collected per object type for ``window`` seconds after the
+    first one arrives; each distinct ``(object_type, object_id)`` is then fetched once
+    through ``refresh`` in chunks of at most ``max_batch_size`` IDs, and the fetched
+    objects are handed to every subscribed listener.
+    """
+
+    def __init__(self, refresh: RefreshFunction, window: float, max_batch_size: int = 100):
+        self.refresh = refresh
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[str, "OrderedDict[str, None]"] = {}
+        self._listeners: List[RefreshListener] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._flushes: set = set()
+        self.ids_received = 0
+        self.ids_coalesced = 0
+        self.ids_discarded = 0
+        self.refresh_calls = 0
+        self.objects_refreshed = 0
+        self.refresh_errors = 0
+
+    def subscribe(self, listener: RefreshListener) -> None:
+        self._listeners.append(listener)
+
+    def add(self, object_type: str, object_id: str) -> None:
+        self.ids_received += 1
+        pending = self._pending.setdefault(object_type, OrderedDict())
+        if object_id in pending:
+            self.ids_coalesced += 1
+            return
+        pending[object_id] = None
+        loop = asyncio.get_running_loop()
+        if len(pending) >= self.max_batch_size:
+            # A full batch goes out straight away instead of waiting for the window
+            self._start_flush({object_type: self._pending.pop(object_type)})
+        elif self._timer is None:
+            self._timer = loop.create_task(self._flush_after_window())
+
+    def discard(self, object_type: str, object_id: str) -> None:
+        """
+        Drops a pending refresh, e.g. because the object was deleted in the meantime.
+        """
+        pending = self._pending.get(object_type)
+        if pending and object_id in pending:
+            del pending[object_id]
+            self.ids_discarded += 1
+
+    def cancel(self) -> None:
+        """
+        Abandons pending and in-flight refreshes.
+        """
+        for task in [self._timer, *self._flushes]:
+            if task is not None:
+                task.cancel()
+        self._timer = None
+        self._pending = {}
+
+    async def flush(self) -> None:
+        """
+        Refreshes everything pending now and waits for in-flight refreshes to finish.
+        """
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        self._timer = None
+        pending, self._pending = self._pending, {}
+        self._start_flush(pending)
+        while self._flushes:
+            await asyncio.gather(*list(self._flushes), return_exceptions=True)
+
+    async def _flush_after_window(self) -> None:
+        await asyncio.sleep(self.window)
+        self._timer = None
+        pending, self._pending = self._pending, {}
+        self._start_flush(pending)
+
+    def _start_flush(self, pending: Dict[str, "OrderedDict[str, None]"]) -> None:
+        for object_type, object_ids in pending.items():
+            ids = list(object_ids)
+            for start in range(0, len(ids), self.max_batch_size):
+                task = asyncio.get_running_loop().create_task(self._refresh(object_type, ids[start:start + self.max_batch_size]))
+                self._flushes.add(task)
+                task.add_done_callback(self._flushes.discard)
+
+    async def _refresh(self, object_type: str, object_ids: List[str]) -> None:
+        self.refresh_calls += 1
+        try:
+            objects = await self.refresh(object_type, object_ids)
+        except Exception as e:
+            self.refresh_errors += 1
+            logger.error(f"Refreshing {len(object_ids)} {object_type} after webhooks failed: {e}")
+            return
+        self.objects_refreshed += len(objects)
+        for listener in self._listeners:
+            try:
+                await listener(object_type, objects)
+            except Exception as e:
+                self.refresh_errors += 1
+                logger.error(f"Refresh listener {getattr(listener, '__name__', listener)} failed for {object_type}: {e}", exc_info=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_seconds": self.window,
+            "pending_ids": sum(len(ids) for ids in self._pending.values()),
+            "ids_received": self.ids_received,
+            "ids_coalesced": self.ids_coalesced,
+            "ids_discarded": self.ids_discarded,
+            "refresh_calls": self.refresh_calls,
+            "objects_refreshed": self.objects_refreshed,
+            "refresh_errors": self.refresh_errors,
+        }
+
+class WebhookPipeline:
+    """
+    Decouples webhook receipt from processing.
+
+    The endpoint enqueues each raw batch and returns immediately; a fixed pool of
+    workers drains the bounded queue, drops events whose ``eventId`` was already
+    processed, and dispatches each event to the handlers registered for its
+    ``subscriptionType`` (e.g. "contact.deletion"), its kind (e.g. "deletion") or "*".
+    """
+
+    def __init__(self, workers: int = 4, max_queue: int = 1000, dedupe_size: int = 10000, coalescer: Optional[RefreshCoalescer] = None):
+        self.workers = workers
+        self.coalescer = coalescer
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._handlers: Dict[str, List[EventHandler]] = {}
+        self._seen_event_ids: "OrderedDict[Any, None]" = OrderedDict()
+        self._dedupe_size = dedupe_size
+        self._tasks: List[asyncio.Task] = []
+        self._accepting = False
+        self.batches_received = 0
+        self.batches_rejected = 0
+        self.events_received = 0
+        self.events_processed = 0
+        self.duplicates_dropped = 0
+        self.handler_errors = 0
+        self._queued_events = 0
+        self._oldest_enqueued_at: "OrderedDict[int, float]" = OrderedDict()
+        self._batch_counter = 0
+
+    def register(self, event_type: str, handler: EventHandler) -> None:
+        self._handlers.setdefault(event_type, []).append(handler)
+
+    async def start(self) -> None:
+        self._accepting = True
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    def enqueue(self, events: List[Dict[str, Any]]) -> bool:
+        """
+        Queues a webhook batch. Returns False when the pipeline is full or shutting down,
+        in which case the caller should answer with a retryable status.
+        """
+        if not self._accepting:
+            self.batches_rejected += 1
+            return False
+        self._batch_counter += 1
+        try:
+            self._queue.put_nowait((self._batch_counter, events))
+        except asyncio.QueueFull:
+            self.batches_rejected += 1
+            return False
+        self.batches_received += 1
+        self.events_received += len(events)
+        self._queued_events += len(events)
+        self._oldest_enqueued_at[self._batch_counter] = time.monotonic()
+        return True
+
+    async def drain(self) -> None:
+        """
+        Waits until every queued batch has been processed and the resulting refreshes are done.
+        """
+        await self._queue.join()
+        if self.coalescer:
+            await self.coalescer.flush()
+
+    async def stop(self, drain: bool = True, timeout: float = 10.0) -> None:
+        self._accepting = False
+        if drain and self._tasks:
+            try:
+                await asyncio.wait_for(self.drain(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Webhook pipeline drain timed out with {self._queued_events} events still queued")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.coalescer:
+            self.coalescer.cancel()
+
+    async def _worker(self) -> None:
+        while True:
+            batch_id, events = await self._queue.get()
+            try:
+                await self.process(events)
+            except Exception as e:
+                logger.error(f"Unexpected error processing webhook batch: {e}", exc_info=True)
+            finally:
+                self._queued_events -= len(events)
+                self._oldest_enqueued_at.pop(batch_id, None)
+                self._queue.task_done()
+
+    async def process(self, events: List[Dict[str, Any]]) -> None:
+        for event in events:
+            if self._is_duplicate(event):
+                self.duplicates_dropped += 1
+                continue
+            await self._dispatch(event)
+            self.events_processed += 1
+
+    def _is_duplicate(self, event: Dict[str, Any]) -> bool:
+        event_id = event.get("eventId")
+        if event_id is None:
+            return False
+        if event_id in self._seen_event_ids:
+            self._seen_event_ids.move_to_end(event_id)
+            return True
+        self._seen_event_ids[event_id] = None
+        while len(self._seen_event_ids) > self._dedupe_size:
+            self._seen_event_ids.popitem(last=False)
+        return False
+
+    async def _dispatch(self, event: Dict[str, Any]) -> None:
+        subscription_type = event.get("subscriptionType") or ""
+        kind = subscription_type.partition(".")[2]
+        handlers = self._handlers.get(subscription_type, []) + self._handlers.get(kind, []) + self._handlers.get("*", [])
+        if not handlers:
+            logger.debug(f"No webhook handler registered for {subscription_type}; event {event.get('eventId')} ignored")
+        for handler in handlers:
+            try:
+                await handler(event)
+            except Exception as e:
+                self.handler_errors += 1
+                logger.error(f"Webhook handler {getattr(handler, '__name__', handler)} failed for event {event.get('eventId')}: {e}", exc_info=True)
+
+    def stats(self) -> Dict[str, Any]:
+        oldest = next(iter(self._oldest_enqueued_at.values()), None)
+        stats = {
+            "workers": self.workers,
+            "queued_batches": self._queue.qsize(),
+            "queued_events": self._queued_events,
+            "max_queue": self._queue.maxsize,
+            "oldest_batch_age_seconds": round(time.monotonic() - oldest, 3) if oldest is not None else 0.0,
+            "batches_received": self.batches_received,
+            "batches_rejected": self.batches_rejected,
+            "events_received": self.events_received,
+            "events_processed": self.events_processed,
+            "duplicates_dropped": self.duplicates_dropped,
+            "handler_errors": self.handler_errors,
+        }
+        if self.coalescer:
+            stats["refresh"] = self.coalescer.stats()
+        return stats
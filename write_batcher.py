@@ -0,0 +1,184 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+# HubSpot batch error categories mapped to the status code surfaced to the waiting caller
+_BATCH_ERROR_STATUS = {
+    "OBJECT_NOT_FOUND": status.HTTP_404_NOT_FOUND,
+    "VALIDATION_ERROR": status.HTTP_400_BAD_REQUEST,
+    "INVALID_EMAIL": status.HTTP_400_BAD_REQUEST,
+    "CONFLICT": status.HTTP_409_CONFLICT,
+    "OBJECT_ALREADY_EXISTS": status.HTTP_409_CONFLICT,
+    "RATE_LIMITS": status.HTTP_429_TOO_MANY_REQUESTS,
+}
+
+def batch_error_exception(error: Dict[str, Any]) -> HTTPException:
+    """
+    Converts a per-record error from a HubSpot batch response into an HTTPException.
+    """
+    return HTTPException(
+        status_code=_BATCH_ERROR_STATUS.get(error.get("category"), status.HTTP_502_BAD_GATEWAY),
+        detail=f"HubSpot API error: {error.get('category')} - {error.get('message')}",
+    )
+
+SendBatch = Callable[[str, str, List[Dict[str, Any]]], Awaitable[Dict[str, Any]]]
+
+def _match_value(value: Any) -> str:
+    # HubSpot may normalize an upserted identifier (e.g. lowercase an email)
+    return str(value).strip().lower()
+
+class _PendingWrite:
+    __slots__ = ("trace_id", "payload", "future")
+
+    def __init__(self, trace_id: str, payload: Dict[str, Any], future: asyncio.Future):
+        self.trace_id = trace_id
+        self.payload = payload
+        self.future = future
+
+class WriteBatcher:
+    """
+    Coalesces concurrent single-record writes into HubSpot batch calls.
+
+    Writes are grouped per ``(object_type, operation)``. A group is flushed when it
+    reaches ``max_batch_size`` records or ``window`` seconds after its first record,
+    whichever comes first. Every caller awaits its own future, which resolves to the
+    matching object from the batch response or raises that record's error.
+    """
+
+    def __init__(self, send_batch: SendBatch, window: float = 0.02, max_batch_size: int = 100):
+        self._send_batch = send_batch
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[Tuple[str, str], List[_PendingWrite]] = {}
+        self._timers: Dict[Tuple[str, str], asyncio.TimerHandle] = {}
+        self._flushes: set = set()
+        self._trace_counter = 0
+        self.batches_sent = 0
+        self.records_sent = 0
+
+    async def submit(self, object_type: str, operation: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        key = (object_type, operation)
+        pending = self._pending.setdefault(key, [])
+
+        # HubSpot rejects batches that touch the same record twice, so close the current batch first
+        record_id = payload.get("id")
+        if record_id is not None and any(write.payload.get("id") == record_id for write in pending):
+            self._flush(key)
+            pending = self._pending.setdefault(key, [])
+
+        self._trace_counter += 1
+        write = _PendingWrite(str(self._trace_counter), payload, loop.create_future())
+        pending.append(write)
+
+        if len(pending) >= self.max_batch_size:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await write.future
+
+    async def flush(self) -> None:
+        """
+        Sends every pending batch immediately and waits for all in-progress batches.
+        """
+        for key in list(self._pending):
+            self._flush(key)
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_seconds": self.window,
+            "max_batch_size": self.max_batch_size,
+            "batches_sent": self.batches_sent,
+            "records_sent": self.records_sent,
+            "records_per_call": round(self.records_sent / self.batches_sent, 2) if self.batches_sent else 0.0,
+            "pending_records": sum(len(writes) for writes in self._pending.values()),
+        }
+
+    def _flush(self, key: Tuple[str, str]) -> None:
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        writes = self._pending.pop(key, [])
+        if not writes:
+            return
+        task = asyncio.get_running_loop().create_task(self._send(key, writes))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _send(self, key: Tuple[str, str], writes: List[_PendingWrite]) -> None:
+        object_type, operation = key
+        inputs = [dict(write.payload, objectWriteTraceId=write.trace_id) for write in writes]
+        self.batches_sent += 1
+        self.records_sent += len(writes)
+        try:
+            response = await self._send_batch(object_type, operation, inputs)
+        except HTTPException as e:
+            # A single invalid record fails the whole batch; retry records on their own so
+            # the error reaches only the caller that sent it. Throttling and server errors
+            # are shared by the whole batch and are returned to every caller as-is.
+            if len(writes) > 1 and 400 <= e.status_code < 500 and e.status_code != status.HTTP_429_TOO_MANY_REQUESTS:
+                logger.warning(f"Batch {operation} for {object_type} rejected ({e.status_code}); retrying {len(writes)} records individually")
+                await asyncio.gather(*(self._send(key, [write]) for write in writes))
+                return
+            self._fail_all(writes, e)
+            return
+        except Exception as e:
+            self._fail_all(writes, e)
+            return
+        self._resolve(writes, response)
+
+    def _resolve(self, writes: List[_PendingWrite], response: Dict[str, Any]) -> None:
+        by_trace = {write.trace_id: write for write in writes}
+        # An upsert's "id" is its idProperty value, so its result is matched on that property
+        by_id = {str(write.payload["id"]): write for write in writes if write.payload.get("id") is not None and not write.payload.get("idProperty")}
+        by_value = {
+            (write.payload["idProperty"], _match_value(write.payload["id"])): write
+            for write in writes if write.payload.get("idProperty") and write.payload.get("id") is not None
+        }
+        id_properties = {name for name, _ in by_value}
+        unmatched_results = []
+
+        for result in response.get("results", []):
+            write = by_trace.get(str(result.get("objectWriteTraceId"))) or by_id.get(str(result.get("id")))
+            if write is None:
+                values = result.get("properties") or {}
+                write = next((by_value[key] for key in ((name, _match_value(values.get(name))) for name in id_properties if values.get(name) is not None) if key in by_value), None)
+            if write and not write.future.done():
+                write.future.set_result(result)
+            else:
+                unmatched_results.append(result)
+
+        for error in response.get("errors", []):
+            exc = batch_error_exception(error)
+            context = error.get("context") or {}
+            for trace_id in context.get("objectWriteTraceId", []):
+                write = by_trace.get(str(trace_id))
+                if write and not write.future.done():
+                    write.future.set_exception(exc)
+            for record_id in context.get("ids", []) + context.get("id", []):
+                write = by_id.get(str(record_id)) or next((candidate for (_, value), candidate in by_value.items() if value == _match_value(record_id)), None)
+                if write and not write.future.done():
+                    write.future.set_exception(exc)
+
+        # A result that cannot be matched is never handed to a write by position, since
+        # HubSpot does not keep input order. Only a batch of one can take it.
+        remaining = [write for write in writes if not write.future.done()]
+        if len(writes) == 1 and remaining and len(unmatched_results) == 1:
+            remaining[0].future.set_result(unmatched_results[0])
+            return
+        for write in remaining:
+            write.future.set_exception(HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="HubSpot API error: batch response did not include a result for this record",
+            ))
+
+    @staticmethod
+    def _fail_all(writes: List[_PendingWrite], exc: Exception) -> None:
+        for write in writes:
+            if not write.future.done():
+                write.future.set_exception(exc)
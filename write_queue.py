@@ -0,0 +1,406 @@
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from fastapi import HTTPException, Request, status
+from config import settings
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+# Writes one batch of queued records of a type: receives ``(index, payload)`` pairs and
+# returns one result line per record ({"index", "id", "action", "error", "_status", "_operation"})
+QueueWriter = Callable[[List[Tuple[int, Dict[str, Any]]], Any], Awaitable[List[Dict[str, Any]]]]
+
+_WRITERS: Dict[str, QueueWriter] = {}
+
+PRUNE_INTERVAL = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL UNIQUE,
+    object_type TEXT NOT NULL,
+    record_key TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    not_before REAL NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    lease_until REAL NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_unfinished ON jobs (status, seq);
+"""
+# Columns added after the first release, for queue files created before them
+_ADDED_COLUMNS = {"worker_id": "TEXT", "lease_until": "REAL NOT NULL DEFAULT 0"}
+
+def register_writer(object_type: str, writer: QueueWriter) -> None:
+    """
+    Registers how queued records of ``object_type`` are written; called by ``create_crud_router``.
+    """
+    _WRITERS[object_type] = writer
+
+class WriteQueueStore(SQLiteStore):
+    """
+    SQLite storage for queued writes, which several processes may share. Jobs survive
+    restarts. A claimed job is leased to this store's ``worker_id`` for ``lease`` seconds
+    (renewed while it is written); a job whose lease ran out, because its process crashed
+    or hung, can be claimed again by any worker, so every write is applied at least once.
+    """
+
+    def __init__(self, path: str, lease: float = 120.0, worker_id: Optional[str] = None):
+        super().__init__(path, _SCHEMA)
+        self.lease = lease
+        self.worker_id = worker_id or uuid.uuid4().hex
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        for column, definition in _ADDED_COLUMNS.items():
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+        self._db.commit()
+
+    def _enqueue(self, job_id: str, object_type: str, record_key: Optional[str], payload: Dict[str, Any], max_depth: int) -> bool:
+        now = time.time()
+        # The depth check and the insert share one write transaction, so the limit holds across processes
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            if self._depth() >= max_depth:
+                self._db.rollback()
+                return False
+            self._db.execute(
+                "INSERT INTO jobs (job_id, object_type, record_key, payload, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, object_type, record_key, json.dumps(payload), JOB_QUEUED, now, now),
+            )
+            self._db.commit()
+        except BaseException:
+            self._db.rollback()
+            raise
+        return True
+
+    def _claim(self, limit: int) -> List[Dict[str, Any]]:
+        now = time.time()
+        # IMMEDIATE takes the write lock up front, so workers in other processes cannot claim the same jobs
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self._db.execute(
+                "SELECT seq, job_id, object_type, record_key, payload, status, attempts, not_before, lease_until FROM jobs "
+                "WHERE status IN (?, ?) ORDER BY seq",
+                (JOB_QUEUED, JOB_RUNNING),
+            )
+            claimed: List[Dict[str, Any]] = []
+            busy = set()
+            for seq, job_id, object_type, record_key, payload, job_status, attempts, not_before, lease_until in rows:
+                key = (object_type, record_key) if record_key is not None else None
+                # A running job is only taken over once its lease has expired
+                expired = job_status == JOB_RUNNING and lease_until <= now
+                # The earliest unfinished job of a record key blocks every later one, so writes apply in order
+                available = ((job_status == JOB_QUEUED and not_before <= now) or expired) and key not in busy
+                if key is not None:
+                    busy.add(key)
+                if available:
+                    claimed.append({
+                        "seq": seq, "job_id": job_id, "object_type": object_type, "payload": json.loads(payload),
+                        "attempts": attempts, "reclaimed": expired,
+                    })
+                    if len(claimed) >= limit:
+                        break
+            self._db.executemany(
+                "UPDATE jobs SET status = ?, worker_id = ?, lease_until = ?, updated_at = ? WHERE seq = ?",
+                [(JOB_RUNNING, self.worker_id, now + self.lease, now, job["seq"]) for job in claimed],
+            )
+            self._db.commit()
+        except BaseException:
+            self._db.rollback()
+            raise
+        return claimed
+
+    def _renew(self, seqs: List[int]) -> None:
+        now = time.time()
+        with self._db:
+            self._db.executemany(
+                "UPDATE jobs SET lease_until = ? WHERE seq = ? AND status = ? AND worker_id = ?",
+                [(now + self.lease, seq, JOB_RUNNING, self.worker_id) for seq in seqs],
+            )
+
+    def _finish(self, updates: List[Tuple[int, str, Optional[Dict[str, Any]], Optional[str], float]]) -> None:
+        now = time.time()
+        with self._db:
+            # Only jobs still leased to this worker; one taken over after its lease expired belongs to the new worker
+            self._db.executemany(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, not_before = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE seq = ? AND status = ? AND worker_id = ?",
+                [(job_status, json.dumps(result) if result is not None else None, error, not_before, now, seq, JOB_RUNNING, self.worker_id)
+                 for seq, job_status, result, error, not_before in updates],
+            )
+
+    def _get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._db.execute(
+            "SELECT job_id, object_type, status, attempts, result, error, created_at, updated_at FROM jobs WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row[0],
+            "object_type": row[1],
+            "status": row[2],
+            "attempts": row[3],
+            "result": json.loads(row[4]) if row[4] else None,
+            "error": row[5],
+            "created_at": row[6],
+            "updated_at": row[7],
+        }
+
+    def _depth(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (JOB_QUEUED, JOB_RUNNING)).fetchone()[0]
+
+    def _prune(self, before: float) -> int:
+        with self._db:
+            return self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (JOB_SUCCEEDED, JOB_FAILED, before)
+            ).rowcount
+
+    async def enqueue(self, job_id: str, object_type: str, record_key: Optional[str], payload: Dict[str, Any], max_depth: int) -> bool:
+        return await self._run(self._enqueue, job_id, object_type, record_key, payload, max_depth)
+
+    async def claim(self, limit: int) -> List[Dict[str, Any]]:
+        return await self._run(self._claim, limit)
+
+    async def renew(self, seqs: List[int]) -> None:
+        await self._run(self._renew, seqs)
+
+    async def finish(self, updates: List[Tuple[int, str, Optional[Dict[str, Any]], Optional[str], float]]) -> None:
+        await self._run(self._finish, updates)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self._run(self._get, job_id)
+
+    async def depth(self) -> int:
+        return await self._run(self._depth)
+
+    async def prune(self, before: float) -> int:
+        return await self._run(self._prune, before)
+
+class WriteQueue:
+    """
+    Durable queue for writes accepted with ``202``.
+
+    Workers claim up to ``batch_size`` jobs at a time, group them by object type and write
+    each group with the same batch calls as the bulk endpoint. Jobs of one record key
+    (e.g. one email address) are applied in the order they were accepted. Failed writes
+    are retried with exponential backoff when HubSpot throttled them, failed with a 5xx
+    (updates and upserts only, since a create may already have happened) or could not be
+    reached; other errors fail the job. ``enqueue`` refuses new jobs once ``max_depth``
+    jobs are waiting.
+    """
+
+    def __init__(
+        self,
+        store: WriteQueueStore,
+        workers: int = 2,
+        batch_size: int = 100,
+        max_depth: int = 10000,
+        max_attempts: int = 5,
+        retry_base_delay: float = 1.0,
+        retry_max_delay: float = 60.0,
+        poll_interval: float = 1.0,
+        retention: float = 86400.0,
+    ):
+        self.store = store
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_depth = max_depth
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._tasks: List[asyncio.Task] = []
+        self._depth = 0
+        self._pruned_at = 0.0
+        self.jobs_accepted = 0
+        self.jobs_rejected = 0
+        self.jobs_succeeded = 0
+        self.jobs_failed = 0
+        self.jobs_retried = 0
+        self.jobs_reclaimed = 0
+        self.batches_written = 0
+
+    async def start(self, hubspot_client: Any) -> None:
+        # Jobs left running by a crashed process are claimed again once their lease expires
+        await self._prune()
+        self._depth = await self.store.depth()
+        self._stopping = False
+        self._tasks = [asyncio.get_running_loop().create_task(self._work(hubspot_client)) for _ in range(self.workers)]
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Lets workers finish the batch they are writing, then stops them. Queued jobs stay in
+        the store for the next start.
+        """
+        self._stopping = True
+        self._wakeup.set()
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+        self.store.close()
+
+    async def enqueue(self, object_type: str, payload: Dict[str, Any], record_key: Optional[str] = None) -> str:
+        """
+        Stores a write and returns its job ID. Raises HTTP 503 when the queue is full.
+        """
+        job_id = uuid.uuid4().hex
+        normalised_key = str(record_key).strip().lower() if record_key else None
+        if not await self.store.enqueue(job_id, object_type, normalised_key, payload, self.max_depth):
+            self.jobs_rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Write queue is full; try again later",
+                headers={"Retry-After": "5"},
+            )
+        self.jobs_accepted += 1
+        self._depth += 1
+        self._wakeup.set()
+        return job_id
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.store.get(job_id)
+
+    async def _prune(self) -> None:
+        self._pruned_at = time.time()
+        await self.store.prune(self._pruned_at - self.retention)
+
+    async def _work(self, hubspot_client: Any) -> None:
+        while not self._stopping:
+            try:
+                # Finished jobs are only kept for status lookups; drop old ones about once an hour
+                if time.time() - self._pruned_at > PRUNE_INTERVAL:
+                    await self._prune()
+                jobs = await self.store.claim(self.batch_size)
+            except Exception as e:
+                logger.error(f"Claiming queued writes failed: {e}")
+                jobs = []
+            if not jobs:
+                self._wakeup.clear()
+                try:
+                    # Deferred retries become due without a new enqueue, so wake up periodically too
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            reclaimed = sum(1 for job in jobs if job["reclaimed"])
+            if reclaimed:
+                self.jobs_reclaimed += reclaimed
+                logger.warning(f"Took over {reclaimed} queued writes whose worker lease expired")
+            renewal = asyncio.get_running_loop().create_task(self._renew_leases(jobs))
+            try:
+                await self._process(jobs, hubspot_client)
+            except Exception as e:
+                # The jobs stay leased and are retried once the lease expires; the worker carries on
+                logger.error(f"Writing {len(jobs)} queued jobs failed: {e}", exc_info=True)
+            finally:
+                renewal.cancel()
+
+    async def _renew_leases(self, jobs: List[Dict[str, Any]]) -> None:
+        seqs = [job["seq"] for job in jobs]
+        while True:
+            await asyncio.sleep(self.store.lease / 3)
+            try:
+                await self.store.renew(seqs)
+            except Exception as e:
+                logger.error(f"Renewing queued write leases failed: {e}")
+
+    async def _process(self, jobs: List[Dict[str, Any]], hubspot_client: Any) -> None:
+        by_type: Dict[str, List[Dict[str, Any]]] = {}
+        for job in jobs:
+            by_type.setdefault(job["object_type"], []).append(job)
+        updates: List[Tuple[int, str, Optional[Dict[str, Any]], Optional[str], float]] = []
+        for object_type, group in by_type.items():
+            lines = await self._write(object_type, group, hubspot_client)
+            for job, line in zip(group, lines):
+                updates.append(self._outcome(job, line))
+            self.batches_written += 1
+        await self.store.finish(updates)
+        self._depth = max(0, self._depth - sum(1 for update in updates if update[1] != JOB_QUEUED))
+
+    async def _write(self, object_type: str, jobs: List[Dict[str, Any]], hubspot_client: Any) -> List[Dict[str, Any]]:
+        writer = _WRITERS.get(object_type)
+        if writer is None:
+            return [{"error": f"No writer registered for {object_type}", "_status": status.HTTP_404_NOT_FOUND} for _ in jobs]
+        try:
+            lines = await writer([(index, job["payload"]) for index, job in enumerate(jobs)], hubspot_client)
+            by_index = {line["index"]: line for line in lines}
+            return [by_index.get(index, {"error": "No result returned for record", "_status": None}) for index in range(len(jobs))]
+        except Exception as e:
+            # Writers only raise before sending anything (e.g. the identifier lookup failed), so every job may be retried
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            status_code = e.status_code if isinstance(e, HTTPException) else None
+            logger.error(f"Queued {object_type} batch failed: {error}")
+            return [{"error": error, "_status": status_code} for _ in jobs]
+
+    def _retryable(self, line: Dict[str, Any]) -> bool:
+        status_code = line.get("_status")
+        if status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+            return True
+        server_side = status_code is None or status_code >= 500
+        return server_side and line.get("_operation") != "create"
+
+    def _outcome(self, job: Dict[str, Any], line: Dict[str, Any]) -> Tuple[int, str, Optional[Dict[str, Any]], Optional[str], float]:
+        if not line.get("error"):
+            self.jobs_succeeded += 1
+            return job["seq"], JOB_SUCCEEDED, {"id": line.get("id"), "action": line.get("action")}, None, 0.0
+        attempt = job["attempts"] + 1
+        if self._retryable(line) and attempt < self.max_attempts:
+            self.jobs_retried += 1
+            # Full jitter, as for upstream retries
+            delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt)))
+            return job["seq"], JOB_QUEUED, None, line["error"], time.time() + delay
+        self.jobs_failed += 1
+        logger.error(f"Queued {job['object_type']} write {job['job_id']} failed after {attempt} attempts: {line['error']}")
+        return job["seq"], JOB_FAILED, None, line["error"], 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "depth": self._depth,
+            "max_depth": self.max_depth,
+            "jobs_accepted": self.jobs_accepted,
+            "jobs_rejected": self.jobs_rejected,
+            "jobs_succeeded": self.jobs_succeeded,
+            "jobs_failed": self.jobs_failed,
+            "jobs_retried": self.jobs_retried,
+            "jobs_reclaimed": self.jobs_reclaimed,
+            "lease_seconds": self.store.lease,
+            "batches_written": self.batches_written,
+        }
+
+def build_write_queue() -> Optional[WriteQueue]:
+    if not settings.WRITE_QUEUE_ENABLED:
+        return None
+    return WriteQueue(
+        WriteQueueStore(settings.WRITE_QUEUE_PATH, lease=settings.WRITE_QUEUE_LEASE_SECONDS),
+        workers=settings.WRITE_QUEUE_WORKERS,
+        batch_size=settings.WRITE_QUEUE_BATCH_SIZE,
+        max_depth=settings.WRITE_QUEUE_MAX_DEPTH,
+        max_attempts=settings.WRITE_QUEUE_MAX_ATTEMPTS,
+        retention=settings.WRITE_QUEUE_RETENTION_SECONDS,
+    )
+
+def get_write_queue(request: Request) -> Optional[WriteQueue]:
+    return getattr(request.app.state, "write_queue", None)